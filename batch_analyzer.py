@@ -0,0 +1,266 @@
+"""
+batch_analyzer.py
+-----------------
+Re-análisis offline de todo el archivo de sesiones, sin UI.
+
+Cuando cambia una definición en metrics.json hay que recalcular las
+métricas derivadas de las sesiones ya grabadas. Cada sesión (CSV ancho o
+largo, .fses o .h5) se carga completa con recording.read_recording() y se
+procesa vectorizada, con el mismo código que usan los dashboards en vivo:
+
+    MetricsEngine.compute_batch()   métricas por frame (n, métricas)
+    detect_blinks()                 eventos de parpadeo / cierre de ojos
+    SessionStats.update_batch()     estadísticas de la sesión
+
+Por sesión se escriben en --out-dir (results/analysis por defecto):
+
+    facial_data_pc_YYYYmmdd_HHMMSS_metrics.csv   Timestamp + una columna por métrica
+    facial_data_pc_YYYYmmdd_HHMMSS_blinks.csv    eventos (ver blink_detector.py)
+    facial_data_pc_YYYYmmdd_HHMMSS_stats.json    estadísticas (ver streaming_stats.py)
+
+y un summary.csv con una fila por sesión (frames, duración, parpadeos,
+promedio de cada métrica y el hash de la configuración de métricas).
+
+Las sesiones se reparten en un pool de procesos de a una, de la más grande
+a la más chica: cada proceso toma la siguiente al terminar, así las
+grandes no se acumulan en el mismo proceso. Cada proceso arma el motor de
+métricas una sola vez. Si una sesión existe en varios formatos se analiza
+una sola vez, prefiriendo .h5 > .fses > .csv (los que se cargan más
+rápido), y entre CSV el ancho (<sesión>_wide.csv) sobre el largo.
+
+Una sesión se vuelve a analizar si falta su tabla de métricas o si su fila
+del summary se calculó con otra configuración de métricas; sin cambios en
+metrics.json se saltan las ya analizadas (--force para rehacer todo).
+
+Uso:
+    python batch_analyzer.py results/full
+    python batch_analyzer.py results/full results/h5 --metrics-config metrics_v2.json -j 8
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from blink_detector import blink_params, detect_blinks, save_events
+from hdf5_session import HDF5_EXTENSION
+from convert_archive import WIDE_SUFFIX
+from metrics_engine import MetricsEngine, load_metrics_config
+from recording import read_recording
+from session_file import SESSION_EXTENSION
+from streaming_stats import SessionStats
+
+DEFAULT_OUT_DIR = os.path.join("results", "analysis")
+
+# Preferencia cuando la misma sesión está en varios formatos
+_FORMAT_PRIORITY = {HDF5_EXTENSION: 0, SESSION_EXTENSION: 1, ".csv": 2}
+
+# Archivos derivados que viven junto a las grabaciones
+_DERIVED_SUFFIXES = ("_long.csv", "_blinks.csv", "_metrics.csv", "_features.csv")
+
+_engine = None
+
+
+def _init_worker(metrics_config):
+    # Una vez por proceso: el motor se reutiliza para todas sus sesiones
+    global _engine
+    _engine = MetricsEngine.from_config(metrics_config, required=("blink",))
+
+
+def session_name(src):
+    """Nombre de la sesión de una grabación (sin extensión ni sufijo _wide)."""
+    base = os.path.splitext(os.path.basename(src))[0]
+    suffix = "_" + WIDE_SUFFIX
+    return base[:-len(suffix)] if base.endswith(suffix) else base
+
+
+def metrics_path(out_dir, src):
+    return os.path.join(out_dir, session_name(src) + "_metrics.csv")
+
+
+def config_hash(metrics_config=None):
+    """Hash corto de las definiciones de métricas (cambia si cambia metrics.json)."""
+    definitions = load_metrics_config(metrics_config)
+    text = json.dumps(definitions, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def analyze_session(src, out_dir, engine=None):
+    """Analiza una grabación completa y escribe sus tablas de resultados.
+
+    Retorna la fila del summary (dict).
+    """
+    engine = engine or _engine
+    start = time.perf_counter()
+    timestamps, values, names = read_recording(src)
+    if values.shape[1] != engine.n_expressions:
+        raise ValueError(f"{values.shape[1]} expresiones, se esperaban {engine.n_expressions}")
+
+    engine.reset()
+    metrics = engine.compute_batch(values)
+
+    table = metrics_path(out_dir, src)
+    part = table + ".part"
+    with open(part, "w", newline="") as f:
+        f.write(",".join(["Timestamp"] + engine.names) + "\n")
+        # Un solo % sobre todo el bloque: ~2x más rápido que np.savetxt, mismo texto
+        row = ",".join(["%.6f"] + ["%.9g"] * len(engine.names)) + "\n"
+        data = np.column_stack([timestamps, metrics]).ravel().tolist()
+        f.write((row * len(timestamps)) % tuple(data))
+    os.replace(part, table)
+
+    # Las salidas se nombran igual que las que quedan junto a la grabación
+    recording_path = os.path.join(out_dir, session_name(src))
+    events = detect_blinks(timestamps, metrics[:, engine.index["blink"]], **blink_params(engine))
+    save_events(recording_path, events)
+
+    stats = SessionStats(names, engine.names)
+    stats.update_batch(values, metrics)
+    stats.started = os.path.getmtime(src)
+    stats.save(recording_path)
+
+    row = {
+        "session":  os.path.basename(src),
+        "frames":   len(timestamps),
+        "duration": float(timestamps[-1] - timestamps[0]) if len(timestamps) else 0.0,
+        "blinks":   int((~events["closure"]).sum()),
+        "closures": int(events["closure"].sum()),
+    }
+    for name in engine.names:
+        row[name] = round(stats.metric(name).get("avg", float("nan")), 6)
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def _analyze(src, out_dir):
+    try:
+        return analyze_session(src, out_dir), None
+    except Exception as e:
+        return {"session": os.path.basename(src)}, str(e)
+
+
+def _is_recording(path):
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1]
+    return ext in _FORMAT_PRIORITY and not name.endswith(_DERIVED_SUFFIXES)
+
+
+def collect_sessions(inputs):
+    """Grabaciones a analizar, una por sesión (el formato más rápido de cargar)."""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for ext in _FORMAT_PRIORITY:
+                files += glob.glob(os.path.join(item, "*" + ext))
+        else:
+            files += glob.glob(item)
+
+    def priority(path):
+        # A igual extensión, el CSV ancho (_wide) antes que el largo
+        return _FORMAT_PRIORITY[os.path.splitext(path)[1]], session_name(path) == \
+            os.path.splitext(os.path.basename(path))[0]
+
+    best = {}
+    for f in sorted(set(files)):
+        if not _is_recording(f):
+            continue
+        name = session_name(f)
+        if name not in best or priority(f) < priority(best[name]):
+            best[name] = f
+    return sorted(best.values())
+
+
+def _read_summary(out_dir):
+    path = os.path.join(out_dir, "summary.csv")
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="") as f:
+        return {session_name(r["session"]): r for r in csv.DictReader(f)}
+
+
+def analyze_archive(inputs, out_dir=DEFAULT_OUT_DIR, jobs=None, metrics_config=None, force=False):
+    sessions = collect_sessions(inputs)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Ya analizada = tabla de métricas + fila del summary con la misma configuración
+    config = config_hash(metrics_config)
+    summary = _read_summary(out_dir)
+    pending = [s for s in sessions
+               if force or not os.path.exists(metrics_path(out_dir, s))
+               or summary.get(session_name(s), {}).get("metrics_config") != config]
+
+    # Los más grandes primero: el pool queda mejor balanceado al final
+    pending.sort(key=os.path.getsize, reverse=True)
+    total_bytes = sum(os.path.getsize(s) for s in pending)
+    print(f"{len(sessions)} sesiones: {len(pending)} por analizar, "
+          f"{len(sessions) - len(pending)} ya analizadas ({total_bytes / 1e9:.2f} GB)")
+    if not pending:
+        return []
+
+    workers = min(jobs or os.cpu_count(), len(pending))
+
+    start = time.perf_counter()
+    rows, failed, total_frames = [], 0, 0
+    step = max(1, len(pending) // 100)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(metrics_config,)) as pool:
+            # Una sesión por tarea, en orden de tamaño: el proceso que se
+            # libera toma la siguiente y el final queda balanceado
+            futures = [pool.submit(_analyze, src, out_dir) for src in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                row, error = future.result()
+                if error:
+                    failed += 1
+                    print(f"[{done}/{len(pending)}] ✗ {row['session']}: {error}")
+                    continue
+                row["metrics_config"] = config
+                rows.append(row)
+                total_frames += row["frames"]
+                if done % step == 0 or done == len(pending):
+                    elapsed = time.perf_counter() - start
+                    rate = done / elapsed if elapsed else 0
+                    eta  = (len(pending) - done) / rate if rate else 0
+                    print(f"[{done}/{len(pending)}] {done / len(pending) * 100:5.1f}% "
+                          f"{rate:.1f} sesiones/s, ETA {eta:.0f}s")
+    finally:
+        # También si se corta a mitad: las terminadas no se vuelven a analizar
+        summary = write_summary(out_dir, rows)
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ {len(rows)} analizadas, {failed} con error, {total_frames} frames "
+          f"en {elapsed:.1f}s → {summary}")
+    return rows
+
+
+def write_summary(out_dir, rows):
+    """Agrega las filas nuevas a summary.csv (reemplaza las sesiones repetidas)."""
+    path = os.path.join(out_dir, "summary.csv")
+    existing = _read_summary(out_dir)
+    existing.update((session_name(r["session"]), r) for r in rows)
+
+    fields = list(rows[0]) if rows else []
+    for r in existing.values():
+        fields += [k for k in r if k not in fields]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(existing[k] for k in sorted(existing))
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-análisis offline de sesiones grabadas")
+    parser.add_argument("inputs", nargs="+", help="carpetas o archivos/globs (.csv, .fses, .h5)")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT_DIR, help="carpeta de resultados")
+    parser.add_argument("--metrics-config", help="JSON de métricas (por defecto metrics.json)")
+    parser.add_argument("-j", "--jobs", type=int, help="procesos (por defecto todos los núcleos)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-analizar aunque el resultado sea de la configuración actual")
+    args = parser.parse_args()
+    analyze_archive(args.inputs, args.out_dir, args.jobs, args.metrics_config, args.force)
@@ -0,0 +1,208 @@
+"""
+blink_detector.py
+-----------------
+Detector de parpadeos / cierres de ojos con histéresis sobre la métrica
+"blink" (cierre de ojos promedio, ver metrics_engine.py).
+
+    abierto  -> cerrado  cuando el valor >= threshold
+    cerrado  -> abierto  cuando el valor <  release
+
+Cada cierre es un evento (inicio, duración, amplitud = valor máximo). Dos
+cierres separados por `merge_gap` segundos o menos se unen en uno (el
+ruido alrededor del umbral no cuenta dos parpadeos), y los más cortos que
+`min_duration` se descartan. Los que duran más de `max_blink` son cierres
+de ojos ("closure"), no parpadeos.
+
+Hay dos versiones con resultados idénticos:
+- BlinkDetector.update(t, x): en vivo, O(1) por frame.
+- detect_blinks(t, x): vectorizada con NumPy para una sesión grabada
+  completa (una hora de frames en milisegundos).
+
+Los parámetros salen de la definición de la métrica en metrics.json:
+    "threshold": 0.7, "release": 0.4, "min_duration": 0.03,
+    "merge_gap": 0.08, "max_blink": 0.5
+"""
+
+import csv
+import os
+from collections import namedtuple
+
+import numpy as np
+
+BlinkEvent = namedtuple("BlinkEvent", "onset duration amplitude kind")
+
+EVENT_DTYPE = np.dtype([("onset", "f8"), ("duration", "f8"), ("amplitude", "f4"), ("closure", "?")])
+
+DEFAULT_PARAMS = {"threshold": 0.7, "release": 0.4, "min_duration": 0.03,
+                  "merge_gap": 0.08, "max_blink": 0.5}
+
+
+def blink_params(engine=None, metric="blink"):
+    """Parámetros del detector desde la definición de la métrica (o por defecto)."""
+    params = dict(DEFAULT_PARAMS)
+    if engine is not None and metric in engine.index:
+        definition = engine.definitions[engine.index[metric]]
+        params.update({k: definition[k] for k in DEFAULT_PARAMS if definition.get(k) is not None})
+    if params["release"] > params["threshold"]:
+        raise ValueError("release debe ser <= threshold")
+    return params
+
+
+def events_path(recording_path):
+    """Ruta del CSV de eventos de parpadeo de una grabación."""
+    return os.path.splitext(recording_path)[0] + "_blinks.csv"
+
+
+def save_events(recording_path, events):
+    """Guarda los eventos (lista de BlinkEvent o arreglo EVENT_DTYPE). Retorna la ruta."""
+    path = events_path(recording_path)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Onset", "Duration", "Amplitude", "Kind"])
+        for e in as_event_list(events):
+            writer.writerow([e.onset, e.duration, e.amplitude, e.kind])
+    return path
+
+
+def as_event_list(events):
+    if isinstance(events, np.ndarray):
+        return [BlinkEvent(float(e["onset"]), float(e["duration"]), float(e["amplitude"]),
+                           "closure" if e["closure"] else "blink") for e in events]
+    return list(events)
+
+
+class BlinkDetector:
+    """Máquina de estados con histéresis, en vivo."""
+
+    def __init__(self, threshold=0.7, release=0.4, min_duration=0.03, merge_gap=0.08, max_blink=0.5):
+        self.threshold    = threshold
+        self.release      = release
+        self.min_duration = min_duration
+        self.merge_gap    = merge_gap
+        self.max_blink    = max_blink
+        self.reset()
+
+    @classmethod
+    def from_engine(cls, engine, metric="blink"):
+        return cls(**blink_params(engine, metric))
+
+    def reset(self):
+        self.closed  = False
+        self.events  = []
+        self.blinks  = 0
+        self._onset  = None     # inicio del cierre en curso (o pendiente)
+        self._offset = None     # fin del cierre pendiente de confirmar
+        self._amp    = 0.0
+        self._last_t = None
+
+    def update(self, t, x):
+        """Procesa un frame. Retorna el BlinkEvent que se confirmó en este frame, o None."""
+        self._last_t = t
+        if self.closed:
+            if x > self._amp:
+                self._amp = x
+            if x < self.release:
+                self.closed  = False
+                self._offset = t
+            return None
+
+        if x >= self.threshold:
+            if self._offset is not None and t - self._offset <= self.merge_gap:
+                # Vuelve a cerrarse enseguida: sigue siendo el mismo evento
+                self._offset = None
+            else:
+                event = self._emit()
+                self._onset = t
+                self._amp   = x
+                self.closed = True
+                return event
+            self.closed = True
+            if x > self._amp:
+                self._amp = x
+            return None
+
+        if self._offset is not None and t - self._offset > self.merge_gap:
+            return self._emit()
+        return None
+
+    def finish(self):
+        """Cierra el evento en curso al terminar la sesión. Retorna el último evento o None."""
+        if self.closed:
+            self.closed  = False
+            self._offset = self._last_t
+        return self._emit()
+
+    def _emit(self):
+        if self._offset is None:
+            return None
+        duration = self._offset - self._onset
+        amplitude = self._amp
+        onset = self._onset
+        self._onset = self._offset = None
+        if duration < self.min_duration:
+            return None
+        event = BlinkEvent(onset, duration, float(amplitude),
+                           "closure" if duration > self.max_blink else "blink")
+        self.events.append(event)
+        if event.kind == "blink":
+            self.blinks += 1
+        return event
+
+
+def detect_blinks(t, x, threshold=0.7, release=0.4, min_duration=0.03, merge_gap=0.08, max_blink=0.5):
+    """Versión vectorizada de BlinkDetector sobre una sesión completa.
+
+    Retorna un arreglo EVENT_DTYPE con los mismos eventos que update() + finish().
+    """
+    t = np.asarray(t, dtype=np.float64)
+    x = np.asarray(x)
+    n = len(x)
+    if not n:
+        return np.zeros(0, dtype=EVENT_DTYPE)
+
+    # Histéresis: 1 = cierra, 0 = abre, -1 = sin cambio; se arrastra el último estado
+    signal = np.full(n + 1, -1, dtype=np.int8)
+    signal[0] = 0                               # empieza abierto
+    signal[1:][x < release]    = 0
+    signal[1:][x >= threshold] = 1
+    last  = np.maximum.accumulate(np.where(signal >= 0, np.arange(n + 1), 0))
+    state = signal[last]
+
+    change  = np.diff(state)
+    onsets  = np.flatnonzero(change == 1)       # primer frame cerrado
+    offsets = np.flatnonzero(change == -1)      # primer frame abierto
+    if not len(onsets):
+        return np.zeros(0, dtype=EVENT_DTYPE)
+
+    # Un cierre sin terminar se cierra en el último frame (como finish())
+    open_end = len(offsets) < len(onsets)
+    ends = np.append(offsets, n) if open_end else offsets
+
+    # Amplitud: máximo en [onset, fin); reduceat sobre pares (onset, fin)
+    bounds = np.empty(2 * len(onsets), dtype=np.intp)
+    bounds[0::2] = onsets
+    bounds[1::2] = np.minimum(ends, n - 1)
+    amp = np.maximum.reduceat(x, bounds)[0::2]
+    on_t  = t[onsets]
+    off_t = t[np.minimum(ends, n - 1)]
+    if open_end:
+        amp[-1] = x[onsets[-1]:].max()
+
+    # Unir cierres separados por <= merge_gap
+    new_group = np.empty(len(onsets), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = (on_t[1:] - off_t[:-1]) > merge_gap
+    starts = np.flatnonzero(new_group)
+    stops  = np.append(starts[1:], len(onsets)) - 1
+    on_t   = on_t[starts]
+    off_t  = off_t[stops]
+    amp    = np.maximum.reduceat(amp, starts)
+
+    duration = off_t - on_t
+    keep = duration >= min_duration
+    events = np.zeros(int(keep.sum()), dtype=EVENT_DTYPE)
+    events["onset"]     = on_t[keep]
+    events["duration"]  = duration[keep]
+    events["amplitude"] = amp[keep]
+    events["closure"]   = duration[keep] > max_blink
+    return events
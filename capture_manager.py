@@ -0,0 +1,390 @@
+"""
+capture_manager.py
+------------------
+Captura simultánea de varios Quest Pro conectados al mismo PC.
+
+Cada headset (serial de `adb devices`) corre su propio pipeline
+lector -> parser -> escritor CSV en un proceso separado, así el parseo de
+un headset no compite por el GIL con los demás. Los procesos reportan un
+resumen liviano (frames, fps, métricas) cada medio segundo a una cola
+compartida, y la vista agregada solo lee esos resúmenes.
+
+Uso:
+    python capture_manager.py                   # ventana con todos los headsets
+    python capture_manager.py --headless        # tabla en consola
+    python capture_manager.py --serials A B     # solo algunos headsets
+
+Variables de entorno (.env):
+    ADB_PATH=/ruta/completa/a/adb
+    RECORD_FORMAT=wide      (opcional: wide | long | bin | hdf5, ver recording.py)
+    METRICS_CONFIG=metrics.json  (opcional: métricas derivadas, ver metrics_engine.py)
+    WINDOW_SECONDS=1,5,30        (opcional: features por ventana en <grabación>_features.csv)
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from facial_expressions import EXPRESSION_NAMES, N_EXPRESSIONS
+from frame_decoder import decode_facial_data, parse_frame_binary
+from logcat_reader import LogcatFrameReader, FACIAL_DATA_TAG, FACIAL_DATA_B_TAG
+from recording import open_recording, recording_extension, BackgroundWriter
+from session_catalog import index_paths
+from metrics_engine import MetricsEngine, LIVE_METRICS
+from streaming_stats import SessionStats
+from blink_detector import BlinkDetector, save_events
+from window_features import WindowFeatures, FeatureCsvLog
+
+ADB_PATH = os.getenv("ADB_PATH", "adb")
+RECORD_FORMAT = os.getenv("RECORD_FORMAT", "wide")
+
+REPORT_INTERVAL = 0.5   # segundos entre reportes de cada headset
+
+
+def list_devices(adb_path=ADB_PATH):
+    """Retorna los seriales de `adb devices` en estado 'device'."""
+    result = subprocess.run([adb_path, "devices"], capture_output=True, text=True, timeout=5)
+    serials = []
+    for line in result.stdout.splitlines()[1:]:
+        parts = line.split()
+        if len(parts) >= 2 and parts[1] == "device":
+            serials.append(parts[0])
+    return serials
+
+
+def _safe_name(serial):
+    # Seriales WiFi tienen ':' (ip:puerto), no válido en nombres de archivo en Windows
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", serial)
+
+
+# ── Pipeline por headset (proceso hijo) ────────────────────────────────────────
+
+def run_device_pipeline(adb_path, serial, out_dir, status_queue, stop_event):
+    """Lee, decodifica y guarda los frames de un headset hasta `stop_event`."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename  = os.path.join(out_dir, f"facial_data_{_safe_name(serial)}_{timestamp}{recording_extension(RECORD_FORMAT)}")
+
+    status = {
+        "serial": serial, "state": "iniciando", "file": filename, "error": "",
+        "frames": 0, "bad_lines": 0, "dropped": 0, "fps": 0.0,
+        "attention": 0.0, "stress": 0.0, "mouth": 0.0, "blinks": 0,
+    }
+    status_queue.put(dict(status))
+
+    try:
+        subprocess.run([adb_path, "-s", serial, "logcat", "-c"], timeout=5)
+        process = subprocess.Popen(
+            [adb_path, "-s", serial, "logcat", "-s", "Unity:D"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        status.update(state="error", error=str(e))
+        status_queue.put(status)
+        return
+
+    # Al pedir detener se corta el pipe para destrabar readinto
+    def _watch_stop():
+        stop_event.wait()
+        process.terminate()
+    threading.Thread(target=_watch_stop, daemon=True).start()
+
+    names  = [EXPRESSION_NAMES[i] for i in range(N_EXPRESSIONS)]
+    values = np.zeros(N_EXPRESSIONS, dtype=np.float32)
+    engine = MetricsEngine.from_config(required=LIVE_METRICS)
+    i_attention, i_stress, i_mouth, i_blink = (
+        engine.index[name] for name in LIVE_METRICS)
+    session_stats = SessionStats(names, engine.names)
+    blinks = BlinkDetector.from_engine(engine)
+    features = WindowFeatures(names, engine.names)
+
+    status["state"] = "capturando"
+    reporting = threading.Event()   # se setea al terminar: corta el reporte periódico
+    reporter  = None
+
+    # Reporte por tiempo, no por frame: un headset que deja de mandar pasa a 0 fps
+    def _report(recording):
+        frames_at_report = status["frames"]
+        last = time.monotonic()
+        while not reporting.wait(REPORT_INTERVAL):
+            now = time.monotonic()
+            frames = status["frames"]
+            status["fps"] = (frames - frames_at_report) / (now - last)
+            frames_at_report, last = frames, now
+            status["dropped"] = recording.dropped
+            status_queue.put(dict(status))
+
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        recording = BackgroundWriter(open_recording(filename, names, RECORD_FORMAT))
+        feature_log = FeatureCsvLog(filename, features.names)
+        features.add_listener(feature_log)
+        reporter = threading.Thread(target=_report, args=(recording,), daemon=True)
+        reporter.start()
+        try:
+            reader = LogcatFrameReader(process.stdout, tags=(FACIAL_DATA_TAG, FACIAL_DATA_B_TAG))
+            for tag, payload in reader:
+                if tag == FACIAL_DATA_B_TAG:
+                    frame = parse_frame_binary(payload, values)
+                    ts = frame[0] if frame else None
+                else:
+                    ts = decode_facial_data(payload, values)
+                if ts is None:
+                    status["bad_lines"] += 1
+                    continue
+
+                recording.write(ts, values)
+
+                status["frames"]   += 1
+                metrics = engine.compute(values)
+                session_stats.update(values, metrics)
+                features.update(ts, values, metrics)
+                status["attention"] = float(metrics[i_attention])
+                status["stress"]    = float(metrics[i_stress])
+                status["mouth"]     = float(metrics[i_mouth])
+                blinks.update(ts, metrics[i_blink])
+                status["blinks"] = blinks.blinks
+        finally:
+            reporting.set()
+            reporter.join()
+            status["dropped"] = recording.close()["dropped"]
+            session_stats.save(filename)
+            blinks.finish()
+            status["blinks"] = blinks.blinks
+            save_events(filename, blinks.events)
+            feature_log.close()
+
+    except Exception as e:
+        status.update(state="error", error=str(e))
+    else:
+        status["state"] = "detenido" if stop_event.is_set() else "desconectado"
+    finally:
+        process.terminate()
+        process.wait()
+
+    try:
+        index_paths([filename])
+    except Exception as e:
+        status["error"] = f"catálogo: {e}"
+
+    status["fps"] = 0.0
+    status_queue.put(status)
+
+
+# ── Manager ───────────────────────────────────────────────────────────────────
+
+class CaptureManager:
+    """Lanza un proceso de captura por headset y junta sus reportes."""
+
+    def __init__(self, adb_path=ADB_PATH, out_dir="results/full"):
+        self.adb_path = adb_path
+        self.out_dir  = out_dir
+        # spawn en todas las plataformas: mismo comportamiento que en Windows
+        self._ctx = multiprocessing.get_context("spawn")
+        self.status_queue = self._ctx.Queue()
+        self.workers = {}   # serial -> (Process, Event)
+        self.devices = {}   # serial -> último reporte
+
+    def start(self, serials=None):
+        if serials is None:
+            serials = list_devices(self.adb_path)
+        for serial in serials:
+            if serial in self.workers and self.workers[serial][0].is_alive():
+                continue
+            stop_event = self._ctx.Event()
+            process = self._ctx.Process(
+                target=run_device_pipeline,
+                args=(self.adb_path, serial, self.out_dir, self.status_queue, stop_event),
+                name=f"capture-{serial}", daemon=True,
+            )
+            process.start()
+            self.workers[serial] = (process, stop_event)
+        return serials
+
+    def poll(self):
+        """Procesa los reportes pendientes. Retorna el estado de todos los headsets."""
+        while True:
+            try:
+                status = self.status_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.devices[status["serial"]] = status
+
+        # Procesos que murieron sin reportar (ej. crash del intérprete)
+        for serial, (process, _) in self.workers.items():
+            status = self.devices.get(serial)
+            if not process.is_alive() and status and status["state"] in ("iniciando", "capturando"):
+                status.update(state="error", error=f"proceso terminó ({process.exitcode})", fps=0.0)
+        return self.devices
+
+    def stop(self, timeout=5):
+        for process, stop_event in self.workers.values():
+            stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process, _ in self.workers.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self.poll()
+        self.workers.clear()
+
+    def totals(self):
+        devices = self.devices.values()
+        return {
+            "devices":   sum(1 for d in devices if d["state"] == "capturando"),
+            "frames":    sum(d["frames"] for d in devices),
+            "fps":       sum(d["fps"] for d in devices),
+            "bad_lines": sum(d["bad_lines"] for d in devices),
+            "dropped":   sum(d["dropped"] for d in devices),
+        }
+
+
+# ── Vista agregada ────────────────────────────────────────────────────────────
+
+COLUMNS = [
+    ("serial",    "Headset",   170),
+    ("state",     "Estado",    100),
+    ("frames",    "Frames",     90),
+    ("fps",       "FPS",        70),
+    ("bad_lines", "Inválidas",  80),
+    ("dropped",   "Descartados", 90),
+    ("attention", "Atención",   80),
+    ("stress",    "Estrés",     80),
+    ("mouth",     "Act. Boca",  80),
+    ("blinks",    "Parpadeos",  80),
+    ("file",      "Archivo",   320),
+]
+
+
+def _format(key, value):
+    if key == "fps":
+        return f"{value:.1f}"
+    if key in ("attention", "stress", "mouth"):
+        return f"{value*100:.1f}%"
+    return str(value)
+
+
+class CaptureManagerApp:
+    """Ventana con una fila por headset y totales."""
+
+    def __init__(self, manager, serials=None):
+        import tkinter as tk
+        from tkinter import ttk
+
+        self.tk = tk
+        self.manager = manager
+        self.serials = serials
+
+        self.root = tk.Tk()
+        self.root.title("Quest Pro – Capture Manager")
+        self.root.geometry("1300x400")
+
+        top = ttk.Frame(self.root)
+        top.pack(side=tk.TOP, fill=tk.X, padx=10, pady=8)
+
+        self.start_btn = ttk.Button(top, text="▶ Iniciar todos", width=20, command=self.start)
+        self.start_btn.pack(side=tk.LEFT, padx=5)
+        self.stop_btn = ttk.Button(top, text="⏹ Detener todos", width=20,
+                                   command=self.stop, state=tk.DISABLED)
+        self.stop_btn.pack(side=tk.LEFT, padx=5)
+
+        self.totals_lbl = ttk.Label(top, text="Sin headsets", font=("Arial", 12, "bold"))
+        self.totals_lbl.pack(side=tk.LEFT, padx=20)
+
+        self.table = ttk.Treeview(self.root, columns=[c[0] for c in COLUMNS], show="headings")
+        for key, title, width in COLUMNS:
+            self.table.heading(key, text=title)
+            self.table.column(key, width=width, anchor=tk.W if key in ("serial", "file") else tk.CENTER)
+        self.table.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    def start(self):
+        try:
+            serials = self.manager.start(self.serials)
+        except (OSError, subprocess.SubprocessError) as e:
+            self.totals_lbl.config(text=f"Error ADB: {e}")
+            return
+        if not serials:
+            self.totals_lbl.config(text="No hay headsets conectados")
+            return
+        self.start_btn.config(state=self.tk.DISABLED)
+        self.stop_btn.config(state=self.tk.NORMAL)
+
+    def stop(self):
+        self.manager.stop()
+        self.start_btn.config(state=self.tk.NORMAL)
+        self.stop_btn.config(state=self.tk.DISABLED)
+
+    def refresh(self):
+        for serial, status in sorted(self.manager.poll().items()):
+            row = [_format(key, status.get(key, "")) for key, _, _ in COLUMNS]
+            if self.table.exists(serial):
+                self.table.item(serial, values=row)
+            else:
+                self.table.insert("", self.tk.END, iid=serial, values=row)
+
+        t = self.manager.totals()
+        if self.manager.devices:
+            self.totals_lbl.config(
+                text=f"{t['devices']} capturando · {t['fps']:.0f} fps totales · {t['frames']} frames")
+        self.root.after(500, self.refresh)
+
+    def run(self):
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.root.after(500, self.refresh)
+        self.root.mainloop()
+
+    def _on_close(self):
+        self.manager.stop()
+        self.root.destroy()
+
+
+def run_headless(manager, serials=None, interval=1.0):
+    """Tabla en consola hasta Ctrl+C."""
+    serials = manager.start(serials)
+    if not serials:
+        print("No hay headsets conectados")
+        return
+    print(f"Capturando {len(serials)} headsets. Ctrl+C para detener.\n")
+    try:
+        while True:
+            time.sleep(interval)
+            for serial, s in sorted(manager.poll().items()):
+                print(f"  {serial:<22} {s['state']:<12} {s['frames']:>8} frames "
+                      f"{s['fps']:>6.1f} fps  atención {s['attention']*100:5.1f}%  "
+                      f"parpadeos {s['blinks']}")
+            t = manager.totals()
+            print(f"  TOTAL: {t['fps']:.0f} fps, {t['frames']} frames, {t['bad_lines']} inválidas, "
+                  f"{t['dropped']} descartados\n")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+        for serial, s in sorted(manager.devices.items()):
+            print(f"  {serial}: {s['frames']} frames -> {s['file']} ({s['state']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Captura simultánea de varios Quest Pro")
+    parser.add_argument("--serials", nargs="*", help="seriales a capturar (por defecto todos)")
+    parser.add_argument("--out-dir", default="results/full")
+    parser.add_argument("--headless", action="store_true", help="sin ventana, tabla en consola")
+    args = parser.parse_args()
+
+    manager = CaptureManager(ADB_PATH, args.out_dir)
+    if args.headless:
+        run_headless(manager, args.serials or None)
+    else:
+        CaptureManagerApp(manager, args.serials or None).run()
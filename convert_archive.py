@@ -0,0 +1,240 @@
+"""
+convert_archive.py
+------------------
+Conversión masiva de grabaciones en formato largo
+(Timestamp, Expression_ID, Expression_Name, Value) a formato ancho, .fses
+o HDF5.
+
+Cada archivo se lee en bloques de bytes y se parsea con numpy (sin pandas
+y sin cargar el archivo completo): las filas se agrupan por frame (cambia
+el timestamp o vuelve a empezar el ID de expresión) y se escriben en lote
+con los writers de recording.py. Los archivos se reparten en un pool de
+procesos, del más grande al más chico.
+
+Reanudable: cada salida se escribe como <destino>.part y se renombra al
+terminar, así que un archivo convertido nunca queda a medias y al volver
+a correr se saltan los que ya existen. El original nunca se sobrescribe:
+con --format wide junto al original la salida es <nombre>_wide.csv.
+
+Uso:
+    python convert_archive.py results/full --format bin
+    python convert_archive.py results/full/*.csv --format hdf5 --out-dir results/h5 -j 8
+"""
+
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from facial_expressions import EXPRESSION_NAMES, N_EXPRESSIONS
+from recording import open_recording, recording_extension, LONG_HEADER
+
+CHUNK_BYTES = 16 * 1024 * 1024
+WIDE_SUFFIX = "wide"        # <original>_wide.csv cuando la salida ancha iría junto al original
+
+
+def _parse_rows(block):
+    """Columnas (timestamps, ids, nombres, valores) de un bloque de líneas completas."""
+    fields = block.replace(b"\r", b"").replace(b"\n", b",").split(b",")
+    if fields and fields[-1] == b"":
+        fields.pop()
+    if len(fields) % 4:
+        raise ValueError("fila con cantidad de columnas inválida")
+    ts    = np.array(fields[0::4]).astype(np.float64)
+    ids   = np.array(fields[1::4]).astype(np.int64)
+    names = fields[2::4]
+    vals  = np.array(fields[3::4]).astype(np.float32)
+    return ts, ids, names, vals
+
+
+def iter_long_frames(path, n_expressions=N_EXPRESSIONS, chunk_bytes=CHUNK_BYTES):
+    """Genera (timestamps, valores (n, N), nombres por ID) por bloque de un CSV largo.
+
+    Las filas del último frame de cada bloque se guardan para el siguiente,
+    por si el frame quedó partido entre bloques.
+    """
+    names = [EXPRESSION_NAMES.get(i, f"Unknown_{i}") for i in range(n_expressions)]
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8", "replace").strip().split(",")
+        if header != LONG_HEADER:
+            raise ValueError(f"{path} no está en formato largo")
+
+        carry = b""
+        first_block = True
+        while True:
+            chunk = f.read(chunk_bytes)
+            at_end = not chunk
+            data = carry + chunk
+            if not at_end:
+                cut = data.rfind(b"\n") + 1
+                data, carry = data[:cut], data[cut:]
+            else:
+                carry = b""
+            if not data.strip():
+                if at_end:
+                    break
+                continue
+
+            ts, ids, row_names, vals = _parse_rows(data)
+
+            # Un frame nuevo empieza cuando cambia el timestamp o el ID no avanza
+            starts = np.empty(len(ts), dtype=bool)
+            starts[0] = True
+            starts[1:] = (ts[1:] != ts[:-1]) | (ids[1:] <= ids[:-1])
+
+            if not at_end:
+                # Reservar el último frame (puede estar incompleto) para el próximo bloque
+                last = int(np.flatnonzero(starts)[-1])
+                if last == 0:
+                    carry = data + carry
+                    continue
+                pos = len(data) - 1
+                for _ in range(len(ts) - last):
+                    pos = data.rfind(b"\n", 0, pos)
+                carry = data[pos + 1:] + carry
+                ts, ids, vals, starts = ts[:last], ids[:last], vals[:last], starts[:last]
+
+            frame_of_row = np.cumsum(starts) - 1
+            n_frames = int(frame_of_row[-1]) + 1
+            values = np.zeros((n_frames, n_expressions), dtype=np.float32)
+            valid = (ids >= 0) & (ids < n_expressions)
+            values[frame_of_row[valid], ids[valid]] = vals[valid]
+
+            if first_block:
+                # Nombres tal como están en el archivo (filas del primer frame)
+                for row in np.flatnonzero(valid & (frame_of_row == 0)):
+                    names[ids[row]] = row_names[row].decode("utf-8", "replace")
+                first_block = False
+
+            yield ts[starts], values, names
+
+            if at_end:
+                break
+
+
+def _same_path(a, b):
+    return os.path.normcase(os.path.realpath(a)) == os.path.normcase(os.path.realpath(b))
+
+
+def output_path(src, out_dir, fmt):
+    """Destino de la conversión; nunca coincide con el original.
+
+    Un CSV ancho en la misma carpeta tendría el mismo nombre que el CSV
+    largo, así que se le agrega el sufijo _wide.
+    """
+    base   = os.path.splitext(os.path.basename(src))[0]
+    folder = out_dir or os.path.dirname(src)
+    dst = os.path.join(folder, base + recording_extension(fmt))
+    if _same_path(dst, src):
+        dst = os.path.join(folder, f"{base}_{WIDE_SUFFIX}{recording_extension(fmt)}")
+    return dst
+
+
+def convert_file(src, dst, fmt):
+    """Convierte un archivo. Retorna (src, bytes leídos, frames, segundos)."""
+    if _same_path(dst, src):
+        raise ValueError(f"la salida sobrescribiría el original: {src}")
+    start = time.perf_counter()
+    part = dst + ".part"
+    writer = None
+    frames = 0
+    try:
+        for timestamps, values, names in iter_long_frames(src):
+            if writer is None:
+                writer = open_recording(part, names, fmt)
+            writer.write_many(timestamps, np.arange(frames, frames + len(timestamps)), values)
+            frames += len(timestamps)
+        if writer is None:
+            writer = open_recording(part, [EXPRESSION_NAMES[i] for i in range(N_EXPRESSIONS)], fmt)
+        writer.close()
+        os.replace(part, dst)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return src, os.path.getsize(src), frames, time.perf_counter() - start
+
+
+def _is_long_csv(path):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.readline().strip().split(",") == LONG_HEADER
+    except OSError:
+        return False
+
+
+def collect_sources(inputs):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files += glob.glob(os.path.join(item, "*.csv"))
+        else:
+            files += glob.glob(item)
+    return sorted({f for f in files if not f.endswith("_long.csv") and _is_long_csv(f)})
+
+
+def convert_archive(inputs, fmt="bin", out_dir=None, jobs=None, force=False):
+    sources = collect_sources(inputs)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    pending = []
+    skipped = 0
+    for src in sources:
+        dst = output_path(src, out_dir, fmt)
+        if not force and os.path.exists(dst):
+            skipped += 1
+            continue
+        pending.append((src, dst))
+
+    # Los más grandes primero: el pool queda mejor balanceado al final
+    pending.sort(key=lambda p: os.path.getsize(p[0]), reverse=True)
+    total_bytes = sum(os.path.getsize(src) for src, _ in pending)
+    print(f"{len(sources)} archivos en formato largo: {len(pending)} por convertir, "
+          f"{skipped} ya convertidos ({total_bytes / 1e9:.2f} GB)")
+    if not pending:
+        return
+
+    start = time.perf_counter()
+    done_bytes = done_files = total_frames = failed = 0
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        futures = {pool.submit(convert_file, src, dst, fmt): src for src, dst in pending}
+        for future in as_completed(futures):
+            src = futures[future]
+            done_files += 1
+            try:
+                _, size, frames, seconds = future.result()
+            except Exception as e:
+                failed += 1
+                done_bytes += os.path.getsize(src)
+                print(f"[{done_files}/{len(pending)}] ✗ {src}: {e}")
+                continue
+
+            done_bytes   += size
+            total_frames += frames
+            elapsed = time.perf_counter() - start
+            rate = done_bytes / elapsed if elapsed else 0
+            eta  = (total_bytes - done_bytes) / rate if rate else 0
+            print(f"[{done_files}/{len(pending)}] ✓ {os.path.basename(src)}: {frames} frames "
+                  f"en {seconds:.1f}s | {done_bytes / total_bytes * 100:5.1f}% "
+                  f"{rate / 1e6:.0f} MB/s, ETA {eta:.0f}s")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n✓ {done_files - failed} convertidos, {failed} con error, {total_frames} frames "
+          f"en {elapsed:.1f}s ({done_bytes / 1e6 / max(elapsed, 1e-9):.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversión masiva de CSV largos")
+    parser.add_argument("inputs", nargs="+", help="carpetas o archivos/globs .csv")
+    parser.add_argument("--format", choices=["wide", "bin", "hdf5"], default="bin")
+    parser.add_argument("--out-dir", help="carpeta de salida (por defecto junto al original)")
+    parser.add_argument("-j", "--jobs", type=int, help="procesos (por defecto todos los núcleos)")
+    parser.add_argument("--force", action="store_true", help="reconvertir aunque exista la salida")
+    args = parser.parse_args()
+    convert_archive(args.inputs, args.format, args.out_dir, args.jobs, args.force)
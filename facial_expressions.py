@@ -0,0 +1,36 @@
+"""
+facial_expressions.py
+---------------------
+Mapa de expresiones faciales del Quest Pro compartido por los dashboards
+y las herramientas (capture manager, simulador, conversores...).
+"""
+
+# Mapeo de índices a nombres de expresiones faciales
+EXPRESSION_NAMES = {
+    0: "BrowLowererL",        1: "BrowLowererR",        2: "CheekPuffL",          3: "CheekPuffR",
+    4: "CheekRaiserL",        5: "CheekRaiserR",         6: "CheekSuckL",          7: "CheekSuckR",
+    8: "ChinRaiserB",         9: "ChinRaiserT",          10: "DimplerL",           11: "DimplerR",
+    12: "EyesClosedL",        13: "EyesClosedR",         14: "EyesLookDownL",      15: "EyesLookDownR",
+    16: "EyesLookLeftL",      17: "EyesLookLeftR",       18: "EyesLookRightL",     19: "EyesLookRightR",
+    20: "EyesLookUpL",        21: "EyesLookUpR",         22: "InnerBrowRaiserL",   23: "InnerBrowRaiserR",
+    24: "JawDrop",            25: "JawSidewaysLeft",     26: "JawSidewaysRight",   27: "JawThrust",
+    28: "LidTightenerL",      29: "LidTightenerR",       30: "LipCornerDepressorL",31: "LipCornerDepressorR",
+    32: "LipCornerPullerL",   33: "LipCornerPullerR",    34: "LipFunnelLB",        35: "LipFunnelLT",
+    36: "LipFunnelRB",        37: "LipFunnelRT",         38: "LipPressorL",        39: "LipPressorR",
+    40: "LipPuckerL",         41: "LipPuckerR",          42: "LipStretcherL",      43: "LipStretcherR",
+    44: "LipSuckLB",          45: "LipSuckLT",           46: "LipSuckRB",          47: "LipSuckRT",
+    48: "LipTightenerL",      49: "LipTightenerR",       50: "LipsToward",         51: "LowerLipDepressorL",
+    52: "LowerLipDepressorR", 53: "MouthLeft",           54: "MouthRight",         55: "NoseWrinklerL",
+    56: "NoseWrinklerR",      57: "OuterBrowRaiserL",    58: "OuterBrowRaiserR",   59: "UpperLidRaiserL",
+    60: "UpperLidRaiserR",    61: "UpperLipRaiserL",     62: "UpperLipRaiserR"
+}
+
+N_EXPRESSIONS = len(EXPRESSION_NAMES)
+
+# Expresiones clave para métricas derivadas
+KEY_EXPRESSIONS = {
+    "blink":          [12, 13],
+    "brow_tension":   [0, 1, 22, 23],
+    "mouth_activity": [24, 32, 33, 42, 43],
+    "attention":      [14, 15, 20, 21],
+}
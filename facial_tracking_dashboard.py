@@ -3,23 +3,58 @@ import threading
 import json
 import time
 from datetime import datetime
-from collections import deque
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import csv
+import numpy as np
 import os
 import glob
 import socket
 import asyncio
 from dotenv import load_dotenv
+from logcat_reader import LogcatFrameReader, FACIAL_DATA_TAG, FACIAL_DATA_B_TAG
+from frame_decoder import decode_facial_data, parse_frame_binary, encoding_mode, ENCODING_MODES
+from stream_ingest import StreamReceiver, adb_reverse, DEFAULT_STREAM_PORT
+from logcat_capture import RecordingStream, ReplayStream, capture_filename
+from recording import open_recording, recording_extension, BackgroundWriter
+from hdf5_session import attach_summary, HDF5_EXTENSION
+from session_catalog import index_paths
+from summary_receiver import receive_payload, save_session_summary
+from facial_expressions import EXPRESSION_NAMES
+from metrics_engine import MetricsEngine, LIVE_METRICS
+from streaming_stats import SessionStats
+from blink_detector import BlinkDetector, save_events
+from window_features import WindowFeatures, FeatureCsvLog, UdpFeaturePublisher
+from live_plots import LivePlot
+from lod_store import LodStore
+from expression_heatmap import ExpressionRing, HeatmapView
+from ui_state import WidgetCache
+from log_panel import LogPanel
 load_dotenv()
 # Configuración de la ruta de ADB - Tu versión de Unity
 # ADB_PATH = '/home/vgiac/Unity/Hub/Editor/6000.0.47f1/Editor/Data/PlaybackEngines/AndroidPlayer/SDK/platform-tools/adb'
 ADB_PATH = os.getenv('ADB_PATH')
 QUEST_IP = os.getenv('QUEST_IP')
+# Codificación de frames: json (por defecto) o f32/f16/u16 para [FACIAL_DATA_B]
+FACIAL_ENCODING = encoding_mode(os.getenv('FACIAL_ENCODING'))
+if FACIAL_ENCODING is None:
+    # Un modo desconocido dejaría al headset enviando algo que el PC no decodifica
+    print(f"✗ FACIAL_ENCODING={os.getenv('FACIAL_ENCODING')} no es válido "
+          f"({' | '.join(ENCODING_MODES)}): se usa json")
+    FACIAL_ENCODING = 'json'
+# Ingesta en tiempo real: logcat (por defecto) o socket (adb reverse / WiFi)
+INGEST_MODE = os.getenv('INGEST_MODE', 'logcat')
+STREAM_PORT = int(os.getenv('STREAM_PORT', DEFAULT_STREAM_PORT))
+# Grabar logcat crudo en esta carpeta / reproducir una grabación (.lcap) sin headset
+LOGCAT_RECORD = os.getenv('LOGCAT_RECORD')
+LOGCAT_REPLAY = os.getenv('LOGCAT_REPLAY')
+REPLAY_SPEED = float(os.getenv('REPLAY_SPEED', '1'))
+# Grabación por frame: wide (una fila por frame), long (una fila por expresión), bin (.fses) o hdf5 (.h5)
+RECORD_FORMAT = os.getenv('RECORD_FORMAT', 'wide')
+# Refresco de la UI (métricas y gráficos), independiente de la tasa de frames
+UI_TICK_MS = int(os.getenv('UI_TICK_MS', '100'))
 # Verificar que ADB existe
 if not os.path.exists(ADB_PATH):
     print("\n" + "="*60)
@@ -34,44 +69,29 @@ if not os.path.exists(ADB_PATH):
     exit(1)
 else:
     print(f"✓ ADB encontrado en: {ADB_PATH}\n")
-# Mapeo de índices a nombres de expresiones faciales
-EXPRESSION_NAMES = {
-    0: "BrowLowererL", 1: "BrowLowererR", 2: "CheekPuffL", 3: "CheekPuffR",
-    4: "CheekRaiserL", 5: "CheekRaiserR", 6: "CheekSuckL", 7: "CheekSuckR",
-    8: "ChinRaiserB", 9: "ChinRaiserT", 10: "DimplerL", 11: "DimplerR",
-    12: "EyesClosedL", 13: "EyesClosedR", 14: "EyesLookDownL", 15: "EyesLookDownR",
-    16: "EyesLookLeftL", 17: "EyesLookLeftR", 18: "EyesLookRightL", 19: "EyesLookRightR",
-    20: "EyesLookUpL", 21: "EyesLookUpR", 22: "InnerBrowRaiserL", 23: "InnerBrowRaiserR",
-    24: "JawDrop", 25: "JawSidewaysLeft", 26: "JawSidewaysRight", 27: "JawThrust",
-    28: "LidTightenerL", 29: "LidTightenerR", 30: "LipCornerDepressorL", 31: "LipCornerDepressorR",
-    32: "LipCornerPullerL", 33: "LipCornerPullerR", 34: "LipFunnelLB", 35: "LipFunnelLT",
-    36: "LipFunnelRB", 37: "LipFunnelRT", 38: "LipPressorL", 39: "LipPressorR",
-    40: "LipPuckerL", 41: "LipPuckerR", 42: "LipStretcherL", 43: "LipStretcherR",
-    44: "LipSuckLB", 45: "LipSuckLT", 46: "LipSuckRB", 47: "LipSuckRT",
-    48: "LipTightenerL", 49: "LipTightenerR", 50: "LipsToward", 51: "LowerLipDepressorL",
-    52: "LowerLipDepressorR", 53: "MouthLeft", 54: "MouthRight", 55: "NoseWrinklerL",
-    56: "NoseWrinklerR", 57: "OuterBrowRaiserL", 58: "OuterBrowRaiserR", 59: "UpperLidRaiserL",
-    60: "UpperLidRaiserR", 61: "UpperLipRaiserL", 62: "UpperLipRaiserR"
-}
-# Expresiones clave para métricas derivadas
-KEY_EXPRESSIONS = {
-    'blink': [12, 13],  # EyesClosedL, EyesClosedR
-    'brow_tension': [0, 1, 22, 23],  # Cejas
-    'mouth_activity': [24, 32, 33, 42, 43],  # Boca
-    'attention': [14, 15, 20, 21]  # Mirada
-}
 class FacialTrackingDashboard:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Quest Pro - Facial Tracking Dashboard")
         self.root.geometry("1400x900")
 
-        # Cola de datos para gráficos (últimos 100 puntos)
-        self.data_buffer = deque(maxlen=100)
+        # Último frame publicado por el thread de ingesta (lo lee el tick de la UI)
+        self.latest_frame = None
+        self.shown_frame = None
+        self.widget_cache = WidgetCache()
+        # Log acotado (LOG_MAX_LINES), opcionalmente copiado a LOG_FILE
+        self.log_panel = LogPanel()
+        self.ui_tick_id = None
+        self.frame_values = np.zeros(len(EXPRESSION_NAMES), dtype=np.float32)
         self.is_recording = False
         self.adb_process = None
-        self.csv_file = None
-        self.csv_writer = None
+        # Se toma en cada frame y al cambiar is_recording: al volver de stop_capture
+        # ningún frame queda a mitad de camino entre la ingesta y el cierre de la sesión
+        self.ingest_lock = threading.Lock()
+        self.stream_receiver = None
+        self.recording = None
+        self.last_recording_path = None
+        self.pending_summary = None
 
         # WebSocket server
         self.websocket_port = 8765
@@ -84,11 +104,28 @@ class FacialTrackingDashboard:
         self.current_video = ""
         self.quest_ip = QUEST_IP  # IP del Quest Pro
 
-        # Métricas derivadas
+        # Métricas derivadas definidas en metrics.json (METRICS_CONFIG)
+        self.metrics = MetricsEngine.from_config(required=LIVE_METRICS)
+        # Estadísticas en línea de la sesión (se guardan junto a la grabación)
+        self.session_stats = SessionStats([EXPRESSION_NAMES[i] for i in range(len(EXPRESSION_NAMES))],
+                                          self.metrics.names)
         self.attention_score = 0
         self.stress_score = 0
+        self.mouth_score = 0
+        self.blink_detector = BlinkDetector.from_engine(self.metrics)
+        # Features por ventana deslizante (WINDOW_SECONDS), publicados a cadencia fija
+        self.window_features = WindowFeatures(self.session_stats.expression_names, self.metrics.names)
+        self.feature_log = None
+        self.feature_udp = UdpFeaturePublisher.from_env(self.window_features)
+        if self.feature_udp:
+            self.window_features.add_listener(self.feature_udp)
         self.blink_count = 0
-        self.last_blink_time = 0
+        # Historia de la sesión para los gráficos, en varias resoluciones (HISTORY_SECONDS)
+        self.plot_buffer = LodStore(len(self.metrics.names))
+        # Últimos HEATMAP_SECONDS de las 63 expresiones para el mapa de calor
+        self.expression_ring = ExpressionRing(len(EXPRESSION_NAMES))
+        self.heatmap = None
+        self.heatmap_window = None
 
         self.setup_ui()
         # self.start_websocket_server()
@@ -112,6 +149,9 @@ class FacialTrackingDashboard:
                                        foreground="red", font=("Arial", 12, "bold"))
         self.status_label.pack(side=tk.LEFT, padx=20)
 
+        ttk.Button(control_frame, text="🌡 Mapa de Expresiones",
+                   command=self.show_heatmap_window).pack(side=tk.LEFT, padx=5)
+
         # Frame de control de video
         video_control_frame = ttk.LabelFrame(self.root, text="🎥 Control de Video 360", padding=10)
         video_control_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
@@ -176,12 +216,26 @@ class FacialTrackingDashboard:
         self.ax2.set_title("Estrés (Tensión Facial)")
         self.ax3.set_title("Actividad de Boca")
 
+        # Ejes fijos: se dibujan una vez y quedan en el fondo del blitting
+        for ax, label in zip([self.ax1, self.ax2, self.ax3], ['Atención', 'Estrés', 'Act. Boca']):
+            ax.set_ylabel(label)
+            ax.set_ylim([0, 1])
+            ax.grid(True)
+        self.ax3.set_xlabel('Tiempo (s)')
+
+        index = self.metrics.index
+        self.live_plot = LivePlot(self.canvas)
+        self.live_plot.add_line(self.ax1, index['attention'], 'g-', linewidth=2)
+        self.live_plot.add_line(self.ax2, index['stress'], 'r-', linewidth=2)
+        self.live_plot.add_line(self.ax3, index['mouth'], 'b-', linewidth=2)
+
         # Columna 3: Log de datos
         log_frame = ttk.LabelFrame(main_frame, text="📝 Log de Datos", padding=10)
         log_frame.grid(row=0, column=2, sticky="nsew", padx=5)
 
         self.log_text = scrolledtext.ScrolledText(log_frame, width=40, height=40)
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.log_panel.attach(self.log_text, self.root, UI_TICK_MS)
 
         # Configurar grid weights
         main_frame.columnconfigure(0, weight=1)
@@ -192,17 +246,31 @@ class FacialTrackingDashboard:
     def start_capture(self):
         # Iniciar archivo CSV para guardado local
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"results/full/facial_data_pc_{timestamp}.csv"
+        filename = f"results/full/facial_data_pc_{timestamp}{recording_extension(RECORD_FORMAT)}"
 
         try:
-            self.csv_file = open(filename, 'w', newline='')
-            self.csv_writer = csv.writer(self.csv_file)
-            self.csv_writer.writerow(['Timestamp', 'Expression_ID', 'Expression_Name', 'Value'])
+            names = [EXPRESSION_NAMES[i] for i in range(len(EXPRESSION_NAMES))]
+            # La escritura a disco corre en su propio thread (cola acotada, escritura en lotes)
+            self.recording = BackgroundWriter(open_recording(
+                filename, names, RECORD_FORMAT, attrs={"video": self.current_video}))
         except Exception as e:
             self.log(f"Error creando archivo CSV: {e}")
             return
 
-        self.is_recording = True
+        self.metrics.reset()
+        self.session_stats.reset()
+        self.blink_detector.reset()
+        self.window_features.reset()
+        self.plot_buffer.clear()
+        self.expression_ring.clear()
+        self.live_plot.reset()
+        try:
+            self.feature_log = FeatureCsvLog(filename, self.window_features.names)
+            self.window_features.add_listener(self.feature_log)
+        except OSError as e:
+            self.log(f"Error creando archivo de features: {e}")
+        with self.ingest_lock:
+            self.is_recording = True
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
         self.status_label.config(text="● Capturando", foreground="green")
@@ -213,178 +281,240 @@ class FacialTrackingDashboard:
         self.log(f"Guardando datos en: {filename}")
         self.log("")
 
-        # CRÍTICO: Iniciar thread de ADB logcat para tiempo real
-        self.log("Iniciando conexión ADB para datos en tiempo real...")
-        self.adb_thread = threading.Thread(target=self.read_adb_logcat, daemon=True)
-        self.adb_thread.start()
-
-        # Iniciar actualización de gráficos
-        self.root.after(100, self.update_graphs)
+        if INGEST_MODE == 'socket':
+            self.start_stream_ingest()
+        else:
+            # CRÍTICO: Iniciar thread de ADB logcat para tiempo real
+            self.log("Iniciando conexión ADB para datos en tiempo real...")
+            self.adb_thread = threading.Thread(target=self.read_adb_logcat, daemon=True)
+            self.adb_thread.start()
+
+        # Pedir al Quest el formato compacto si está configurado (JSON sigue aceptándose)
+        if FACIAL_ENCODING != 'json':
+            self.send_command_to_quest(f"ENCODING:{FACIAL_ENCODING}")
+
+        # Iniciar el tick de la UI (métricas + gráficos)
+        self.latest_frame = None
+        self.widget_cache.invalidate()
+        if self.ui_tick_id:
+            self.root.after_cancel(self.ui_tick_id)
+        self.ui_tick_id = self.root.after(UI_TICK_MS, self.ui_tick)
 
     def stop_capture(self):
-        self.is_recording = False
+        # Espera al frame en curso; desde acá la ingesta no toca métricas, stats ni archivos
+        with self.ingest_lock:
+            self.is_recording = False
+        if self.stream_receiver:
+            self.stream_receiver.stop()
+            self.stream_receiver = None
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_label.config(text="● Detenido", foreground="orange")
-
-        if self.csv_file:
-            self.csv_file.close()
-            self.log("Archivo CSV cerrado y guardado")
-
+        self.live_plot.freeze()
+
+        recorded = None
+        if self.recording:
+            # Vacía la cola del escritor antes de cerrar el archivo
+            stats = self.recording.close()
+            self.last_recording_path = recorded = self.recording.path
+            self.recording = None
+            self.save_session_stats(self.last_recording_path)
+            self.save_blink_events(self.last_recording_path)
+            self.close_feature_log()
+            self.log(f"Archivo guardado: {stats['written']} frames, {stats['dropped']} descartados")
+
+        # Resumen de Unity que llegó mientras se grababa
+        if self.pending_summary:
+            self.attach_summary_to_session(self.pending_summary)
+            self.pending_summary = None
+
+        # Catalogar después de adjuntar el resumen: el índice lo incluye y el
+        # thread del catálogo no tiene el .h5 abierto mientras se escribe
+        if recorded:
+            self.catalog_files(recorded)
+
+        self.update_metrics_display(force=True)
         self.log("Captura detenida")
 
     def read_adb_logcat(self):
+        stream = None
         try:
-            # Limpiar logcat previo
-            subprocess.run([ADB_PATH, 'logcat', '-c'], check=True)
-
-            # Iniciar logcat filtrando por nuestro tag
-            self.adb_process = subprocess.Popen(
-                [ADB_PATH, 'logcat', '-s', 'Unity:D'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
-                bufsize=1
-            )
-
-            self.log("Conectado a Quest Pro vía ADB")
-
-            for line in self.adb_process.stdout:
+            if LOGCAT_REPLAY:
+                # Reproducir una grabación en lugar del headset
+                stream = ReplayStream(LOGCAT_REPLAY, speed=REPLAY_SPEED)
+                self.log(f"Reproduciendo {LOGCAT_REPLAY} a {REPLAY_SPEED:g}x")
+            else:
+                # Limpiar logcat previo
+                subprocess.run([ADB_PATH, 'logcat', '-c'], check=True)
+
+                # Iniciar logcat filtrando por nuestro tag (pipe binario, sin buffer de texto)
+                self.adb_process = subprocess.Popen(
+                    [ADB_PATH, 'logcat', '-s', 'Unity:D'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    bufsize=0
+                )
+                stream = self.adb_process.stdout
+
+                # Guardar también el logcat crudo para reproducirlo después
+                if LOGCAT_RECORD:
+                    stream = RecordingStream(stream, capture_filename(LOGCAT_RECORD))
+                    self.log(f"Grabando logcat crudo en: {stream.path}")
+
+                self.log("Conectado a Quest Pro vía ADB")
+
+            # El lector busca [FACIAL_DATA] a nivel de bytes y solo decodifica el JSON
+            reader = LogcatFrameReader(stream, tags=(FACIAL_DATA_TAG, FACIAL_DATA_B_TAG))
+            for tag, payload in reader:
                 if not self.is_recording:
                     break
 
-                # Buscar nuestro tag especial
-                if '[FACIAL_DATA]' in line:
-                    print(line)
-                    try:
-                        # Extraer JSON
-                        json_start = line.index('[FACIAL_DATA]') + len('[FACIAL_DATA]')
-                        json_str = line[json_start:].strip()
-
-                        import re
-                        # Reemplazar "número,número" por "número.número"
-                        json_str = re.sub(r'(\d+),(\d+)', r'\1.\2', json_str)
-
-                        # Parsear datos
-                        data = json.loads(json_str)
-                        self.process_data(data)
-
-                    except (ValueError, json.JSONDecodeError) as e:
-                        pass  # Ignorar líneas mal formadas
+                # Decodificar directo al vector preasignado (None = línea mal formada)
+                if tag == FACIAL_DATA_B_TAG:
+                    frame = parse_frame_binary(payload, self.frame_values)
+                    timestamp = frame[0] if frame else None
+                else:
+                    timestamp = decode_facial_data(payload, self.frame_values)
+                if timestamp is not None:
+                    self.process_data(timestamp, self.frame_values)
 
         except Exception as e:
             self.log(f"Error en ADB: {str(e)}")
             self.root.after(0, lambda: self.status_label.config(
                 text="● Error de conexión", foreground="red"))
+        finally:
+            # También si falla el lector o se cae adb: el .lcap crudo se vacía y se cierra
+            if stream is not None:
+                stream.close()
+
+    def start_stream_ingest(self):
+        """Recibe frames por socket TCP (adb reverse o WiFi) en lugar de logcat"""
+        ok, message = adb_reverse(ADB_PATH, STREAM_PORT)
+        self.log(message if ok else f"adb reverse no disponible ({message}), esperando conexión WiFi")
+
+        self.stream_receiver = StreamReceiver(
+            self.on_stream_frame, len(EXPRESSION_NAMES), port=STREAM_PORT,
+            on_status=lambda m: self.root.after(0, lambda: self.log(m)))
+        try:
+            self.stream_receiver.start()
+        except OSError as e:
+            self.log(f"Error iniciando servidor de frames: {e}")
+            self.stream_receiver = None
+            return
+
+        # Avisar al Quest que envíe los frames por el socket
+        self.send_command_to_quest(f"STREAM:{STREAM_PORT}")
 
-    def process_data(self, data):
-        timestamp = data.get('t', 0)
-        expressions = data.get('d', {})
-
-        # Guardar en CSV
-        for exp_id, value in expressions.items():
-            exp_id = int(exp_id)
-            exp_name = EXPRESSION_NAMES.get(exp_id, f"Unknown_{exp_id}")
-            self.csv_writer.writerow([timestamp, exp_id, exp_name, value])
-
-        # Calcular métricas derivadas
-        self.calculate_metrics(expressions, timestamp)
-
-        # Agregar a buffer para gráficos
-        self.data_buffer.append({
-            'time': timestamp,
-            'attention': self.attention_score,
-            'stress': self.stress_score,
-            'mouth': sum([expressions.get(str(i), 0) for i in KEY_EXPRESSIONS['mouth_activity']]) / 5
-        })
-
-        # Actualizar UI (thread-safe)
-        self.root.after(0, self.update_metrics_display)
-
-    def calculate_metrics(self, expressions, timestamp):
-        # Atención (basada en dirección de mirada)
-        attention_values = [expressions.get(str(i), 0) for i in KEY_EXPRESSIONS['attention']]
-        self.attention_score = 1.0 - (sum(attention_values) / len(attention_values))
-
-        # Estrés (basado en tensión de cejas)
-        stress_values = [expressions.get(str(i), 0) for i in KEY_EXPRESSIONS['brow_tension']]
-        self.stress_score = sum(stress_values) / len(stress_values)
-
-        # Detectar parpadeos
-        blink_values = [expressions.get(str(i), 0) for i in KEY_EXPRESSIONS['blink']]
-        avg_blink = sum(blink_values) / len(blink_values)
-
-        if avg_blink > 0.7 and (timestamp - self.last_blink_time) > 0.2:
-            self.blink_count += 1
-            self.last_blink_time = timestamp
-
-    def update_metrics_display(self):
-        # Actualizar etiquetas de métricas
-        self.attention_label.config(
-            text=f"Atención: {self.attention_score*100:.1f}%",
-            foreground="green" if self.attention_score > 0.7 else "orange"
-        )
-
-        self.stress_label.config(
-            text=f"Estrés: {self.stress_score*100:.1f}%",
-            foreground="red" if self.stress_score > 0.5 else "green"
-        )
-
-        self.blink_label.config(text=f"Parpadeos: {self.blink_count}")
+    def on_stream_frame(self, timestamp, values):
+        # Mismo filtro que el loop de logcat: ignorar frames fuera de captura
+        if self.is_recording:
+            self.process_data(timestamp, values)
+
+    def process_data(self, timestamp, values):
+        with self.ingest_lock:
+            if not self.is_recording:
+                return
+            # Guardar en CSV
+            recording = self.recording
+            if recording:
+                recording.write(timestamp, values)
+
+            # Calcular métricas derivadas
+            self.calculate_metrics(values, timestamp)
+            self.session_stats.update(values, self.metrics.out)
+            self.window_features.update(timestamp, values, self.metrics.out)
+            self.plot_buffer.append(timestamp, self.metrics.out)
+            self.expression_ring.append(values)
+
+            # Publicar el último frame: la UI lo lee en su propio tick (UI_TICK_MS)
+            self.latest_frame = {
+                'time': timestamp,
+                'attention': self.attention_score,
+                'stress': self.stress_score,
+                'mouth': self.mouth_score
+            }
+
+    def calculate_metrics(self, values, timestamp):
+        # Todas las métricas derivadas en un solo producto matriz-vector
+        metrics = self.metrics.compute(values)
+        index = self.metrics.index
+        self.attention_score = float(metrics[index['attention']])  # dirección de mirada
+        self.stress_score = float(metrics[index['stress']])        # tensión de cejas
+        self.mouth_score = float(metrics[index['mouth']])
+
+        # Detectar parpadeos (histéresis, ver blink_detector.py)
+        self.blink_detector.update(timestamp, metrics[index['blink']])
+        self.blink_count = self.blink_detector.blinks
+
+    def update_metrics_display(self, force=False):
+        # Último frame publicado por el thread de ingesta; si no cambió no se toca nada
+        latest = self.latest_frame
+        if latest is None or (latest is self.shown_frame and not force):
+            return
+        self.shown_frame = latest
+        ui = self.widget_cache
+
+        # Actualizar etiquetas de métricas (solo las que cambiaron)
+        ui.config(self.attention_label,
+                  text=f"Atención: {latest['attention']*100:.1f}%",
+                  foreground="green" if latest['attention'] > 0.7 else "orange")
+        ui.config(self.stress_label,
+                  text=f"Estrés: {latest['stress']*100:.1f}%",
+                  foreground="red" if latest['stress'] > 0.5 else "green")
+        ui.config(self.blink_label, text=f"Parpadeos: {self.blink_count}")
 
         # Actualizar texto de expresiones clave
-        self.key_expressions_text.delete(1.0, tk.END)
-        if self.data_buffer:
-            latest = self.data_buffer[-1]
-            self.key_expressions_text.insert(tk.END, 
-                f"Timestamp: {latest['time']:.2f}s\n\n")
-            self.key_expressions_text.insert(tk.END,
-                f"Atención: {latest['attention']*100:.1f}%\n")
-            self.key_expressions_text.insert(tk.END,
-                f"Estrés: {latest['stress']*100:.1f}%\n")
-            self.key_expressions_text.insert(tk.END,
+        text = (f"Timestamp: {latest['time']:.2f}s\n\n"
+                f"Atención: {latest['attention']*100:.1f}%\n"
+                f"Estrés: {latest['stress']*100:.1f}%\n"
                 f"Act. Boca: {latest['mouth']*100:.1f}%\n")
-
-    def update_graphs(self):
+        if self.session_stats.frames:
+            text += "\n" + self.session_stats.format_metrics(self.metrics.labels)
+        if self.window_features.latest:
+            text += "\n" + self.window_features.format_metrics(self.metrics.labels)
+        ui.set_text(self.key_expressions_text, text)
+
+    def ui_tick(self):
+        """Tick fijo de la UI: la carga no depende de cuántos frames lleguen"""
         if not self.is_recording:
             return
 
-        if len(self.data_buffer) > 1:
-            times = [d['time'] for d in self.data_buffer]
-            attention = [d['attention'] for d in self.data_buffer]
-            stress = [d['stress'] for d in self.data_buffer]
-            mouth = [d['mouth'] for d in self.data_buffer]
+        self.update_metrics_display()
+        # Solo se redibujan las líneas (blitting, ver live_plots.py)
+        self.live_plot.update(self.plot_buffer)
+        if self.heatmap:
+            self.heatmap.update()
 
-            # Limpiar y redibujar
-            self.ax1.clear()
-            self.ax2.clear()
-            self.ax3.clear()
+        # Programar siguiente tick (UI_TICK_MS o más si el dibujo excede el presupuesto)
+        self.ui_tick_id = self.root.after(max(UI_TICK_MS, self.live_plot.next_interval()), self.ui_tick)
 
-            self.ax1.plot(times, attention, 'g-', linewidth=2)
-            self.ax1.set_ylabel('Atención')
-            self.ax1.set_ylim([0, 1])
-            self.ax1.grid(True)
-
-            self.ax2.plot(times, stress, 'r-', linewidth=2)
-            self.ax2.set_ylabel('Estrés')
-            self.ax2.set_ylim([0, 1])
-            self.ax2.grid(True)
-
-            self.ax3.plot(times, mouth, 'b-', linewidth=2)
-            self.ax3.set_ylabel('Act. Boca')
-            self.ax3.set_xlabel('Tiempo (s)')
-            self.ax3.set_ylim([0, 1])
-            self.ax3.grid(True)
+    def show_heatmap_window(self):
+        """Mapa de calor en vivo de todas las expresiones (un solo imshow, ver expression_heatmap.py)"""
+        if self.heatmap_window is not None:
+            self.heatmap_window.lift()
+            return
+        window = self.heatmap_window = tk.Toplevel(self.root)
+        window.title("Mapa de Expresiones")
+        window.geometry("1000x900")
 
-            self.canvas.draw()
+        fig = Figure(figsize=(10, 9))
+        ax = fig.add_subplot(111)
+        canvas = FigureCanvasTkAgg(fig, master=window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        names = [EXPRESSION_NAMES[i] for i in range(len(EXPRESSION_NAMES))]
+        self.heatmap = HeatmapView(canvas, ax, self.expression_ring, names)
+        fig.tight_layout()
+        canvas.draw()
+        self.heatmap.update()
 
-        # Programar siguiente actualización
-        self.root.after(100, self.update_graphs)  # Actualizar cada 100ms
+        def on_close():
+            self.heatmap = self.heatmap_window = None
+            window.destroy()
+        window.protocol("WM_DELETE_WINDOW", on_close)
 
-    def log(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
+    def log(self, message, level=None):
+        # Seguro desde cualquier thread: el panel inserta en lotes en su tick
+        self.log_panel.log(message, level)
 
     def run(self):
         self.root.after(1, self.start_websocket_server)
@@ -394,6 +524,7 @@ class FacialTrackingDashboard:
     def on_closing(self):
         if self.is_recording:
             self.stop_capture()
+        self.log_panel.close()
         self.root.destroy()
 
     def start_websocket_server(self):
@@ -415,51 +546,36 @@ class FacialTrackingDashboard:
                 while True:
                     try:
                         client, address = server_socket.accept()
-                        self.log(f"Conexión recibida de {address}")
-
-                        # Recibir datos
-                        data = b""
-                        while True:
-                            chunk = client.recv(4096)
-                            if not chunk:
-                                break
-                            data += chunk
-
-                        client.close()
-
-                        # Procesar resumen recibido
-                        if data:
-                            json_data = data.decode('utf-8').strip()
-                            # Saneamiento (Si el origen es Unity, a menudo usa comillas simples o no cita bien)
-                            try:
-                                # Usar 'literal_eval' o 'demjson' si es necesario, pero probemos el más simple:
-                                # Reemplazar comillas simples por dobles para keys y values
-                                # ¡Ojo! Este es un saneamiento simple y puede fallar con strings complejos.
-                                sanitized_json_str = json_data.replace("'", '"')
-                                # Reemplazar comas decimales por puntos (si Unity serializa con coma en el resumen)
-                                import re
-                                sanitized_json_str = re.sub(r'(\d),(\d)', r'\1.\2', sanitized_json_str)
-                                self.root.after(0, lambda: self.process_session_summary(sanitized_json_str))
-                            except Exception as e:
-                                self.log(f"Error durante el saneamiento del resumen: {e}")
+                        self.root.after(0, lambda a=address: self.log(f"Conexión recibida de {a}"))
+
+                        # Recibir datos en un buffer preasignado
+                        try:
+                            payload = receive_payload(client)
+                        finally:
+                            client.close()
+
+                        # Parsear y guardar aquí (rawData puede pesar decenas de MB);
+                        # a la UI solo le llega el resumen sin rawData
+                        if payload:
+                            data, summary_file, raw_file, points = save_session_summary(payload)
+                            self.root.after(0, lambda d=data, s=summary_file, r=raw_file, n=points:
+                                            self.process_session_summary(d, s, r, n))
 
                     except Exception as e:
                         if "WinError 10054" not in str(e):  # Ignorar desconexiones normales
                             # self.log(f"Error en conexión: {e}")
-                            self.root.after(0, lambda: self.log(f"Error en conexión: {e}"))
+                            self.root.after(0, lambda e=e: self.log(f"Error en conexión: {e}"))
 
             except Exception as e:
                 # self.log(f"Error en servidor WebSocket: {e}")
-                self.root.after(0, lambda: self.log(f"Error en servidor WebSocket: {e}"))
+                self.root.after(0, lambda e=e: self.log(f"Error en servidor WebSocket: {e}"))
 
         self.websocket_thread = threading.Thread(target=server_thread, daemon=True)
         self.websocket_thread.start()
 
-    def process_session_summary(self, json_str):
-        """Procesa y muestra el resumen de sesión recibido"""
+    def process_session_summary(self, data, summary_file, raw_file=None, raw_points=0):
+        """Muestra el resumen de sesión recibido (ya guardado en disco, sin rawData)"""
         try:
-            data = json.loads(json_str)
-
             self.log("="*60)
             self.log("RESUMEN DE SESIÓN RECIBIDO")
             self.log("="*60)
@@ -482,30 +598,17 @@ class FacialTrackingDashboard:
                 self.log(f"    Avg: {values.get('avg', 0):.3f}")
 
             self.log("="*60)
-
-            # Guardar resumen completo
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            summary_file = f"results/summary/session_summary_{timestamp}.json"
-            with open(summary_file, 'w') as f:
-                json.dump(data, f, indent=2)
-
             self.log(f"Resumen guardado en: {summary_file}")
+            if raw_file:
+                self.log(f"Datos raw guardados en: {raw_file} ({raw_points} puntos)")
 
-            # Guardar datos raw en CSV
-            raw_data = data.get('rawData', [])
-            if raw_data:
-                csv_file = f"results/raw/session_raw_data_{timestamp}.csv"
-                with open(csv_file, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['Timestamp', 'Expression_ID', 'Value'])
-
-                    for point in raw_data:
-                        timestamp_val = point.get('t', 0)
-                        expressions = point.get('e', {})
-                        for exp_id, value in expressions.items():
-                            writer.writerow([timestamp_val, exp_id, value])
+            # Adjuntar el resumen a la sesión HDF5 (si aún se graba, al detener)
+            if self.recording:
+                self.pending_summary = data
+            else:
+                self.attach_summary_to_session(data)
 
-                self.log(f"Datos raw guardados en: {csv_file}")
+            self.catalog_files(summary_file)
 
             # Mostrar ventana de resumen
             self.show_summary_window(data)
@@ -592,6 +695,54 @@ MÉTRICAS PROMEDIO:
 
     # ========== CONTROL DE VIDEOS ==========
 
+    def save_session_stats(self, recording_path):
+        """Guarda las estadísticas calculadas en el PC junto a la grabación"""
+        try:
+            stats_file = self.session_stats.save(recording_path)
+            self.log(f"Estadísticas guardadas en: {stats_file}")
+        except Exception as e:
+            self.log(f"Error guardando estadísticas: {e}")
+
+    def save_blink_events(self, recording_path):
+        """Cierra el último parpadeo y guarda los eventos junto a la grabación"""
+        self.blink_detector.finish()
+        self.blink_count = self.blink_detector.blinks
+        try:
+            events_file = save_events(recording_path, self.blink_detector.events)
+            self.log(f"Parpadeos: {self.blink_count} ({len(self.blink_detector.events)} eventos) en {events_file}")
+        except Exception as e:
+            self.log(f"Error guardando parpadeos: {e}")
+
+    def close_feature_log(self):
+        """Deja de escribir los features por ventana de la sesión"""
+        if self.feature_log:
+            self.window_features.remove_listener(self.feature_log)
+            self.feature_log.close()
+            self.log(f"Features por ventana guardados en: {self.feature_log.path}")
+            self.feature_log = None
+
+    def catalog_files(self, *paths):
+        """Registra archivos en el catálogo de sesiones sin bloquear la UI"""
+        video = self.current_video
+
+        def _run():
+            try:
+                index_paths(paths, video=video)
+            except Exception as e:
+                self.root.after(0, lambda e=e: self.log(f"Error actualizando catálogo: {e}"))
+        threading.Thread(target=_run, daemon=True).start()
+
+    def attach_summary_to_session(self, data):
+        """Guarda el resumen de Unity como atributo de la última sesión .h5"""
+        path = self.last_recording_path
+        if not path or not path.endswith(HDF5_EXTENSION):
+            return
+        try:
+            attach_summary(path, data)
+            self.log(f"Resumen adjuntado a: {path}")
+        except Exception as e:
+            self.log(f"Error adjuntando resumen a {path}: {e}")
+
     def send_command_to_quest(self, command):
         """Envía un comando al Quest Pro"""
         try:
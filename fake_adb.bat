@@ -0,0 +1,3 @@
+@echo off
+rem Envoltorio para usar fake_adb.py como ADB_PATH en Windows
+python "%~dp0fake_adb.py" %*
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+fake_adb.py
+-----------
+Simulador de headset que se comporta como el binario `adb` para los
+subcomandos que usan los dashboards. Sirve para pruebas de carga y soak
+tests de horas sin Quest conectado.
+
+    adb devices
+    adb [-s SERIAL] logcat -c
+    adb [-s SERIAL] logcat -s Unity:D      -> frames [FACIAL_DATA] sintéticos
+    adb [-s SERIAL] shell "echo CMD > .../quest_cmd.txt"
+    adb [-s SERIAL] reverse tcp:PORT tcp:PORT
+
+Los comandos de `shell echo` se dejan en una cola por serial (en el
+directorio temporal) que lee el proceso `logcat` activo: LIST responde con
+[VIDEO_LIST], PLAY/NEXT/PREV cambian el video actual, ENCODING:<modo>
+cambia a [FACIAL_DATA_B] y STREAM:<puerto> manda los frames por socket a
+localhost:<puerto> en vez de logcat.
+
+Uso (.env):
+    ADB_PATH=/ruta/a/fake_adb.py        (Linux/macOS, ejecutable)
+    ADB_PATH=C:\\ruta\\a\\fake_adb.bat   (Windows)
+
+Configuración por variables de entorno (el dashboard no pasa argumentos):
+    FAKE_ADB_RATE=90            frames por segundo
+    FAKE_ADB_NOISE=smooth       smooth | random | flat
+    FAKE_ADB_DECIMAL_COMMA=0    1 = serializar como un headset con locale es-CL
+    FAKE_ADB_MALFORMED=0        fracción de líneas corruptas (0.0 - 1.0)
+    FAKE_ADB_ENCODING=json      json | f32 | f16 | u16
+    FAKE_ADB_DEVICES=1          cantidad de headsets que lista `devices`
+    FAKE_ADB_DURATION=0         segundos de logcat antes de terminar (0 = sin fin)
+    FAKE_ADB_SEED=              semilla para que la sesión sea reproducible (se combina con el serial)
+"""
+
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from facial_expressions import N_EXPRESSIONS, KEY_EXPRESSIONS
+from frame_decoder import encode_frame_binary, ENCODINGS, ENCODING_MODES
+
+RATE          = float(os.getenv("FAKE_ADB_RATE", "90"))
+NOISE         = os.getenv("FAKE_ADB_NOISE", "smooth")
+DECIMAL_COMMA = os.getenv("FAKE_ADB_DECIMAL_COMMA", "0") == "1"
+MALFORMED     = float(os.getenv("FAKE_ADB_MALFORMED", "0"))
+ENCODING      = os.getenv("FAKE_ADB_ENCODING", "json")
+DEVICES       = int(os.getenv("FAKE_ADB_DEVICES", "1"))
+DURATION      = float(os.getenv("FAKE_ADB_DURATION", "0"))
+SEED          = os.getenv("FAKE_ADB_SEED")
+
+VIDEOS = ["video_01.mp4", "video_02.mp4", "video_03.mp4", "relajacion.mp4"]
+
+STATE_DIR = os.path.join(tempfile.gettempdir(), "fake_adb")
+
+# Cada cuánto se escriben los frames pendientes (agrupados en un solo write)
+_TICK = 0.01
+
+_ECHO_RE = re.compile(r"echo\s+(.*?)\s*>\s*\S+")
+
+
+def _serials():
+    return [f"FAKEQUEST{i + 1:04d}" for i in range(DEVICES)]
+
+
+def _seed(serial):
+    """Semilla de un headset: FAKE_ADB_SEED combinada con el serial.
+
+    Cada headset emite un stream distinto pero reproducible; sin
+    FAKE_ADB_SEED se usa entropía del sistema.
+    """
+    if not SEED:
+        return None
+    return [int(SEED), zlib.crc32(serial.encode("ascii"))]
+
+
+def _command_file(serial):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, f"{serial}.cmd")
+
+
+# ── Generación de frames ──────────────────────────────────────────────────────
+
+class FrameGenerator:
+    """Valores de expresiones sintéticos según el perfil de ruido."""
+
+    def __init__(self, noise, rng):
+        self.noise = noise
+        self.rng   = rng
+        self.phase = rng.uniform(0, 2 * np.pi, N_EXPRESSIONS)
+        self.freq  = rng.uniform(0.05, 0.5, N_EXPRESSIONS)
+        self.base  = rng.uniform(0.0, 0.3, N_EXPRESSIONS)
+        self.blink = np.array(KEY_EXPRESSIONS["blink"])
+        self.next_blink = rng.uniform(2, 5)
+
+    def values(self, t):
+        if self.noise == "flat":
+            return self.base.astype(np.float32)
+        if self.noise == "random":
+            return self.rng.random(N_EXPRESSIONS, dtype=np.float32)
+
+        # smooth: sinusoides lentas + ruido gaussiano + parpadeos de ~150 ms
+        v = self.base + 0.2 * (1 + np.sin(2 * np.pi * self.freq * t + self.phase))
+        v += self.rng.normal(0, 0.02, N_EXPRESSIONS)
+        if t >= self.next_blink:
+            v[self.blink] = 0.95
+            if t >= self.next_blink + 0.15:
+                self.next_blink = t + self.rng.uniform(2, 6)
+        return np.clip(v, 0, 1).astype(np.float32)
+
+
+def format_json(t, values, decimal_comma):
+    body = ",".join(f'"{i}":{v:.4f}' for i, v in enumerate(values.tolist()))
+    text = f'{{"t":{t:.4f},"d":{{{body}}}}}'
+    if decimal_comma:
+        # Unity con locale es-CL: los decimales salen con coma
+        text = re.sub(r"(\d)\.(\d)", r"\1,\2", text)
+    return text
+
+
+def _corrupt(line, rng):
+    """Línea dañada como las que aparecen en logcat: cortada o con basura."""
+    kind = rng.integers(3)
+    if kind == 0:
+        return line[:rng.integers(1, len(line))]
+    if kind == 1:
+        return line.replace('"d":{', '"d":{"x":', 1)
+    return line[:len(line) // 2] + "\ufffd\ufffd" + line[len(line) // 2:]
+
+
+# ── Logcat ────────────────────────────────────────────────────────────────────
+
+class FakeHeadset:
+    """Estado de un `adb logcat` simulado: frames, comandos y videos."""
+
+    def __init__(self, serial):
+        self.serial   = serial
+        self.rng      = np.random.default_rng(_seed(serial))
+        self.frames   = FrameGenerator(NOISE, self.rng)
+        self.encoding = ENCODING
+        self.videos   = list(VIDEOS)
+        self.current  = self.videos[0]
+        self.seq      = 0
+        self.sock     = None
+        self.pid      = int(self.rng.integers(10000, 30000))
+
+        # Solo se atienden comandos enviados después de abrir logcat
+        self.cmd_path   = _command_file(serial)
+        self.cmd_offset = os.path.getsize(self.cmd_path) if os.path.exists(self.cmd_path) else 0
+
+    def logline(self, message, level="I"):
+        stamp = datetime.now().strftime("%m-%d %H:%M:%S.%f")[:-3]
+        return f"{stamp} {self.pid:5d} {self.pid + 26:5d} {level} Unity   : {message}\n"
+
+    def video_list(self):
+        payload = json.dumps({"videos": self.videos, "current": self.current})
+        return self.logline(f"[VIDEO_LIST]{payload}")
+
+    def poll_commands(self):
+        """Lee comandos nuevos de la cola y retorna las líneas de respuesta."""
+        try:
+            with open(self.cmd_path, "r", encoding="utf-8") as f:
+                f.seek(self.cmd_offset)
+                commands = f.read()
+                self.cmd_offset = f.tell()
+        except FileNotFoundError:
+            return []
+
+        out = []
+        for command in commands.splitlines():
+            command = command.strip()
+            name, _, arg = command.partition(":")
+            if name == "LIST":
+                out.append(self.video_list())
+            elif name in ("PLAY", "NEXT", "PREV"):
+                index = self.videos.index(self.current)
+                if name == "PLAY" and arg in self.videos:
+                    index = self.videos.index(arg)
+                elif name == "NEXT":
+                    index = (index + 1) % len(self.videos)
+                elif name == "PREV":
+                    index = (index - 1) % len(self.videos)
+                self.current = self.videos[index]
+                out.append(self.logline(f"Reproduciendo {self.current}"))
+            elif name == "ENCODING" and arg in ENCODING_MODES:
+                self.encoding = arg
+                out.append(self.logline(f"Codificación de frames: {arg}"))
+            elif name == "STREAM" and arg.isdigit():
+                self._connect_stream(int(arg), out)
+            elif command:
+                out.append(self.logline(f"Comando desconocido: {command}", level="W"))
+        return out
+
+    def _connect_stream(self, port, out):
+        try:
+            self.sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+            out.append(self.logline(f"Stream de frames conectado a localhost:{port}"))
+        except OSError as e:
+            self.sock = None
+            out.append(self.logline(f"No se pudo conectar stream a {port}: {e}", level="W"))
+
+    def frame(self, t):
+        values = self.frames.values(t)
+        if self.encoding == "json":
+            line = f"[FACIAL_DATA]{format_json(t, values, DECIMAL_COMMA)}"
+        else:
+            line = f"[FACIAL_DATA_B]{encode_frame_binary(self.seq, t, values, ENCODINGS[self.encoding])}"
+        self.seq += 1
+        if MALFORMED and self.rng.random() < MALFORMED:
+            line = _corrupt(line, self.rng)
+        return line
+
+    def run(self, out):
+        period = 1.0 / RATE if RATE > 0 else 0
+        start  = time.perf_counter()
+        sent   = 0
+        while True:
+            now = time.perf_counter()
+            t   = now - start
+            if DURATION and t >= DURATION:
+                break
+
+            lines = self.poll_commands()
+            frames = []
+            due = int(t / period) + 1 if period else sent + 100
+            while sent < due:
+                frames.append(self.frame(sent * period if period else t))
+                sent += 1
+
+            if self.sock is not None:
+                try:
+                    self.sock.sendall("".join(f + "\n" for f in frames).encode("utf-8"))
+                except OSError:
+                    self.sock = None
+                    lines.append(self.logline("Stream de frames desconectado", level="W"))
+            else:
+                lines.extend(self.logline(f) for f in frames)
+
+            if lines:
+                out.write("".join(lines).encode("utf-8"))
+                out.flush()
+
+            if period:
+                delay = start + sent * period - time.perf_counter()
+                if delay > 0:
+                    time.sleep(max(delay, _TICK))
+
+
+# ── Subcomandos ───────────────────────────────────────────────────────────────
+
+def cmd_devices():
+    print("List of devices attached")
+    for serial in _serials():
+        print(f"{serial}\tdevice")
+    print()
+    return 0
+
+
+def cmd_logcat(serial, args):
+    if "-c" in args:
+        return 0
+    headset = FakeHeadset(serial)
+    try:
+        headset.run(sys.stdout.buffer)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    return 0
+
+
+def cmd_shell(serial, args):
+    match = _ECHO_RE.search(" ".join(args))
+    if match:
+        with open(_command_file(serial), "a", encoding="utf-8") as f:
+            f.write(match.group(1).strip("'\"") + "\n")
+    return 0
+
+
+def cmd_reverse(args):
+    if len(args) == 2 and args[0].startswith("tcp:"):
+        print(args[0][4:])
+    return 0
+
+
+def main(argv):
+    serials = _serials()
+    serial  = serials[0] if serials else None
+    if argv[:1] == ["-s"]:
+        serial, argv = argv[1], argv[2:]
+        if serial not in serials:
+            sys.stderr.write(f"adb: device '{serial}' not found\n")
+            return 1
+
+    if not argv:
+        sys.stderr.write(__doc__)
+        return 1
+
+    command, args = argv[0], argv[1:]
+    if command == "devices":
+        return cmd_devices()
+    if serial is None:
+        sys.stderr.write("adb: no devices/emulators found\n")
+        return 1
+    if command == "logcat":
+        return cmd_logcat(serial, args)
+    if command == "shell":
+        return cmd_shell(serial, args)
+    if command == "reverse":
+        return cmd_reverse(args)
+
+    sys.stderr.write(f"fake_adb: subcomando no soportado: {command}\n")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,210 @@
+"""
+frame_decoder.py
+----------------
+Decodificador de los payloads [FACIAL_DATA] que envía Unity.
+
+Formato esperado (una línea por frame):
+    {"t":12.5,"d":{"0":0.01,"1":0.02,...,"62":0.0}}
+
+Unity puede serializar con coma decimal según el locale del headset
+({"t":12,5,"d":{"0":0,01,...}}). El decodificador rápido lo resuelve sin
+regex: una coma seguida de `"` es separador y cualquier otra es decimal.
+Los valores se escriben directo en un vector float32 preasignado indexado
+por ID de expresión.
+
+Si la línea no tiene exactamente esa forma (eventos de sesión, JSON con
+espacios, claves raras...) se usa el camino anterior: re.sub + json.loads.
+
+Formato compacto [FACIAL_DATA_B] (negociado con el comando ENCODING:<modo>):
+    base64( header 16 bytes little-endian | N valores )
+
+    header: uint8  versión (1)
+            uint8  formato de valores (0=float32, 1=float16, 2=uint16 [0,1])
+            uint16 cantidad de expresiones N
+            uint32 número de secuencia
+            float64 timestamp (s)
+
+Con float16 un frame de 63 expresiones ocupa 192 caracteres en logcat
+(~1 KB en JSON).
+"""
+
+import binascii
+import json
+import math
+import re
+import struct
+
+import numpy as np
+
+_LEGACY_DECIMAL_RE = re.compile(r"(\d+),(\d+)")
+
+_FRAME_HEAD = '{"t":'
+_FRAME_SEP  = ',"d":{'
+_FRAME_TAIL = "}}"
+
+
+def parse_frame(payload, out):
+    """Camino rápido. Escribe las expresiones en `out` y retorna el timestamp.
+
+    Retorna None si el payload no tiene la forma {"t":..,"d":{..}}; en ese
+    caso `out` no se modifica.
+    """
+    head, sep, tail = payload.partition(_FRAME_SEP)
+    if not sep or not head.startswith(_FRAME_HEAD) or not tail.endswith(_FRAME_TAIL):
+        return None
+
+    # '"0":0,1,"1":2' -> '0 0.1 1 2'
+    body = (tail[:-2].replace(',"', " ")
+                     .replace(",", ".")
+                     .replace('":', " ")
+                     .replace('"', ""))
+    try:
+        timestamp = float(head[len(_FRAME_HEAD):].replace(",", "."))
+        tokens = np.array(body.split(), dtype=np.float64)
+    except ValueError:
+        return None
+
+    if tokens.size % 2:
+        return None
+    keys   = tokens[0::2]
+    values = tokens[1::2]
+    n      = len(out)
+
+    if keys.size == n and (keys == np.arange(n)).all():
+        out[:] = values
+        return timestamp
+
+    # Frame parcial o desordenado: las claves deben ser IDs enteros válidos
+    ids = keys.astype(np.int64)
+    if (ids != keys).any() or (ids < 0).any() or (ids >= n).any():
+        return None
+    out[:] = 0
+    out[ids] = values
+    return timestamp
+
+
+def parse_frame_legacy(payload):
+    """Camino anterior: reemplaza comas decimales y usa json.loads.
+
+    Lanza ValueError (o json.JSONDecodeError) si la línea está mal formada.
+    """
+    return json.loads(_LEGACY_DECIMAL_RE.sub(r"\1.\2", payload))
+
+
+def frame_from_dict(data, out):
+    """Copia un frame ya parseado ({"t":..,"d":{"id":valor}}) a `out`.
+
+    El timestamp se convierte a float antes de tocar `out`; si no es un
+    número finito se lanza ValueError (los llamadores descartan el frame).
+    """
+    timestamp = float(data.get("t", 0))
+    if not math.isfinite(timestamp):
+        raise ValueError(f"timestamp inválido: {data.get('t')!r}")
+    out[:] = 0
+    n = len(out)
+    for exp_id, value in data.get("d", {}).items():
+        exp_id = int(exp_id)
+        if 0 <= exp_id < n:
+            out[exp_id] = value
+    return timestamp
+
+
+def decode_facial_data(payload, out):
+    """Decodifica un payload [FACIAL_DATA] en `out`.
+
+    Intenta el camino rápido y, si falla, el camino anterior. Retorna el
+    timestamp, o None si la línea no es un frame (mal formada o evento).
+    """
+    timestamp = parse_frame(payload, out)
+    if timestamp is not None:
+        return timestamp
+
+    try:
+        data = parse_frame_legacy(payload)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "d" not in data:
+        return None
+    try:
+        return frame_from_dict(data, out)
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+# ── Formato compacto [FACIAL_DATA_B] ───────────────────────────────────────
+
+BINARY_VERSION = 1
+
+FORMAT_FLOAT32 = 0
+FORMAT_FLOAT16 = 1
+FORMAT_UINT16  = 2
+
+# Nombre usado en el comando ENCODING:<modo> -> código de formato
+ENCODINGS = {
+    "f32": FORMAT_FLOAT32,
+    "f16": FORMAT_FLOAT16,
+    "u16": FORMAT_UINT16,
+}
+
+# Modos que acepta la variable FACIAL_ENCODING / el comando ENCODING:<modo>
+ENCODING_MODES = ("json",) + tuple(ENCODINGS)
+
+
+def encoding_mode(name):
+    """Modo de ENCODING:<modo> normalizado, o None si este decodificador no lo soporta."""
+    name = (name or "json").strip().lower()
+    return name if name in ENCODING_MODES else None
+
+
+# versión, formato, cantidad, secuencia, timestamp
+BINARY_HEADER = struct.Struct("<BBHId")
+
+_VALUE_DTYPES = {
+    FORMAT_FLOAT32: np.dtype("<f4"),
+    FORMAT_FLOAT16: np.dtype("<f2"),
+    FORMAT_UINT16:  np.dtype("<u2"),
+}
+
+_UINT16_SCALE = 1.0 / 65535.0
+
+
+def parse_frame_binary(payload, out):
+    """Decodifica un payload [FACIAL_DATA_B] en `out`.
+
+    Retorna (timestamp, seq), o None si el payload no es válido.
+    """
+    try:
+        raw = binascii.a2b_base64(payload)
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) < BINARY_HEADER.size:
+        return None
+
+    version, fmt, count, seq, timestamp = BINARY_HEADER.unpack_from(raw)
+    dtype = _VALUE_DTYPES.get(fmt)
+    if (version != BINARY_VERSION or dtype is None or count != len(out)
+            or len(raw) != BINARY_HEADER.size + count * dtype.itemsize):
+        return None
+
+    values = np.frombuffer(raw, dtype=dtype, offset=BINARY_HEADER.size, count=count)
+    if dtype.kind == "u":
+        np.multiply(values, _UINT16_SCALE, out=out, casting="unsafe")
+    else:
+        out[:] = values
+    return timestamp, seq
+
+
+def encode_frame_binary(seq, timestamp, values, fmt=FORMAT_FLOAT16):
+    """Codifica un frame en el formato [FACIAL_DATA_B] (lado emisor).
+
+    Referencia para el sender de Unity; también lo usan las herramientas de
+    prueba para generar tráfico sintético.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    header = BINARY_HEADER.pack(BINARY_VERSION, fmt, len(values), seq & 0xFFFFFFFF, timestamp)
+
+    if fmt == FORMAT_UINT16:
+        body = np.round(np.clip(values, 0.0, 1.0) * 65535.0).astype("<u2")
+    else:
+        body = values.astype(_VALUE_DTYPES[fmt])
+    return binascii.b2a_base64(header + body.tobytes(), newline=False).decode("ascii")
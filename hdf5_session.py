@@ -0,0 +1,223 @@
+"""
+hdf5_session.py
+---------------
+Backend de grabación HDF5 (h5py): un archivo .h5 por sesión.
+
+    /frames       float32 (n, 63)  chunked + shuffle + gzip, crece al grabar
+    /timestamps   float64 (n,)     mismo chunking
+    /sequence     int64   (n,)
+
+    attrs: expression_names (JSON), created, format_version,
+           video (video en reproducción al iniciar), summary (JSON del
+           resumen de Unity, sin rawData, si se recibe al terminar),
+           host_stats (JSON de estadísticas calculadas en el PC,
+           ver streaming_stats.py)
+
+Los datasets se agrandan en cada sync() del escritor y el archivo queda en
+modo SWMR, así que se puede leer mientras se graba
+(h5py.File(path, "r", swmr=True)). Después se puede leer solo un rango de
+tiempo: los timestamps se buscan con searchsorted y de /frames se leen
+únicamente los chunks del rango.
+
+Uso:
+    python hdf5_session.py info  results/full/facial_data_pc_XXXX.h5
+    python hdf5_session.py slice results/full/facial_data_pc_XXXX.h5 10 20
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+HDF5_EXTENSION = ".h5"
+FORMAT_VERSION = 1
+
+DEFAULT_CHUNK_FRAMES = 900     # ~10 s a 90 Hz por chunk
+
+
+def _require_h5py():
+    if h5py is None:
+        raise RuntimeError("h5py no está instalado (pip install h5py) y es necesario para RECORD_FORMAT=hdf5")
+
+
+class Hdf5SessionWriter:
+    """Escritor HDF5 con la misma interfaz que los writers CSV/binario."""
+
+    def __init__(self, path, names, attrs=None, chunk_frames=DEFAULT_CHUNK_FRAMES,
+                 compression="gzip", compression_opts=4):
+        _require_h5py()
+        self.path   = path
+        self.names  = list(names)
+        self.frames = 0
+        n = len(self.names)
+
+        self._file = h5py.File(path, "w", libver="latest")
+        opts = dict(compression=compression, compression_opts=compression_opts, shuffle=True)
+        self._frames = self._file.create_dataset(
+            "frames", shape=(0, n), maxshape=(None, n), dtype="f4",
+            chunks=(chunk_frames, n), **opts)
+        self._timestamps = self._file.create_dataset(
+            "timestamps", shape=(0,), maxshape=(None,), dtype="f8",
+            chunks=(chunk_frames,), **opts)
+        self._sequence = self._file.create_dataset(
+            "sequence", shape=(0,), maxshape=(None,), dtype="i8",
+            chunks=(chunk_frames,), **opts)
+
+        self._file.attrs["expression_names"] = json.dumps(self.names)
+        self._file.attrs["created"]          = time.time()
+        self._file.attrs["format_version"]   = FORMAT_VERSION
+        for key, value in (attrs or {}).items():
+            self._file.attrs[key] = value
+
+        # Desde aquí otros procesos pueden leer el archivo mientras se graba
+        self._file.swmr_mode = True
+
+        # Frames sueltos se juntan aquí hasta el próximo sync()
+        self._pending_t   = []
+        self._pending_seq = []
+        self._pending     = []
+
+    def write(self, timestamp, values, seq=None):
+        self._pending_t.append(timestamp)
+        self._pending_seq.append(self.frames if seq is None else seq)
+        self._pending.append(np.array(values, dtype=np.float32))
+        self.frames += 1
+
+    def write_many(self, timestamps, seqs, values):
+        self._flush_pending()
+        self._append(timestamps, seqs, values)
+        self.frames += len(timestamps)
+
+    def sync(self, fsync=False):
+        self._flush_pending()
+        self._file.flush()
+
+    def close(self):
+        if self._file.id.valid:
+            self._flush_pending()
+            self._file.close()
+
+    def _flush_pending(self):
+        if self._pending:
+            self._append(self._pending_t, self._pending_seq, np.stack(self._pending))
+            self._pending_t, self._pending_seq, self._pending = [], [], []
+
+    def _append(self, timestamps, seqs, values):
+        start = self._timestamps.shape[0]
+        end   = start + len(timestamps)
+        self._frames.resize(end, axis=0)
+        self._timestamps.resize(end, axis=0)
+        self._sequence.resize(end, axis=0)
+        self._frames[start:end]     = values
+        self._timestamps[start:end] = timestamps
+        self._sequence[start:end]   = seqs
+
+
+def attach_summary(path, summary):
+    """Guarda el resumen de Unity (sin rawData) como atributo de una sesión .h5."""
+    _require_h5py()
+    data = {k: v for k, v in summary.items() if k != "rawData"}
+    with h5py.File(path, "r+") as f:
+        f.attrs["summary"] = json.dumps(data)
+
+
+def attach_stats(path, stats):
+    """Guarda las estadísticas del PC (streaming_stats) como atributo de una sesión .h5."""
+    _require_h5py()
+    with h5py.File(path, "r+") as f:
+        f.attrs["host_stats"] = json.dumps(stats)
+
+
+class Hdf5SessionReader:
+    """Lectura de una sesión .h5 con acceso por rango de tiempo."""
+
+    def __init__(self, path):
+        _require_h5py()
+        self.path  = path
+        self._file = h5py.File(path, "r")
+        self.frames     = self._file["frames"]
+        self.timestamps = self._file["timestamps"]
+        self.sequence   = self._file["sequence"]
+        self.names   = json.loads(self._file.attrs["expression_names"])
+        self.created = float(self._file.attrs["created"])
+        self.video   = self._file.attrs.get("video", "")
+        summary = self._file.attrs.get("summary")
+        self.summary = json.loads(summary) if summary else None
+        host_stats = self._file.attrs.get("host_stats")
+        self.host_stats = json.loads(host_stats) if host_stats else None
+        self._times  = None
+
+    def __len__(self):
+        return self.timestamps.shape[0]
+
+    def index_range(self, t0, t1):
+        """Índices [i0, i1) de los frames con t0 <= timestamp < t1."""
+        if self._times is None:
+            self._times = self.timestamps[:]
+        return (int(np.searchsorted(self._times, t0, side="left")),
+                int(np.searchsorted(self._times, t1, side="left")))
+
+    def time_range(self, t0, t1):
+        """(timestamps, frames) entre t0 y t1; solo se leen esos chunks."""
+        i0, i1 = self.index_range(t0, t1)
+        return self._times[i0:i1], self.frames[i0:i1]
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def _info(args):
+    with Hdf5SessionReader(args.path) as reader:
+        print(f"Creado:      {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reader.created))}")
+        print(f"Expresiones: {len(reader.names)}")
+        print(f"Frames:      {len(reader)}")
+        if len(reader):
+            print(f"Tiempo:      {reader.timestamps[0]:.2f}s - {reader.timestamps[-1]:.2f}s")
+        print(f"Video:       {reader.video or '-'}")
+        print(f"Resumen:     {'sí' if reader.summary else 'no'}")
+        print(f"Estadísticas:{' sí' if reader.host_stats else ' no'}")
+        dset = reader.frames
+        print(f"Chunks:      {dset.chunks} ({dset.compression}, {dset.id.get_storage_size()} bytes)")
+
+
+def _slice(args):
+    with Hdf5SessionReader(args.path) as reader:
+        times, frames = reader.time_range(args.t0, args.t1)
+        print(f"{len(times)} frames entre {args.t0}s y {args.t1}s")
+        if len(times):
+            print("Promedio por expresión (top 5):")
+            means = frames.mean(axis=0)
+            for i in np.argsort(means)[::-1][:5]:
+                print(f"  {reader.names[i]:<22} {means[i]:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sesiones HDF5")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("info", help="resumen de la sesión")
+    p.add_argument("path")
+    p.set_defaults(func=_info)
+
+    p = sub.add_parser("slice", help="leer un rango de tiempo")
+    p.add_argument("path")
+    p.add_argument("t0", type=float)
+    p.add_argument("t1", type=float)
+    p.set_defaults(func=_slice)
+
+    args = parser.parse_args()
+    args.func(args)
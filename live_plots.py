@@ -0,0 +1,159 @@
+"""
+live_plots.py
+-------------
+Gráficos en tiempo real con blitting.
+
+Antes cada 100 ms se hacía ax.clear() en los tres ejes, se volvía a
+graficar todo (títulos, límites, grilla) y se redibujaba la figura
+completa con canvas.draw(): el mayor costo de CPU del dashboard.
+
+Ahora:
+- Las líneas (Line2D) se crean una sola vez, con animated=True, y en cada
+  tick solo se les cambian los datos con set_data().
+- El fondo de cada eje (ejes, títulos, grilla, ticks) se dibuja una vez y
+  se guarda con copy_from_bbox; en cada tick se restaura el fondo, se
+  dibujan solo las líneas y se hace blit del área del eje.
+- El eje X avanza por páginas: cuando los datos llegan al borde derecho
+  se corre PAGE del ancho y recién ahí se redibuja todo (una vez cada
+  varios segundos en lugar de 10 veces por segundo). Un resize también
+  redibuja y vuelve a guardar el fondo (draw_event).
+- Los datos se piden a un LodStore (lod_store.py) con ~1 bucket por
+  pixel del eje: el costo de dibujo es el mismo con 10 segundos que con
+  la sesión completa. Cuando cada pixel resume varios frames la línea
+  pasa por el centro de cada bucket y una banda translúcida (un Polygon
+  relleno, mucho más barato que trazar el zigzag min/max) muestra el
+  rango, así los picos no se pierden.
+- Presupuesto por tick: se mide lo que tarda cada tick y el siguiente se
+  programa para que graficar no use más de PLOT_BUDGET de la UI (si hay
+  muchas series o la máquina es lenta, baja la tasa de refresco en lugar
+  de trabar la interfaz).
+
+Los datos vienen de un LodStore en el que el thread de ingesta escribe
+cada frame. HISTORY_SECONDS fija el ancho visible; con 0 (o "session")
+se ve la sesión completa y el eje X crece por páginas desde el inicio.
+
+    HISTORY_SECONDS=10     (opcional: segundos de historia visibles, 0 = sesión completa)
+    PLOT_BUDGET=0.25       (opcional: fracción máxima del tiempo de UI para graficar)
+"""
+
+import os
+import time
+
+import numpy as np
+from matplotlib.patches import Polygon
+
+PAGE = 0.25             # fracción del ancho que avanza el eje X al llegar al borde
+MIN_SPAN = 10.0         # ancho mínimo del eje X en modo sesión completa (segundos)
+
+
+def history_seconds(value=None):
+    """Segundos visibles según HISTORY_SECONDS (0 = sesión completa)."""
+    value = str(value if value is not None else os.getenv("HISTORY_SECONDS", "10")).strip().lower()
+    if value in ("0", "session", "all", ""):
+        return 0.0
+    return float(value)
+
+
+class LivePlot:
+    """Líneas persistentes sobre ejes existentes, redibujadas con blitting."""
+
+    def __init__(self, canvas, seconds=None, interval_ms=100, budget=None):
+        self.canvas   = canvas
+        self.seconds  = history_seconds(seconds)
+        self.interval_ms = interval_ms
+        self.budget   = budget or float(os.getenv("PLOT_BUDGET", "0.25"))
+        self.axes     = []
+        self.lines    = []          # (Line2D, banda min/max, columna del LodStore)
+        self.cost     = 0.0         # segundos por tick (EWMA)
+        self.full_draws = 0
+        self._backgrounds = None
+        self._xlim = None
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def add_line(self, ax, column, fmt="-", **kwargs):
+        """Agrega una serie (columna del LodStore) al eje `ax`."""
+        line, = ax.plot([], [], fmt, animated=True, **kwargs)
+        band = Polygon(np.zeros((1, 2)), closed=True, facecolor=line.get_color(),
+                       alpha=0.3, linewidth=0, animated=True, visible=False)
+        ax.add_patch(band)
+        self.lines.append((line, band, column))
+        if ax not in self.axes:
+            self.axes.append(ax)
+        return line
+
+    def _on_draw(self, event):
+        # Cada redibujo completo (paginado, resize) renueva el fondo guardado
+        self._backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+
+    def _set_xlim(self, t_first, t_last):
+        if self.seconds:
+            right = t_last + self.seconds * PAGE
+            self._xlim = (right - self.seconds, right)
+        else:
+            # Sesión completa: el ancho crece PAGE de lo transcurrido en cada página
+            span = max(t_last - t_first, MIN_SPAN)
+            self._xlim = (t_first, t_last + span * PAGE)
+        for ax in self.axes:
+            ax.set_xlim(self._xlim)
+
+    def update(self, store):
+        """Un tick: actualiza las líneas con lo visible del LodStore y hace blit."""
+        start = time.perf_counter()
+        if len(store) < 2:
+            return
+        t_last = store.last_time
+
+        full = (self._backgrounds is None or self._xlim is None
+                or not self._xlim[0] <= t_last <= self._xlim[1])
+        if full:
+            self._set_xlim(store.first_time, t_last)
+
+        # ~1 bucket por pixel del eje más ancho, una consulta para todas las series
+        width = max(max(int(ax.bbox.width) for ax in self.axes), 100)
+        t, low, high = store.query(self._xlim[0], self._xlim[1], width)
+        envelope = high is not low      # mismo array = frames crudos, sin banda
+        middle = (low + high) * 0.5 if envelope else low
+        m = len(t)
+        for line, band, column in self.lines:
+            line.set_data(t, middle[:, column])
+            band.set_visible(envelope)
+            if envelope:
+                xy = np.empty((2 * m, 2))
+                xy[:m, 0], xy[:m, 1] = t, high[:, column]
+                xy[m:, 0], xy[m:, 1] = t[::-1], low[::-1, column]
+                band.set_xy(xy)
+
+        if full:
+            self.canvas.draw()      # dispara _on_draw (fondo sin las líneas animadas)
+            self.full_draws += 1
+        for ax, background in zip(self.axes, self._backgrounds):
+            self.canvas.restore_region(background)
+            for line, band, _ in self.lines:
+                if line.axes is ax:
+                    ax.draw_artist(band)
+                    ax.draw_artist(line)
+            self.canvas.blit(ax.bbox)
+
+        elapsed = time.perf_counter() - start
+        self.cost = elapsed if not self.cost else 0.8 * self.cost + 0.2 * elapsed
+
+    def next_interval(self):
+        """Milisegundos hasta el próximo tick, respetando el presupuesto de UI."""
+        return max(self.interval_ms, int(self.cost / self.budget * 1000))
+
+    def reset(self):
+        """Nueva sesión: líneas vacías y animadas, el eje X se ubica con los primeros datos."""
+        self._xlim = None
+        self._backgrounds = None
+        for line, band, _ in self.lines:
+            line.set_data([], [])
+            line.set_animated(True)
+            band.set_visible(False)
+            band.set_animated(True)
+
+    def freeze(self):
+        """Deja las líneas en el dibujo normal (al detener, sobreviven a un resize)."""
+        for line, band, _ in self.lines:
+            line.set_animated(False)
+            band.set_animated(False)
+        self.canvas.draw_idle()
@@ -0,0 +1,146 @@
+"""
+lod_store.py
+------------
+Historia de las series de los gráficos en varias resoluciones (pirámide
+min/max), para mostrar desde unos segundos hasta la sesión completa con
+el mismo costo de dibujo.
+
+- Nivel 0: los frames tal cual (timestamp + una columna por serie).
+- Nivel k: cada bucket resume FACTOR buckets del nivel k-1 con su mínimo
+  y su máximo por serie (y el timestamp de su primer frame).
+
+Los niveles se arman de forma incremental al agregar cada frame: cuando
+un nivel completa FACTOR elementos se agrega uno al siguiente (O(1)
+amortizado, sin recorrer la historia).
+
+query(t0, t1, max_points) elige el nivel más fino que entra en
+`max_points` buckets (~1 por pixel) y devuelve la envolvente min/max de
+cada bucket, así un pico de un solo frame sigue viéndose en una sesión de
+media hora. El borde derecho, que todavía no completa un bucket del nivel
+elegido, se completa con los niveles más finos y los últimos frames
+crudos.
+
+Se guarda la sesión completa (4 métricas a 90 Hz son ~10 MB por hora);
+clear() al empezar una captura.
+"""
+
+import threading
+
+import numpy as np
+
+FACTOR = 8
+
+
+class _Level:
+    """Buckets de un nivel: timestamp del primer frame, mínimo y máximo por serie."""
+
+    def __init__(self, n_series, capacity, envelope=True):
+        self.t  = np.zeros(capacity, dtype=np.float64)
+        self.mn = np.zeros((capacity, n_series), dtype=np.float32)
+        # En el nivel 0 mínimo y máximo son el mismo valor: solo se guarda mn
+        self.mx = np.zeros((capacity, n_series), dtype=np.float32) if envelope else self.mn
+        self.count = 0
+
+    def grow(self):
+        shared = self.mx is self.mn
+        capacity = len(self.t) * 2
+        for name in ("t", "mn") if shared else ("t", "mn", "mx"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        if shared:
+            self.mx = self.mn
+
+
+class LodStore:
+    """Pirámide min/max de series con timestamps crecientes."""
+
+    def __init__(self, n_series, factor=FACTOR, capacity=4096):
+        self.n_series = n_series
+        self.factor   = factor
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._raw    = _Level(self.n_series, self._capacity, envelope=False)
+            self._levels = []
+
+    def __len__(self):
+        return self._raw.count
+
+    @property
+    def first_time(self):
+        return self._raw.t[0] if self._raw.count else None
+
+    @property
+    def last_time(self):
+        return self._raw.t[self._raw.count - 1] if self._raw.count else None
+
+    def append(self, t, values):
+        """Agrega un frame (thread de ingesta)."""
+        with self._lock:
+            raw = self._raw
+            if raw.count == len(raw.t):
+                raw.grow()
+            i = raw.count
+            raw.t[i] = t
+            raw.mn[i] = values
+            raw.count += 1
+
+            # Cascada: cada FACTOR elementos completos de un nivel generan uno del siguiente
+            source, level = raw, 0
+            while source.count % self.factor == 0:
+                if level == len(self._levels):
+                    self._levels.append(_Level(self.n_series, max(len(source.t) // self.factor, 16)))
+                target = self._levels[level]
+                if target.count == len(target.t):
+                    target.grow()
+                start = source.count - self.factor
+                j = target.count
+                target.t[j] = source.t[start]
+                np.min(source.mn[start:source.count], axis=0, out=target.mn[j])
+                np.max(source.mx[start:source.count], axis=0, out=target.mx[j])
+                target.count += 1
+                source, level = target, level + 1
+
+    def query(self, t0, t1, max_points):
+        """Buckets entre t0 y t1: (timestamps (m,), mínimos (m, series), máximos (m, series)).
+
+        Usa el nivel más fino con a lo sumo ~`max_points` buckets en el rango.
+        Si alcanzan los frames crudos, mínimos y máximos son el mismo array.
+        """
+        with self._lock:
+            raw = self._raw
+            ts = raw.t[:raw.count]
+            # Un frame antes del borde para que la línea entre desde afuera
+            i0 = max(int(np.searchsorted(ts, t0)) - 1, 0)
+            i1 = int(np.searchsorted(ts, t1, side="right"))
+            n = i1 - i0
+
+            level, size = 0, 1
+            while level < len(self._levels) and n // size > max_points:
+                level += 1
+                size *= self.factor
+            if level == 0:
+                values = raw.mn[i0:i1].copy()
+                return ts[i0:i1].copy(), values, values
+
+            times, lows, highs = [], [], []
+            pos = i0 - i0 % size
+            for k in range(level, 0, -1):
+                bucket = self.factor ** k
+                lv = self._levels[k - 1]
+                b0, b1 = pos // bucket, min(i1 // bucket, lv.count)
+                if b1 > b0:
+                    times.append(lv.t[b0:b1])
+                    lows.append(lv.mn[b0:b1])
+                    highs.append(lv.mx[b0:b1])
+                    pos = b1 * bucket
+            # Frames que todavía no completan un bucket
+            times.append(ts[pos:i1])
+            lows.append(raw.mn[pos:i1])
+            highs.append(raw.mn[pos:i1])
+            return np.concatenate(times), np.concatenate(lows), np.concatenate(highs)
@@ -0,0 +1,149 @@
+"""
+log_panel.py
+------------
+Log de los dashboards: acotado, seguro entre threads y con inserción en lotes.
+
+Antes log() insertaba cada mensaje en un ScrolledText sin límite y hacía
+see(END) por mensaje; varios threads lo llamaban sin pasar por Tk y un
+resumen de sesión agregaba decenas de líneas de a una.
+
+Ahora log() se puede llamar desde cualquier thread y solo agrega la línea
+a un ring de LOG_MAX_LINES (nunca toca Tk ni el disco, así que no frena la
+captura). La UI vacía lo pendiente en un solo insert por tick, recorta el
+widget a LOG_MAX_LINES líneas y hace un solo see(END).
+
+Severidad: DEBUG / INFO / WARNING / ERROR (las de logging). Si no se pasa,
+se deduce del mensaje ("✗" o "error" -> ERROR, "⚠" -> WARNING). En el
+panel se muestran las >= LOG_LEVEL; los errores en rojo.
+
+Opcionalmente todo se copia a un archivo rotativo (RotatingFileHandler)
+que escribe un thread aparte (QueueHandler + QueueListener).
+
+    LOG_MAX_LINES=2000          (opcional: líneas que guarda el panel)
+    LOG_LEVEL=INFO              (opcional: severidad mínima en el panel)
+    LOG_FILE=results/logs/dashboard.log   (opcional: copia en archivo rotativo)
+    LOG_FILE_MAX_BYTES=5000000  (opcional: tamaño antes de rotar)
+    LOG_FILE_BACKUPS=3          (opcional: archivos rotados que se conservan)
+"""
+
+import logging
+import os
+import queue
+from collections import deque
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LEVEL_COLORS = {logging.DEBUG: "gray", logging.WARNING: "orange", logging.ERROR: "red"}
+
+
+def guess_level(message):
+    """Severidad de un mensaje sin nivel explícito, por su texto."""
+    text = message.lower()
+    if message.startswith("✗") or "error" in text:
+        return logging.ERROR
+    if message.startswith("⚠") or "advertencia" in text:
+        return logging.WARNING
+    return logging.INFO
+
+
+def _parse_level(level):
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    return value if isinstance(value, int) else logging.INFO
+
+
+class LogPanel:
+    """Ring de líneas de log que se vuelcan a un Text de Tk en lotes."""
+
+    def __init__(self, max_lines=None, level=None, log_file=None):
+        self.max_lines = max_lines or int(os.getenv("LOG_MAX_LINES", "2000"))
+        self.level     = _parse_level(level or os.getenv("LOG_LEVEL", "INFO"))
+        # deque.append/popleft son atómicos: no hace falta lock entre threads
+        self._pending  = deque(maxlen=self.max_lines)
+        self.widget    = None
+        self.root      = None
+        self._lines    = 0
+        self._after_id = None
+        self._file_logger = None
+        self._listener    = None
+        log_file = log_file or os.getenv("LOG_FILE")
+        if log_file:
+            self._open_file(log_file)
+
+    def _open_file(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=int(os.getenv("LOG_FILE_MAX_BYTES", "5000000")),
+            backupCount=int(os.getenv("LOG_FILE_BACKUPS", "3")), encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        # El archivo lo escribe el thread del listener, no el que llama a log()
+        records = queue.SimpleQueue()
+        self._listener = QueueListener(records, handler)
+        self._listener.start()
+        self._file_logger = logging.getLogger(f"{__name__}.{id(self)}")
+        self._file_logger.setLevel(logging.DEBUG)
+        self._file_logger.propagate = False
+        self._file_logger.addHandler(QueueHandler(records))
+        self.file_path = path
+
+    def log(self, message, level=None):
+        """Agrega un mensaje (cualquier thread)."""
+        level = guess_level(message) if level is None else level
+        if self._file_logger is not None:
+            self._file_logger.log(level, message)
+        if level >= self.level:
+            self._pending.append((level, f"[{datetime.now():%H:%M:%S}] {message}\n"))
+
+    def attach(self, widget, root, interval_ms=100):
+        """Empieza a volcar el log en `widget` cada `interval_ms` (thread de Tk)."""
+        self.widget = widget
+        self.root   = root
+        for level, color in LEVEL_COLORS.items():
+            widget.tag_configure(logging.getLevelName(level), foreground=color)
+        self._interval = interval_ms
+        self._tick()
+
+    def _tick(self):
+        self.flush()
+        self._after_id = self.root.after(self._interval, self._tick)
+
+    def flush(self):
+        """Inserta todo lo pendiente de una vez y recorta el widget (thread de Tk)."""
+        if self.widget is None or not self._pending:
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._pending.popleft())
+            except IndexError:
+                break
+
+        # Un insert por racha de mensajes con la misma severidad
+        start = 0
+        for i in range(1, len(batch) + 1):
+            if i == len(batch) or batch[i][0] != batch[start][0]:
+                level = batch[start][0]
+                text = "".join(line for _, line in batch[start:i])
+                if level in LEVEL_COLORS:
+                    self.widget.insert("end", text, logging.getLevelName(level))
+                else:
+                    self.widget.insert("end", text)
+                self._lines += text.count("\n")
+                start = i
+
+        excess = self._lines - self.max_lines
+        if excess > 0:
+            self.widget.delete("1.0", f"{excess + 1}.0")
+            self._lines = self.max_lines
+        self.widget.see("end")
+
+    def close(self):
+        if self._after_id is not None and self.root is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
@@ -0,0 +1,221 @@
+"""
+logcat_capture.py
+-----------------
+Grabación y reproducción de streams crudos de `adb logcat`.
+
+RecordingStream envuelve el stdout de logcat: cada bloque leído se pasa al
+lector normalmente y se guarda en un archivo .lcap junto con el instante en
+que llegó al PC. ReplayStream lee ese archivo y entrega los mismos bytes al
+mismo pipeline (LogcatFrameReader -> decodificador -> métricas) a 1x, a Nx
+o lo más rápido posible, sin headset.
+
+Formato .lcap:
+    header: b"LCAP" | uint16 versión | float64 fecha de inicio (epoch)
+    bloques: float64 segundos desde el inicio | uint32 largo | bytes
+
+Uso:
+    python logcat_capture.py record sesion.lcap         # graba hasta Ctrl+C
+    python logcat_capture.py replay sesion.lcap -s 4    # mide el pipeline a 4x
+    python logcat_capture.py replay sesion.lcap -s 0    # lo más rápido posible
+    python logcat_capture.py info sesion.lcap
+"""
+
+import argparse
+import os
+import struct
+import subprocess
+import time
+from datetime import datetime
+
+MAGIC   = b"LCAP"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHd")
+_BLOCK  = struct.Struct("<dI")
+
+
+def capture_filename(folder):
+    """Ruta con timestamp para una nueva grabación dentro de `folder`."""
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"logcat_{datetime.now().strftime('%Y%m%d_%H%M%S')}.lcap")
+
+
+class RecordingStream:
+    """Stream binario que guarda en `path` todo lo que se lee de `stream`."""
+
+    def __init__(self, stream, path):
+        self.stream = stream
+        self.path   = path
+        self._file  = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._t0    = time.perf_counter()
+        self.bytes_recorded = 0
+
+    def readinto(self, buffer):
+        n = self.stream.readinto(buffer)
+        if n:
+            self._file.write(_BLOCK.pack(time.perf_counter() - self._t0, n))
+            self._file.write(memoryview(buffer)[:n])
+            self.bytes_recorded += n
+        else:
+            self.close()
+        return n
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class ReplayStream:
+    """Stream binario que reproduce un .lcap respetando los tiempos de llegada.
+
+    speed=1 reproduce en tiempo real, speed=N N veces más rápido y speed=0
+    sin esperas.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.path  = path
+        self.speed = speed
+        self._file = open(path, "rb")
+        magic, version, self.started_at = _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            self._file.close()
+            raise ValueError(f"{path} no es una grabación de logcat válida")
+
+        self._pending = memoryview(b"")
+        self._t0 = None
+
+    def readinto(self, buffer):
+        if not self._pending:
+            block = self._file.read(_BLOCK.size)
+            if len(block) < _BLOCK.size:
+                self.close()
+                return 0
+            offset, length = _BLOCK.unpack(block)
+            self._pending = memoryview(self._file.read(length))
+
+            if self.speed > 0:
+                now = time.perf_counter()
+                if self._t0 is None:
+                    self._t0 = now - offset / self.speed
+                delay = self._t0 + offset / self.speed - now
+                if delay > 0:
+                    time.sleep(delay)
+
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_info(path):
+    """Duración, bloques y bytes de una grabación."""
+    with open(path, "rb") as f:
+        magic, version, started_at = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} no es una grabación de logcat válida")
+        blocks = total = 0
+        offset = 0.0
+        while True:
+            block = f.read(_BLOCK.size)
+            if len(block) < _BLOCK.size:
+                break
+            offset, length = _BLOCK.unpack(block)
+            f.seek(length, os.SEEK_CUR)
+            blocks += 1
+            total  += length
+    return {"started_at": started_at, "duration": offset, "blocks": blocks, "bytes": total}
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def _record(args):
+    adb = os.getenv("ADB_PATH", "adb")
+    cmd = [adb] + (["-s", args.serial] if args.serial else [])
+    subprocess.run(cmd + ["logcat", "-c"], timeout=5)
+    process = subprocess.Popen(cmd + ["logcat", "-s", "Unity:D"],
+                               stdout=subprocess.PIPE, bufsize=0)
+    stream = RecordingStream(process.stdout, args.path)
+    buffer = bytearray(64 * 1024)
+    print(f"Grabando logcat en {args.path} (Ctrl+C para terminar)")
+    try:
+        while stream.readinto(buffer):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        process.terminate()
+        stream.close()
+    print(f"✓ {stream.bytes_recorded} bytes grabados")
+
+
+def _replay(args):
+    # Importes locales: grabar no necesita numpy
+    import numpy as np
+    from facial_expressions import N_EXPRESSIONS
+    from frame_decoder import decode_facial_data, parse_frame_binary
+    from logcat_reader import LogcatFrameReader, FACIAL_DATA_TAG, FACIAL_DATA_B_TAG
+
+    values = np.zeros(N_EXPRESSIONS, dtype=np.float32)
+    stream = ReplayStream(args.path, speed=args.speed)
+    reader = LogcatFrameReader(stream)
+    frames = bad = 0
+
+    start = time.perf_counter()
+    for tag, payload in reader:
+        if tag == FACIAL_DATA_B_TAG:
+            ok = parse_frame_binary(payload, values) is not None
+        elif tag == FACIAL_DATA_TAG:
+            ok = decode_facial_data(payload, values) is not None
+        else:
+            continue
+        frames += ok
+        bad    += not ok
+    elapsed = time.perf_counter() - start
+
+    print(f"Frames:      {frames} ({bad} inválidos)")
+    print(f"Bytes:       {reader.bytes_read / 1e6:.1f} MB")
+    print(f"Tiempo:      {elapsed:.2f}s")
+    if elapsed > 0:
+        print(f"Throughput:  {frames / elapsed:.0f} frames/s, {reader.bytes_read / 1e6 / elapsed:.1f} MB/s")
+
+
+def _info(args):
+    info = read_info(args.path)
+    print(f"Inicio:    {datetime.fromtimestamp(info['started_at']):%Y-%m-%d %H:%M:%S}")
+    print(f"Duración:  {info['duration']:.1f}s")
+    print(f"Bloques:   {info['blocks']}")
+    print(f"Bytes:     {info['bytes']}")
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Grabación y reproducción de logcat crudo")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("record", help="grabar logcat del headset")
+    p.add_argument("path")
+    p.add_argument("--serial", help="serial del headset (si hay varios)")
+    p.set_defaults(func=_record)
+
+    p = sub.add_parser("replay", help="reproducir por el pipeline y medir throughput")
+    p.add_argument("path")
+    p.add_argument("-s", "--speed", type=float, default=0,
+                   help="1 = tiempo real, N = N veces más rápido, 0 = sin esperas")
+    p.set_defaults(func=_replay)
+
+    p = sub.add_parser("info", help="resumen de una grabación")
+    p.add_argument("path")
+    p.set_defaults(func=_info)
+
+    args = parser.parse_args()
+    args.func(args)
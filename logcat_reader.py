@@ -0,0 +1,98 @@
+"""
+logcat_reader.py
+----------------
+Lector binario de `adb logcat` para los dashboards.
+
+En vez de iterar línea a línea en modo texto, lee el pipe en bloques grandes
+con `readinto` sobre un `bytearray` reutilizable y busca los tags de interés
+([FACIAL_DATA], [FACIAL_DATA_B], [VIDEO_LIST]) directamente sobre los bytes.
+Solo se decodifica el payload de las líneas que contienen un tag; el resto
+del ruido de Unity nunca se convierte a str.
+
+Uso:
+    proc = subprocess.Popen([ADB_PATH, "logcat", "-s", "Unity:D"],
+                            stdout=subprocess.PIPE, bufsize=0)
+    for tag, payload in LogcatFrameReader(proc.stdout):
+        ...
+"""
+
+FACIAL_DATA_TAG   = b"[FACIAL_DATA]"
+FACIAL_DATA_B_TAG = b"[FACIAL_DATA_B]"   # frame compacto en base64
+VIDEO_LIST_TAG    = b"[VIDEO_LIST]"
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class LogcatFrameReader:
+    """Itera (tag, payload) sobre un stream binario de logcat.
+
+    `tag` es el marcador encontrado (bytes) y `payload` el resto de la línea
+    después del marcador, ya decodificado y sin espacios/CR al final.
+    """
+
+    def __init__(self, stream, tags=(FACIAL_DATA_TAG, FACIAL_DATA_B_TAG, VIDEO_LIST_TAG),
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.stream = stream
+        self.tags   = tuple(tags)
+        self._buf   = bytearray(chunk_size)
+
+        # Contadores para diagnóstico
+        self.bytes_read = 0
+        self.matches    = 0
+
+    def __iter__(self):
+        buf   = self._buf
+        view  = memoryview(buf)
+        start = 0   # inicio de la primera línea pendiente
+        end   = 0   # fin de los datos válidos en el buffer
+
+        while True:
+            if end == len(buf):
+                if start == 0:
+                    # Línea más larga que el buffer: duplicar tamaño
+                    view.release()
+                    buf.extend(bytes(len(buf)))
+                    view = memoryview(buf)
+                else:
+                    # Mover la línea incompleta al inicio del buffer
+                    pending = end - start
+                    buf[:pending] = bytes(view[start:end])
+                    start, end = 0, pending
+
+            n = self.stream.readinto(view[end:])
+            if not n:
+                break
+            end += n
+            self.bytes_read += n
+
+            # Solo se procesa hasta el último salto de línea completo
+            limit = buf.rfind(b"\n", start, end)
+            if limit < 0:
+                continue
+
+            # Próxima aparición de cada tag dentro de la zona completa
+            hits = [buf.find(tag, start, limit) for tag in self.tags]
+            while True:
+                pos, idx = -1, -1
+                for i, h in enumerate(hits):
+                    if h >= 0 and (pos < 0 or h < pos):
+                        pos, idx = h, i
+                if pos < 0:
+                    break
+
+                tag = self.tags[idx]
+                nl  = buf.find(b"\n", pos, limit + 1)
+                payload = str(view[pos + len(tag):nl], "utf-8", "replace").strip()
+                self.matches += 1
+                yield tag, payload
+
+                # Recalcular solo los tags que quedaron dentro de la línea consumida
+                for i, h in enumerate(hits):
+                    if 0 <= h <= nl:
+                        hits[i] = buf.find(self.tags[i], nl + 1, limit)
+
+            start = limit + 1
+            if start == end:
+                start = end = 0
+
+        view.release()
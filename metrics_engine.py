@@ -0,0 +1,278 @@
+"""
+metrics_engine.py
+-----------------
+Métricas derivadas (atención, estrés, boca, parpadeo, ...) como una
+combinación lineal de las 63 expresiones:
+
+    métricas = transform(W @ valores + b)    y opcionalmente suavizadas (EWMA)
+
+Las métricas se definen en metrics.json (o en METRICS_CONFIG); sin archivo
+se usan las de DEFAULT_METRICS. W (métricas x 63), b, los umbrales y los
+factores de suavizado se arman una sola vez al iniciar, así que por frame
+no se recorren listas en Python: es un producto matriz-vector sobre un
+buffer preasignado y un par de operaciones in-place. Para sesiones grabadas
+se usa el mismo W con un producto matriz-matriz (compute_batch), por lo que
+el camino en vivo y el offline dan los mismos números.
+
+Cada definición es un dict:
+    name         nombre de la métrica
+    label        texto para la UI (opcional, por defecto el nombre)
+    expressions  lista de IDs o nombres (promedio), o {ID o nombre: peso}
+    scale, bias  métrica = scale * sum(w_i * v_i) + bias
+    transform    none | clip (0..1) | abs | square | sigmoid
+    threshold    umbral de la métrica (ej. ojos cerrados para parpadeo)
+    smoothing    peso del valor anterior en un EWMA por frame, en [0, 1)
+                 (0 o ausente = sin suavizar)
+
+La métrica "blink" además acepta release, min_duration, merge_gap y
+max_blink para el detector de parpadeos (ver blink_detector.py).
+
+Agregar métricas no agrega costo por frame en Python: solo filas a W.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from facial_expressions import EXPRESSION_NAMES, KEY_EXPRESSIONS, N_EXPRESSIONS
+
+DEFAULT_METRICS_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics.json")
+
+DEFAULT_METRICS = [
+    # Atención: 1 - mirada hacia abajo/arriba
+    {"name": "attention", "label": "Atención", "expressions": KEY_EXPRESSIONS["attention"],
+     "scale": -1.0, "bias": 1.0},
+    # Estrés: tensión de cejas
+    {"name": "stress", "label": "Estrés", "expressions": KEY_EXPRESSIONS["brow_tension"]},
+    {"name": "mouth",  "label": "Act. Boca", "expressions": KEY_EXPRESSIONS["mouth_activity"]},
+    # Cierre de ojos promedio (entrada del detector de parpadeos)
+    {"name": "blink",  "label": "Ojos cerrados", "expressions": KEY_EXPRESSIONS["blink"],
+     "threshold": 0.7, "release": 0.4},
+]
+
+# Métricas que usan los dashboards y el capture manager por nombre
+LIVE_METRICS = ("attention", "stress", "mouth", "blink")
+
+_EXPRESSION_IDS = {name: i for i, name in EXPRESSION_NAMES.items()}
+
+
+# Frames máximos por bloque del EWMA vectorizado (compute_batch)
+_SMOOTH_BLOCK = 65536
+
+_ZERO = np.float32(0.0)
+_ONE  = np.float32(1.0)
+
+
+def _clip(x):
+    np.maximum(x, _ZERO, out=x)
+    np.minimum(x, _ONE, out=x)
+
+
+def _abs(x):
+    np.abs(x, out=x)
+
+
+def _square(x):
+    np.square(x, out=x)
+
+
+def _sigmoid(x):
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += _ONE
+    np.reciprocal(x, out=x)
+
+
+TRANSFORMS = {"none": None, "clip": _clip, "abs": _abs, "square": _square, "sigmoid": _sigmoid}
+
+
+def _expression_id(key):
+    """ID de expresión a partir de un ID o un nombre ("EyesClosedL")."""
+    if isinstance(key, str) and not key.isdigit():
+        if key not in _EXPRESSION_IDS:
+            raise ValueError(f"Expresión desconocida: {key}")
+        return _EXPRESSION_IDS[key]
+    return int(key)
+
+
+def load_metrics_config(path=None):
+    """Definiciones de métricas desde un JSON ({"metrics": [...]}).
+
+    Si el archivo no existe se usan DEFAULT_METRICS.
+    """
+    # Se lee al llamar: los dashboards cargan .env después de los imports
+    path = path or os.getenv("METRICS_CONFIG", DEFAULT_METRICS_CONFIG)
+    if not os.path.exists(path):
+        return DEFAULT_METRICS
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return config["metrics"] if isinstance(config, dict) else config
+
+
+class MetricsEngine:
+    """Evalúa todas las métricas derivadas con un solo producto matricial."""
+
+    def __init__(self, definitions=None, n_expressions=N_EXPRESSIONS):
+        definitions = DEFAULT_METRICS if definitions is None else definitions
+        for d in definitions:
+            if d.get("transform", "none") not in TRANSFORMS:
+                raise ValueError(f"La métrica '{d['name']}' usa un transform desconocido: "
+                                 f"{d['transform']} (usar {' | '.join(TRANSFORMS)})")
+        # Filas agrupadas por transform: cada uno se aplica sobre un slice contiguo
+        order = sorted(range(len(definitions)),
+                       key=lambda i: list(TRANSFORMS).index(definitions[i].get("transform", "none")))
+        definitions = [definitions[i] for i in order]
+
+        self.definitions = definitions
+        self.names  = [d["name"] for d in definitions]
+        self.labels = [d.get("label", d["name"]) for d in definitions]
+        self.index  = {name: row for row, name in enumerate(self.names)}
+        if len(self.index) != len(self.names):
+            raise ValueError("Hay métricas con nombre repetido")
+        self.n_expressions = n_expressions
+
+        n = len(self.names)
+        self.weights    = np.zeros((n, n_expressions), dtype=np.float32)
+        self.bias       = np.zeros(n, dtype=np.float32)
+        self.thresholds = np.full(n, np.nan, dtype=np.float32)
+        self.alpha      = np.ones(n, dtype=np.float32)
+        for row, d in enumerate(definitions):
+            self._compile_row(row, d)
+
+        self._transforms = []
+        for name, func in TRANSFORMS.items():
+            rows = [row for row, d in enumerate(definitions) if d.get("transform", "none") == name]
+            if func is not None and rows:
+                self._transforms.append((func, slice(rows[0], rows[-1] + 1)))
+
+        # EWMA solo sobre las métricas que lo piden
+        self._raw       = self.alpha == 1.0
+        self._smoothing = not self._raw.all()
+        self._state     = None
+        self._tmp       = np.zeros(n, dtype=np.float32)
+
+        self.out = np.zeros(n, dtype=np.float32)
+
+    @classmethod
+    def from_config(cls, path=None, n_expressions=N_EXPRESSIONS, required=()):
+        """Motor con las métricas de metrics.json (o METRICS_CONFIG).
+
+        `required` son las métricas que el llamador usa por nombre.
+        """
+        engine = cls(load_metrics_config(path), n_expressions)
+        missing = [name for name in required if name not in engine.index]
+        if missing:
+            raise ValueError(f"Faltan métricas en la configuración: {', '.join(missing)}")
+        return engine
+
+    def _compile_row(self, row, d):
+        expressions = d["expressions"]
+        if isinstance(expressions, dict):
+            ids     = [_expression_id(k) for k in expressions]
+            weights = list(expressions.values())
+        else:
+            ids     = [_expression_id(k) for k in expressions]
+            weights = d.get("weights") or [1.0 / max(len(ids), 1)] * len(ids)
+        if not ids:
+            raise ValueError(f"La métrica '{d['name']}' no tiene expresiones")
+        if len(weights) != len(ids):
+            raise ValueError(f"La métrica '{d['name']}' tiene {len(ids)} expresiones "
+                             f"y {len(weights)} pesos")
+        if max(ids) >= self.n_expressions or min(ids) < 0:
+            raise ValueError(f"La métrica '{d['name']}' usa un ID fuera de rango")
+        # add.at: un ID repetido suma sus pesos
+        np.add.at(self.weights[row], ids, d.get("scale", 1.0) * np.asarray(weights, dtype=np.float64))
+        self.bias[row] = d.get("bias", 0.0)
+        if d.get("threshold") is not None:
+            self.thresholds[row] = d["threshold"]
+        smoothing = d.get("smoothing") or 0.0
+        if not 0.0 <= smoothing < 1.0:
+            raise ValueError(f"La métrica '{d['name']}': smoothing debe estar en [0, 1)")
+        if smoothing:
+            self.alpha[row] = 1.0 - smoothing
+
+    def reset(self):
+        """Olvida el estado del suavizado (al empezar una sesión nueva)."""
+        self._state = None
+
+    def compute(self, values):
+        """Métricas de un frame. Retorna `self.out`, que se sobrescribe en cada llamada."""
+        out = self.out
+        np.dot(self.weights, np.asarray(values, dtype=np.float32), out=out)
+        out += self.bias
+        for func, rows in self._transforms:
+            func(out[rows])
+        if self._smoothing:
+            self._smooth(out)
+        return out
+
+    def compute_batch(self, frames):
+        """Métricas de un lote de frames (n, 63) -> (n, métricas).
+
+        Continúa el suavizado desde el estado en vivo, igual que llamar
+        compute() frame a frame.
+        """
+        result = np.asarray(frames, dtype=np.float32) @ self.weights.T
+        result += self.bias
+        for func, rows in self._transforms:
+            # Sobre una copia contigua: con numpy 2.4 los ufuncs in-place sobre un
+            # slice de columnas (con stride) pueden pisar mal las filas
+            block = np.ascontiguousarray(result[:, rows])
+            func(block)
+            result[:, rows] = block
+        if self._smoothing and len(result):
+            self._smooth_batch(result)
+        return result
+
+    def _smooth(self, out):
+        # EWMA in-place sobre todo el vector; las métricas sin suavizado se copian tal cual
+        if self._state is None:
+            self._state = out.copy()
+        else:
+            np.subtract(out, self._state, out=self._tmp)
+            self._tmp   *= self.alpha
+            self._state += self._tmp
+            np.copyto(self._state, out, where=self._raw)
+        out[:] = self._state
+
+    def _smooth_batch(self, result):
+        """El mismo EWMA que _smooth() sobre un lote, sin recorrer frames en Python.
+
+        Con d = 1 - alpha, s_j = d^j * s_0 + alpha * sum_k d^(j-k) * x_k: por
+        bloques es un cumsum de x_k / d^k. El bloque se limita para que d^-k
+        no desborde en float64.
+        """
+        start = 0
+        if self._state is None:
+            self._state = result[0].copy()
+            start = 1
+        cols  = np.flatnonzero(~self._raw)
+        alpha = self.alpha[cols].astype(np.float64)
+        decay = 1.0 - alpha
+        x     = result[start:, cols].astype(np.float64)
+        prev  = self._state[cols].astype(np.float64)
+
+        block  = int(min(max(600.0 / -np.log(decay.min()), 1), _SMOOTH_BLOCK, max(len(x), 1)))
+        powers = decay ** np.arange(1, block + 1)[:, None]
+        for i in range(0, len(x), block):
+            chunk = x[i:i + block]
+            p = powers[:len(chunk)]
+            np.divide(chunk, p, out=chunk)
+            np.cumsum(chunk, axis=0, out=chunk)
+            chunk *= alpha
+            chunk += prev
+            chunk *= p
+            prev = chunk[-1]
+
+        result[start:, cols] = x
+        self._state[:] = result[-1]
+
+    def above(self, metrics, name):
+        """True si la métrica supera su umbral configurado (sirve para lotes)."""
+        row = self.index[name]
+        return metrics[..., row] > self.thresholds[row]
+
+    def as_dict(self, metrics):
+        """{nombre: valor} de un vector de métricas (para logs/resúmenes)."""
+        return {name: float(metrics[row]) for row, name in enumerate(self.names)}
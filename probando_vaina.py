@@ -8,21 +8,34 @@ Dashboard de monitoreo del Meta Quest Pro via cable USB (ADB).
 
 Variables de entorno (.env):
     ADB_PATH=/ruta/completa/a/adb
+    FACIAL_ENCODING=f16        (opcional: json | f32 | f16 | u16)
+    INGEST_MODE=socket         (opcional: frames por adb reverse en vez de logcat)
+    STREAM_PORT=8767
+    LOGCAT_RECORD=results/logcat   (opcional: guardar el logcat crudo en .lcap)
+    LOGCAT_REPLAY=sesion.lcap      (opcional: reproducir una grabación sin headset)
+    REPLAY_SPEED=1                 (1 = tiempo real, N = Nx, 0 = sin esperas)
+    RECORD_FORMAT=wide             (opcional: wide | long | bin | hdf5, ver recording.py)
+    WRITER_FLUSH_MS=500            (opcional: escritor en segundo plano, ver BackgroundWriter)
+    METRICS_CONFIG=metrics.json    (opcional: definición de métricas derivadas, ver metrics_engine.py)
+    WINDOW_SECONDS=1,5,30          (opcional: features por ventana deslizante, ver window_features.py)
+    FEATURES_UDP=host:9000         (opcional: publicar los features de las métricas por UDP)
+    HISTORY_SECONDS=10             (opcional: historia visible en los gráficos, 0 = sesión completa)
+    HEATMAP_SECONDS=10             (opcional: ventana del mapa de expresiones, ver expression_heatmap.py)
+    UI_TICK_MS=100                 (opcional: refresco de etiquetas y gráficos)
+    LOG_FILE=results/logs/dashboard.log  (opcional: copia rotativa del log, ver log_panel.py)
 """
 
 import subprocess
 import threading
 import json
-import re
 import os
-import csv
 from datetime import datetime
-from collections import deque
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+import numpy as np
 
 try:
     from dotenv import load_dotenv
@@ -30,10 +43,51 @@ try:
 except ImportError:
     pass
 
+from logcat_reader import LogcatFrameReader, FACIAL_DATA_TAG, FACIAL_DATA_B_TAG, VIDEO_LIST_TAG
+from frame_decoder import (parse_frame, parse_frame_legacy, frame_from_dict, parse_frame_binary,
+                           encoding_mode, ENCODING_MODES)
+from stream_ingest import StreamReceiver, adb_reverse, DEFAULT_STREAM_PORT
+from logcat_capture import RecordingStream, ReplayStream, capture_filename
+from recording import open_recording, recording_extension, BackgroundWriter
+from session_catalog import index_paths
+from facial_expressions import EXPRESSION_NAMES
+from metrics_engine import MetricsEngine, LIVE_METRICS
+from streaming_stats import SessionStats
+from blink_detector import BlinkDetector, save_events
+from window_features import WindowFeatures, FeatureCsvLog, UdpFeaturePublisher
+from live_plots import LivePlot
+from lod_store import LodStore
+from expression_heatmap import ExpressionRing, HeatmapView
+from ui_state import WidgetCache
+from log_panel import LogPanel
+
 ADB_PATH     = os.getenv("ADB_PATH", "adb")
 PACKAGE_NAME = "com.UnityTechnologies.com.unity.template.urpblank"
 QUEST_FILES_PATH = f"/sdcard/Android/data/{PACKAGE_NAME}/files"
 
+# Codificación de frames: json (por defecto) o f32/f16/u16 para [FACIAL_DATA_B]
+FACIAL_ENCODING = encoding_mode(os.getenv("FACIAL_ENCODING"))
+if FACIAL_ENCODING is None:
+    # Un modo desconocido dejaría al headset enviando algo que el PC no decodifica
+    print(f"✗ FACIAL_ENCODING={os.getenv('FACIAL_ENCODING')} no es válido "
+          f"({' | '.join(ENCODING_MODES)}): se usa json")
+    FACIAL_ENCODING = "json"
+
+# Ingesta de frames: logcat (por defecto) o socket vía `adb reverse`
+INGEST_MODE = os.getenv("INGEST_MODE", "logcat")
+STREAM_PORT = int(os.getenv("STREAM_PORT", DEFAULT_STREAM_PORT))
+
+# Grabación / reproducción del logcat crudo
+LOGCAT_RECORD = os.getenv("LOGCAT_RECORD")
+LOGCAT_REPLAY = os.getenv("LOGCAT_REPLAY")
+REPLAY_SPEED  = float(os.getenv("REPLAY_SPEED", "1"))
+
+# Grabación por frame: wide (una fila por frame), long (una fila por expresión), bin (.fses) o hdf5 (.h5)
+RECORD_FORMAT = os.getenv("RECORD_FORMAT", "wide")
+
+# Refresco de la UI (etiquetas y gráficos), independiente de la tasa de frames
+UI_TICK_MS = int(os.getenv("UI_TICK_MS", "100"))
+
 if not os.path.exists(ADB_PATH) and ADB_PATH != "adb":
     print(f"\n{'='*60}\nERROR: ADB no encontrado en: {ADB_PATH}\n{'='*60}\n")
     input("Presiona Enter para salir...")
@@ -42,32 +96,6 @@ if not os.path.exists(ADB_PATH) and ADB_PATH != "adb":
 for folder in ["results/full"]:
     os.makedirs(folder, exist_ok=True)
 
-EXPRESSION_NAMES = {
-    0: "BrowLowererL",        1: "BrowLowererR",        2: "CheekPuffL",          3: "CheekPuffR",
-    4: "CheekRaiserL",        5: "CheekRaiserR",         6: "CheekSuckL",          7: "CheekSuckR",
-    8: "ChinRaiserB",         9: "ChinRaiserT",          10: "DimplerL",           11: "DimplerR",
-    12: "EyesClosedL",        13: "EyesClosedR",         14: "EyesLookDownL",      15: "EyesLookDownR",
-    16: "EyesLookLeftL",      17: "EyesLookLeftR",       18: "EyesLookRightL",     19: "EyesLookRightR",
-    20: "EyesLookUpL",        21: "EyesLookUpR",         22: "InnerBrowRaiserL",   23: "InnerBrowRaiserR",
-    24: "JawDrop",            25: "JawSidewaysLeft",     26: "JawSidewaysRight",   27: "JawThrust",
-    28: "LidTightenerL",      29: "LidTightenerR",       30: "LipCornerDepressorL",31: "LipCornerDepressorR",
-    32: "LipCornerPullerL",   33: "LipCornerPullerR",    34: "LipFunnelLB",        35: "LipFunnelLT",
-    36: "LipFunnelRB",        37: "LipFunnelRT",         38: "LipPressorL",        39: "LipPressorR",
-    40: "LipPuckerL",         41: "LipPuckerR",          42: "LipStretcherL",      43: "LipStretcherR",
-    44: "LipSuckLB",          45: "LipSuckLT",           46: "LipSuckRB",          47: "LipSuckRT",
-    48: "LipTightenerL",      49: "LipTightenerR",       50: "LipsToward",         51: "LowerLipDepressorL",
-    52: "LowerLipDepressorR", 53: "MouthLeft",           54: "MouthRight",         55: "NoseWrinklerL",
-    56: "NoseWrinklerR",      57: "OuterBrowRaiserL",    58: "OuterBrowRaiserR",   59: "UpperLidRaiserL",
-    60: "UpperLidRaiserR",    61: "UpperLipRaiserL",     62: "UpperLipRaiserR"
-}
-
-KEY_EXPRESSIONS = {
-    "blink":        [12, 13],
-    "brow_tension": [0, 1, 22, 23],
-    "mouth":        [24, 32, 33, 42, 43],
-    "attention":    [14, 15, 20, 21],
-}
-
 
 class FacialTrackingDashboard:
 
@@ -76,24 +104,46 @@ class FacialTrackingDashboard:
         self.root.title("Quest Pro – Facial Tracking Dashboard (Cable USB)")
         self.root.geometry("1400x900")
 
-        self.data_buffer     = deque(maxlen=100)
+        self.latest_frame    = None     # último frame publicado por la ingesta
+        self.shown_frame     = None
+        self.widget_cache    = WidgetCache()
+        self.log_panel       = LogPanel()    # LOG_MAX_LINES / LOG_LEVEL / LOG_FILE
+        self.ui_tick_id      = None
+        self.frame_values    = np.zeros(len(EXPRESSION_NAMES), dtype=np.float32)
         self.is_recording    = False
         self.adb_process     = None
-        self.csv_file        = None
-        self.csv_writer      = None
+        # Se toma en cada frame y al cambiar is_recording: al volver de stop_capture
+        # ningún frame queda a mitad de camino entre la ingesta y el cierre de la sesión
+        self.ingest_lock     = threading.Lock()
+        self.recording       = None
+        self.metrics         = MetricsEngine.from_config(required=LIVE_METRICS)
+        self.session_stats   = SessionStats([EXPRESSION_NAMES[i] for i in range(len(EXPRESSION_NAMES))],
+                                            self.metrics.names)
         self.attention_score = 0.0
         self.stress_score    = 0.0
+        self.mouth_score     = 0.0
+        self.blink_detector  = BlinkDetector.from_engine(self.metrics)
         self.blink_count     = 0
-        self.last_blink_time = 0.0
+        self.window_features = WindowFeatures(self.session_stats.expression_names, self.metrics.names)
+        self.feature_log     = None
+        self.feature_udp     = UdpFeaturePublisher.from_env(self.window_features)
+        if self.feature_udp:
+            self.window_features.add_listener(self.feature_udp)
+        self.plot_buffer     = LodStore(len(self.metrics.names))
+        self.expression_ring = ExpressionRing(len(EXPRESSION_NAMES))   # mapa de calor (HEATMAP_SECONDS)
+        self.heatmap         = None
+        self.heatmap_window  = None
         self.available_videos = []
         self.current_video    = ""
 
         self.logcat_active = False
         self.logcat_process = None
+        self.stream_receiver = None
 
         self._build_ui()
-        # Iniciar logcat en segundo plano siempre
-        self.root.after(500, self._start_background_logcat)
+        # Iniciar logcat en segundo plano siempre (una reproducción arranca con la captura)
+        if not LOGCAT_REPLAY:
+            self.root.after(500, self._start_background_logcat)
 
     def _start_background_logcat(self):
         """Inicia logcat permanente para recibir VIDEO_LIST y datos faciales."""
@@ -104,43 +154,70 @@ class FacialTrackingDashboard:
         self.log("Iniciando conexión ADB en segundo plano...")
 
     def _run_background_logcat(self):
+        stream = None
         try:
-            subprocess.run([ADB_PATH, "logcat", "-c"], timeout=5)
-
-            self.logcat_process = subprocess.Popen(
-                [ADB_PATH, "logcat", "-s", "Unity:D"],
-                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                universal_newlines=True, bufsize=1,
-            )
+            if LOGCAT_REPLAY:
+                stream = ReplayStream(LOGCAT_REPLAY, speed=REPLAY_SPEED)
+                self.root.after(0, lambda: self.log(f"Reproduciendo {LOGCAT_REPLAY} a {REPLAY_SPEED:g}x"))
+            else:
+                # Con ingesta por socket logcat solo trae VIDEO_LIST: no hace falta limpiarlo
+                if INGEST_MODE != "socket":
+                    subprocess.run([ADB_PATH, "logcat", "-c"], timeout=5)
+
+                self.logcat_process = subprocess.Popen(
+                    [ADB_PATH, "logcat", "-s", "Unity:D"],
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                    bufsize=0,
+                )
+                stream = self.logcat_process.stdout
+                if LOGCAT_RECORD:
+                    stream = RecordingStream(stream, capture_filename(LOGCAT_RECORD))
+                    self.root.after(0, lambda p=stream.path: self.log(f"Grabando logcat crudo en: {p}"))
 
             self.root.after(0, lambda: self.log("✓ ADB conectado. Listo para recibir datos."))
             self.root.after(0, lambda: self.status_lbl.config(
                 text="● ADB conectado", foreground="blue"))
 
-            for line in self.logcat_process.stdout:
+            # Lectura binaria: solo se decodifican las líneas con nuestros tags
+            tags = ((VIDEO_LIST_TAG,) if INGEST_MODE == "socket"
+                    else (FACIAL_DATA_TAG, FACIAL_DATA_B_TAG, VIDEO_LIST_TAG))
+            for tag, payload in LogcatFrameReader(stream, tags=tags):
                 if not self.logcat_active:
                     break
 
                 # Datos faciales — solo procesar si hay captura activa
-                if "[FACIAL_DATA]" in line and self.is_recording:
+                if tag == FACIAL_DATA_TAG:
+                    if not self.is_recording:
+                        continue
+                    timestamp = parse_frame(payload, self.frame_values)
+                    if timestamp is not None:
+                        self._process_facial_data(timestamp, self.frame_values)
+                        continue
+
+                    # Línea con otra forma: eventos de sesión o JSON no estándar
                     try:
-                        start = line.index("[FACIAL_DATA]") + len("[FACIAL_DATA]")
-                        raw   = re.sub(r"(\d),(\d)", r"\1.\2", line[start:].strip())
-                        data  = json.loads(raw)
+                        data = parse_frame_legacy(payload)
                         if "event" in data:
                             ev = data["event"]
                             self.root.after(0, lambda e=ev: self.log(f"[Quest] Sesión: {e}"))
                         else:
-                            self._process_facial_data(data)
-                    except (ValueError, json.JSONDecodeError):
+                            timestamp = frame_from_dict(data, self.frame_values)
+                            self._process_facial_data(timestamp, self.frame_values)
+                    except (ValueError, TypeError, AttributeError):
                         pass
 
+                # Frame compacto (base64) — mismo pipeline que el JSON
+                elif tag == FACIAL_DATA_B_TAG:
+                    if not self.is_recording:
+                        continue
+                    frame = parse_frame_binary(payload, self.frame_values)
+                    if frame is not None:
+                        self._process_facial_data(frame[0], self.frame_values)
+
                 # Lista de videos — siempre procesada
-                elif "[VIDEO_LIST]" in line:
+                elif tag == VIDEO_LIST_TAG:
                     try:
-                        start    = line.index("[VIDEO_LIST]") + len("[VIDEO_LIST]")
-                        json_str = line[start:].strip()
-                        self._handle_video_list(json_str)
+                        self._handle_video_list(payload)
                     except Exception:
                         pass
 
@@ -149,8 +226,11 @@ class FacialTrackingDashboard:
             self.root.after(0, lambda: self.status_lbl.config(
                 text="● Error ADB", foreground="red"))
         except Exception as e:
-            self.root.after(0, lambda: self.log(f"Error ADB: {e}"))
+            self.root.after(0, lambda e=e: self.log(f"Error ADB: {e}"))
         finally:
+            # También si falla el lector o se cae adb: el .lcap crudo se vacía y se cierra
+            if stream is not None:
+                stream.close()
             self.logcat_active = False
 
     def _build_ui(self):
@@ -170,6 +250,9 @@ class FacialTrackingDashboard:
                                     foreground="red", font=("Arial", 12, "bold"))
         self.status_lbl.pack(side=tk.LEFT, padx=20)
 
+        ttk.Button(top, text="🌡 Mapa de Expresiones",
+                   command=self._show_heatmap).pack(side=tk.LEFT, padx=5)
+
         # ── Panel de control de video ──
         video_frame = ttk.LabelFrame(self.root, text="🎥 Control de Video 360 (via ADB cable)", padding=8)
         video_frame.pack(fill=tk.X, padx=10, pady=4)
@@ -230,15 +313,24 @@ class FacialTrackingDashboard:
                              ["Atención", "Estrés", "Act. Boca"]):
             ax.set_title(title); ax.set_ylim([0, 1]); ax.grid(True)
 
+        self.ax3.set_xlabel("Tiempo (s)")
+
         self.canvas = FigureCanvasTkAgg(self.fig, master=col2)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
+        index = self.metrics.index
+        self.live_plot = LivePlot(self.canvas)
+        self.live_plot.add_line(self.ax1, index["attention"], "g-", linewidth=2)
+        self.live_plot.add_line(self.ax2, index["stress"],    "r-", linewidth=2)
+        self.live_plot.add_line(self.ax3, index["mouth"],     "b-", linewidth=2)
+
         # Columna 3 – log
         col3 = ttk.LabelFrame(main, text="📝 Log", padding=10)
         col3.grid(row=0, column=2, sticky="nsew", padx=5)
 
         self.log_text = scrolledtext.ScrolledText(col3, width=40, height=38)
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.log_panel.attach(self.log_text, self.root, UI_TICK_MS)
 
         main.columnconfigure(0, weight=1)
         main.columnconfigure(1, weight=2)
@@ -316,19 +408,32 @@ class FacialTrackingDashboard:
 
     def start_capture(self):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename  = f"results/full/facial_data_{timestamp}.csv"
+        filename  = f"results/full/facial_data_{timestamp}{recording_extension(RECORD_FORMAT)}"
 
         try:
-            self.csv_file   = open(filename, "w", newline="")
-            self.csv_writer = csv.writer(self.csv_file)
-            self.csv_writer.writerow(["Timestamp", "Expression_ID", "Expression_Name", "Value"])
+            names = [EXPRESSION_NAMES[i] for i in range(len(EXPRESSION_NAMES))]
+            # La escritura a disco corre en su propio thread (cola acotada, escritura en lotes)
+            self.recording = BackgroundWriter(open_recording(
+                filename, names, RECORD_FORMAT, attrs={"video": self.current_video}))
         except Exception as e:
             self.log(f"Error creando CSV: {e}")
             return
 
-        self.is_recording    = True
         self.blink_count     = 0
-        self.last_blink_time = 0.0
+        self.metrics.reset()
+        self.session_stats.reset()
+        self.blink_detector.reset()
+        self.window_features.reset()
+        self.plot_buffer.clear()
+        self.expression_ring.clear()
+        self.live_plot.reset()
+        try:
+            self.feature_log = FeatureCsvLog(filename, self.window_features.names)
+            self.window_features.add_listener(self.feature_log)
+        except OSError as e:
+            self.log(f"✗ Error creando archivo de features: {e}")
+        with self.ingest_lock:
+            self.is_recording = True
 
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
@@ -339,110 +444,190 @@ class FacialTrackingDashboard:
         self.log(f"Guardando en: {filename}")
         self.log("=" * 50)
 
+        if INGEST_MODE == "socket":
+            self._start_stream_ingest()
+        if LOGCAT_REPLAY:
+            # La reproducción arranca con la captura: a 1x, lo reproducido antes se perdería
+            self._start_background_logcat()
+
+        if FACIAL_ENCODING != "json":
+            self._send_adb_command(f"ENCODING:{FACIAL_ENCODING}")
+
         # El logcat ya está corriendo en segundo plano
-        # Solo iniciamos la actualización de gráficos
-        self.root.after(100, self._update_graphs)
+        # Solo iniciamos el tick de la UI (etiquetas + gráficos)
+        self.latest_frame = None
+        self.widget_cache.invalidate()
+        if self.ui_tick_id:
+            self.root.after_cancel(self.ui_tick_id)
+        self.ui_tick_id = self.root.after(UI_TICK_MS, self._ui_tick)
 
     def stop_capture(self):
-        self.is_recording = False
-
-        if self.csv_file:
-            self.csv_file.close()
-            self.csv_file = None
-            self.log("CSV guardado.")
+        # Espera al frame en curso; desde acá la ingesta no toca métricas, stats ni archivos
+        with self.ingest_lock:
+            self.is_recording = False
+
+        if self.stream_receiver:
+            self.stream_receiver.stop()
+            self.stream_receiver = None
+
+        if self.recording:
+            # Vacía la cola del escritor antes de cerrar el archivo
+            stats = self.recording.close()
+            path = self.recording.path
+            self.recording = None
+            self.log(f"Archivo guardado: {stats['written']} frames, {stats['dropped']} descartados.")
+            try:
+                self.log(f"Estadísticas guardadas en: {self.session_stats.save(path)}")
+                self.blink_detector.finish()
+                self.blink_count = self.blink_detector.blinks
+                self.log(f"Parpadeos: {self.blink_count} -> {save_events(path, self.blink_detector.events)}")
+            except Exception as e:
+                self.log(f"✗ Error guardando estadísticas/parpadeos: {e}")
+            if self.feature_log:
+                self.window_features.remove_listener(self.feature_log)
+                self.feature_log.close()
+                self.log(f"Features por ventana: {self.feature_log.path}")
+                self.feature_log = None
+            # Registrar la sesión en el catálogo sin bloquear la UI
+            threading.Thread(target=self._catalog_session, args=(path, self.current_video),
+                             daemon=True).start()
 
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
         self.status_lbl.config(text="● ADB conectado", foreground="blue")
+        self.live_plot.freeze()
+        self._update_labels(force=True)
         self.log("Captura detenida.")
 
 
 
+    def _catalog_session(self, path, video):
+        try:
+            index_paths([path], video=video)
+        except Exception as e:
+            self.root.after(0, lambda e=e: self.log(f"✗ Error actualizando catálogo: {e}"))
+
+    def _start_stream_ingest(self):
+        """Recibe los frames por socket TCP tunelizado con `adb reverse`."""
+        ok, message = adb_reverse(ADB_PATH, STREAM_PORT)
+        self.log(f"✓ {message}" if ok else f"✗ adb reverse falló: {message}")
+
+        self.stream_receiver = StreamReceiver(
+            self._on_stream_frame, len(EXPRESSION_NAMES), port=STREAM_PORT,
+            on_event=lambda d: self.root.after(0, lambda e=d.get("event"): self.log(f"[Quest] Sesión: {e}")),
+            on_status=lambda m: self.root.after(0, lambda: self.log(m)))
+        try:
+            self.stream_receiver.start()
+        except OSError as e:
+            self.log(f"✗ No se pudo abrir el puerto {STREAM_PORT}: {e}")
+            self.stream_receiver = None
+            return
+
+        self._send_adb_command(f"STREAM:{STREAM_PORT}")
+
+    def _on_stream_frame(self, timestamp, values):
+        if self.is_recording:
+            self._process_facial_data(timestamp, values)
+
     # ── Procesamiento de datos faciales ───────────────────────────────────────
 
-    def _process_facial_data(self, data):
-        timestamp   = data.get("t", 0)
-        expressions = data.get("d", {})
-
-        rows = []
-        for exp_id_str, value in expressions.items():
-            exp_id   = int(exp_id_str)
-            exp_name = EXPRESSION_NAMES.get(exp_id, f"Unknown_{exp_id}")
-            rows.append([timestamp, exp_id, exp_name, value])
-
-        def _write(rows=rows):
-            if self.csv_writer:
-                self.csv_writer.writerows(rows)
-        self.root.after(0, _write)
-
-        self._calculate_metrics(expressions, timestamp)
-
-        mouth = [expressions.get(str(i), 0) for i in KEY_EXPRESSIONS["mouth"]]
-        self.data_buffer.append({
-            "time":      timestamp,
-            "attention": self.attention_score,
-            "stress":    self.stress_score,
-            "mouth":     sum(mouth) / max(len(mouth), 1),
-        })
-
-        self.root.after(0, self._update_labels)
-
-    def _calculate_metrics(self, expressions, timestamp):
-        def avg(ids):
-            vals = [expressions.get(str(i), 0) for i in ids]
-            return sum(vals) / max(len(vals), 1)
-
-        self.attention_score = 1.0 - avg(KEY_EXPRESSIONS["attention"])
-        self.stress_score    = avg(KEY_EXPRESSIONS["brow_tension"])
-
-        if avg(KEY_EXPRESSIONS["blink"]) > 0.7 and (timestamp - self.last_blink_time) > 0.2:
-            self.blink_count    += 1
-            self.last_blink_time = timestamp
-
-    def _update_labels(self):
-        self.attention_lbl.config(
-            text=f"Atención: {self.attention_score*100:.1f}%",
-            foreground="green" if self.attention_score > 0.7 else "orange")
-        self.stress_lbl.config(
-            text=f"Estrés: {self.stress_score*100:.1f}%",
-            foreground="red" if self.stress_score > 0.5 else "green")
-        self.blink_lbl.config(text=f"Parpadeos: {self.blink_count}")
-
-        if self.data_buffer:
-            d = self.data_buffer[-1]
-            self.key_text.delete(1.0, tk.END)
-            self.key_text.insert(tk.END,
-                f"t={d['time']:.2f}s\n\n"
+    def _process_facial_data(self, timestamp, values):
+        with self.ingest_lock:
+            if not self.is_recording:
+                return
+            recording = self.recording
+            if recording:
+                recording.write(timestamp, values)
+
+            self._calculate_metrics(values, timestamp)
+            self.session_stats.update(values, self.metrics.out)
+            self.window_features.update(timestamp, values, self.metrics.out)
+            self.plot_buffer.append(timestamp, self.metrics.out)
+            self.expression_ring.append(values)
+
+            # Publicar el último frame: la UI lo lee en su propio tick
+            self.latest_frame = {
+                "time":      timestamp,
+                "attention": self.attention_score,
+                "stress":    self.stress_score,
+                "mouth":     self.mouth_score,
+            }
+
+    def _calculate_metrics(self, values, timestamp):
+        metrics = self.metrics.compute(values)
+        index   = self.metrics.index
+        self.attention_score = float(metrics[index["attention"]])
+        self.stress_score    = float(metrics[index["stress"]])
+        self.mouth_score     = float(metrics[index["mouth"]])
+
+        self.blink_detector.update(timestamp, metrics[index["blink"]])
+        self.blink_count = self.blink_detector.blinks
+
+    def _update_labels(self, force=False):
+        # Último frame publicado por la ingesta; si no cambió no se toca nada
+        d = self.latest_frame
+        if d is None or (d is self.shown_frame and not force):
+            return
+        self.shown_frame = d
+        ui = self.widget_cache
+
+        ui.config(self.attention_lbl,
+                  text=f"Atención: {d['attention']*100:.1f}%",
+                  foreground="green" if d["attention"] > 0.7 else "orange")
+        ui.config(self.stress_lbl,
+                  text=f"Estrés: {d['stress']*100:.1f}%",
+                  foreground="red" if d["stress"] > 0.5 else "green")
+        ui.config(self.blink_lbl, text=f"Parpadeos: {self.blink_count}")
+
+        text = (f"t={d['time']:.2f}s\n\n"
                 f"Atención:  {d['attention']*100:.1f}%\n"
                 f"Estrés:    {d['stress']*100:.1f}%\n"
                 f"Act.Boca:  {d['mouth']*100:.1f}%\n")
-
-    def _update_graphs(self):
+        if self.session_stats.frames:
+            text += "\n" + self.session_stats.format_metrics(self.metrics.labels)
+        if self.window_features.latest:
+            text += "\n" + self.window_features.format_metrics(self.metrics.labels)
+        ui.set_text(self.key_text, text)
+
+    def _ui_tick(self):
+        """Tick fijo de la UI (UI_TICK_MS): etiquetas y gráficos, sin importar la tasa de frames."""
         if not self.is_recording:
             return
 
-        if len(self.data_buffer) > 1:
-            times     = [d["time"]      for d in self.data_buffer]
-            attention = [d["attention"] for d in self.data_buffer]
-            stress    = [d["stress"]    for d in self.data_buffer]
-            mouth     = [d["mouth"]     for d in self.data_buffer]
-
-            self.ax1.clear(); self.ax2.clear(); self.ax3.clear()
-            self.ax1.plot(times, attention, "g-", linewidth=2)
-            self.ax1.set_title("Atención"); self.ax1.set_ylim([0,1]); self.ax1.grid(True)
-            self.ax2.plot(times, stress,    "r-", linewidth=2)
-            self.ax2.set_title("Estrés");   self.ax2.set_ylim([0,1]); self.ax2.grid(True)
-            self.ax3.plot(times, mouth,     "b-", linewidth=2)
-            self.ax3.set_title("Act. Boca"); self.ax3.set_ylim([0,1]); self.ax3.grid(True)
-            self.ax3.set_xlabel("Tiempo (s)")
-            self.canvas.draw()
-
-        self.root.after(100, self._update_graphs)
-
-    def log(self, message):
-        ts = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{ts}] {message}\n")
-        self.log_text.see(tk.END)
+        self._update_labels()
+        # Solo se redibujan las líneas (blitting, ver live_plots.py)
+        self.live_plot.update(self.plot_buffer)
+        if self.heatmap:
+            self.heatmap.update()
+        self.ui_tick_id = self.root.after(max(UI_TICK_MS, self.live_plot.next_interval()), self._ui_tick)
+
+    def _show_heatmap(self):
+        """Ventana con el mapa de calor en vivo de las 63 expresiones (ver expression_heatmap.py)."""
+        if self.heatmap_window is not None:
+            self.heatmap_window.lift()
+            return
+        win = self.heatmap_window = tk.Toplevel(self.root)
+        win.title("Mapa de Expresiones")
+        win.geometry("1000x900")
+
+        fig = Figure(figsize=(10, 9))
+        ax  = fig.add_subplot(111)
+        canvas = FigureCanvasTkAgg(fig, master=win)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        names = [EXPRESSION_NAMES[i] for i in range(len(EXPRESSION_NAMES))]
+        self.heatmap = HeatmapView(canvas, ax, self.expression_ring, names)
+        fig.tight_layout()
+        canvas.draw()
+        self.heatmap.update()
+
+        def on_close():
+            self.heatmap = self.heatmap_window = None
+            win.destroy()
+        win.protocol("WM_DELETE_WINDOW", on_close)
+
+    def log(self, message, level=None):
+        # Seguro desde cualquier thread: el panel inserta en lotes en su tick
+        self.log_panel.log(message, level)
 
     def run(self):
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
@@ -457,6 +642,7 @@ class FacialTrackingDashboard:
         if self.logcat_process:
             try: self.logcat_process.terminate()
             except: pass
+        self.log_panel.close()
         self.root.destroy()
 
 
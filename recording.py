@@ -0,0 +1,368 @@
+"""
+recording.py
+------------
+Grabación por frame de los datos faciales (results/full/*.csv).
+
+Formato ancho (por defecto): una fila por frame, columnas en orden de ID
+    Timestamp,Sequence,BrowLowererL,BrowLowererR,...,UpperLipRaiserR
+
+Formato largo (el original): una fila por expresión y frame
+    Timestamp,Expression_ID,Expression_Name,Value
+
+Formato binario (bin): sesión .fses por bloques con CRC, ver session_file.py.
+
+Formato HDF5 (hdf5): un .h5 por sesión con datasets comprimidos y
+metadata (video, resumen de Unity), ver hdf5_session.py.
+
+El ancho no repite el timestamp ni el nombre de la expresión 63 veces por
+frame: ~10x menos bytes y filas a 90 Hz. Los valores se escriben con el
+mismo texto float32 en ambos formatos, así que la conversión al largo para
+los scripts de análisis existentes es sin pérdida:
+
+    python recording.py to-long results/full/facial_data_pc_20250101_120000.csv
+"""
+
+import argparse
+import csv
+import os
+import threading
+import time
+import warnings
+from itertools import repeat
+
+import numpy as np
+
+from facial_expressions import EXPRESSION_NAMES, N_EXPRESSIONS
+from session_file import SessionWriter, SessionReader, SESSION_EXTENSION
+from hdf5_session import Hdf5SessionWriter, Hdf5SessionReader, HDF5_EXTENSION
+
+RECORD_FORMATS = ("wide", "long", "bin", "hdf5")
+
+LONG_HEADER = ["Timestamp", "Expression_ID", "Expression_Name", "Value"]
+WIDE_PREFIX = ["Timestamp", "Sequence"]
+
+
+def wide_header(names):
+    """Encabezado del formato ancho a partir de la lista de nombres por ID."""
+    return WIDE_PREFIX + list(names)
+
+
+class _CsvRecording:
+    def __init__(self, path, names):
+        self.path   = path
+        self.names  = list(names)
+        self.frames = 0
+        self._file  = open(path, "w", newline="")
+        self._csv   = csv.writer(self._file)
+        self._csv.writerow(self.header())
+
+    def write(self, timestamp, values, seq=None):
+        """Guarda un frame. `seq` por defecto es el número de frame en el archivo."""
+        self._write(timestamp, self.frames if seq is None else seq, values)
+        self.frames += 1
+
+    def write_many(self, timestamps, seqs, values):
+        """Guarda un lote de frames (values con forma (n, N))."""
+        self._write_many(timestamps, seqs, values)
+        self.frames += len(timestamps)
+
+    def sync(self, fsync=False):
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class WideCsvWriter(_CsvRecording):
+    """Una fila por frame: timestamp, secuencia y un valor por expresión."""
+
+    def header(self):
+        return wide_header(self.names)
+
+    def _write(self, timestamp, seq, values):
+        self._csv.writerow([timestamp, seq, *values])
+
+    def _write_many(self, timestamps, seqs, values):
+        self._csv.writerows([t, s, *v] for t, s, v in zip(timestamps, seqs, values))
+
+
+class LongCsvWriter(_CsvRecording):
+    """Una fila por expresión y frame (formato original)."""
+
+    def header(self):
+        return LONG_HEADER
+
+    def _write(self, timestamp, seq, values):
+        self._csv.writerows(zip(repeat(timestamp), range(len(self.names)), self.names, values))
+
+    def _write_many(self, timestamps, seqs, values):
+        for timestamp, row in zip(timestamps, values):
+            self._write(timestamp, None, row)
+
+
+def recording_extension(fmt):
+    """Extensión de archivo para el formato de grabación."""
+    return {"bin": SESSION_EXTENSION, "hdf5": HDF5_EXTENSION}.get(fmt, ".csv")
+
+
+def open_recording(path, names, fmt="wide", attrs=None):
+    """Crea el writer del formato pedido ('wide', 'long', 'bin' o 'hdf5').
+
+    `attrs` es metadata de la sesión (ej. video); solo HDF5 la guarda.
+    """
+    if fmt == "wide":
+        return WideCsvWriter(path, names)
+    if fmt == "long":
+        return LongCsvWriter(path, names)
+    if fmt == "bin":
+        return SessionWriter(path, names)
+    if fmt == "hdf5":
+        return Hdf5SessionWriter(path, names, attrs)
+    raise ValueError(f"Formato de grabación desconocido: {fmt} (usar {' | '.join(RECORD_FORMATS)})")
+
+
+# ── Escritura en segundo plano ────────────────────────────────────────────────
+
+class BackgroundWriter:
+    """Etapa de escritura en un thread propio con cola acotada.
+
+    El thread que lee frames solo copia el vector a un ring preasignado;
+    el thread escritor junta los frames pendientes y los guarda en lote
+    cada `flush_ms` o cuando hay `flush_frames` esperando, y después hace
+    flush (y fsync si se pide) del archivo.
+
+    Si la cola se llena (disco lento), `on_full` decide:
+        "drop":  se descarta el frame y se cuenta en `dropped`
+        "block": el lector espera hasta `block_timeout` s (contrapresión)
+                 y recién ahí descarta
+
+    El número de secuencia se asigna al encolar, así los frames
+    descartados quedan como saltos en la columna Sequence.
+
+    close() deja de aceptar frames, vacía la cola completa y cierra el
+    archivo: lo que se encoló antes de close() siempre se escribe.
+
+    Configuración por defecto desde el entorno:
+        WRITER_QUEUE_FRAMES=8192   WRITER_FLUSH_MS=500   WRITER_FLUSH_FRAMES=256
+        WRITER_FSYNC=0             WRITER_ON_FULL=drop
+    """
+
+    def __init__(self, recording, n_expressions=None, queue_frames=None, flush_ms=None,
+                 flush_frames=None, fsync=None, on_full=None, block_timeout=0.5):
+        self.recording    = recording
+        self.path         = recording.path
+        self.queue_frames = queue_frames or int(os.getenv("WRITER_QUEUE_FRAMES", "8192"))
+        self.flush_ms     = flush_ms or int(os.getenv("WRITER_FLUSH_MS", "500"))
+        self.flush_frames = flush_frames or int(os.getenv("WRITER_FLUSH_FRAMES", "256"))
+        self.fsync        = fsync if fsync is not None else os.getenv("WRITER_FSYNC", "0") == "1"
+        self.on_full      = on_full or os.getenv("WRITER_ON_FULL", "drop")
+        self.block_timeout = block_timeout
+
+        n = n_expressions or len(recording.names)
+        self._t      = np.zeros(self.queue_frames, dtype=np.float64)
+        self._seq    = np.zeros(self.queue_frames, dtype=np.int64)
+        self._values = np.zeros((self.queue_frames, n), dtype=np.float32)
+        self._head   = 0      # primer frame pendiente
+        self._count  = 0      # frames pendientes
+
+        self._cond    = threading.Condition()
+        self._closing = False
+        self.error    = None
+
+        # Contadores para diagnóstico
+        self.enqueued   = 0
+        self.written    = 0
+        self.dropped    = 0
+        self.high_water = 0
+        self.blocked_seconds = 0.0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, timestamp, values, seq=None):
+        """Encola un frame (copia `values`). Retorna False si se descartó."""
+        with self._cond:
+            if seq is None:
+                seq = self.enqueued
+            self.enqueued += 1
+            if self._closing or self.error is not None:
+                self.dropped += 1
+                return False
+
+            if self._count == self.queue_frames and self.on_full == "block":
+                start = time.perf_counter()
+                self._cond.wait_for(lambda: self._count < self.queue_frames or self._closing,
+                                    self.block_timeout)
+                self.blocked_seconds += time.perf_counter() - start
+            if self._count == self.queue_frames or self._closing:
+                self.dropped += 1
+                return False
+
+            slot = (self._head + self._count) % self.queue_frames
+            self._t[slot]      = timestamp
+            self._seq[slot]    = seq
+            self._values[slot] = values
+            self._count += 1
+            if self._count > self.high_water:
+                self.high_water = self._count
+            if self._count >= self.flush_frames:
+                self._cond.notify_all()
+        return True
+
+    def close(self, timeout=None):
+        """Vacía la cola, cierra el archivo y retorna los contadores finales."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        return self.stats()
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped,
+                "pending": self._count, "high_water": self.high_water,
+                "blocked_seconds": self.blocked_seconds}
+
+    def _run(self):
+        interval = self.flush_ms / 1000.0
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._count >= self.flush_frames or self._closing,
+                                        interval)
+                    head, count, closing = self._head, self._count, self._closing
+
+                # Los slots pendientes son del escritor hasta que avance _head
+                if count:
+                    end = head + count
+                    if end <= self.queue_frames:
+                        self._write_slots(head, end)
+                    else:
+                        self._write_slots(head, self.queue_frames)
+                        self._write_slots(0, end - self.queue_frames)
+                    self.recording.sync(self.fsync)
+
+                    with self._cond:
+                        self._head   = end % self.queue_frames
+                        self._count -= count
+                        self.written += count
+                        self._cond.notify_all()
+
+                elif closing:
+                    break
+        except Exception as e:
+            with self._cond:
+                self.error = e
+                self.dropped += self._count
+                self._count = 0
+                self._cond.notify_all()
+        finally:
+            self.recording.close()
+
+    def _write_slots(self, start, stop):
+        self.recording.write_many(self._t[start:stop], self._seq[start:stop],
+                                  self._values[start:stop])
+
+
+def detect_format(path):
+    """'wide' o 'long' según el encabezado del CSV."""
+    with open(path, newline="") as f:
+        header = next(csv.reader(f), [])
+    if header == LONG_HEADER:
+        return "long"
+    if header[:len(WIDE_PREFIX)] == WIDE_PREFIX:
+        return "wide"
+    raise ValueError(f"{path} no es una grabación de frames reconocible")
+
+
+def wide_to_long(src, dst):
+    """Convierte una grabación ancha al formato largo. Retorna los frames convertidos."""
+    frames = 0
+    with open(src, newline="") as fin, open(dst, "w", newline="") as fout:
+        reader = csv.reader(fin)
+        header = next(reader)
+        if header[:len(WIDE_PREFIX)] != WIDE_PREFIX:
+            raise ValueError(f"{src} no está en formato ancho")
+
+        names = header[len(WIDE_PREFIX):]
+        ids   = range(len(names))
+        writer = csv.writer(fout)
+        writer.writerow(LONG_HEADER)
+        for row in reader:
+            # Se copian los textos tal cual: sin reformatear números
+            writer.writerows(zip(repeat(row[0]), ids, names, row[len(WIDE_PREFIX):]))
+            frames += 1
+    return frames
+
+
+def _complete_lines(f):
+    # Una grabación cortada puede terminar con una fila a medias
+    for line in f:
+        if line.endswith("\n"):
+            yield line
+
+
+def read_recording(path):
+    """Lee una grabación completa en cualquier formato.
+
+    Retorna (timestamps float64 (n,), valores float32 (n, N), nombres).
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == SESSION_EXTENSION:
+        reader = SessionReader(path)
+        frames = reader[:]
+        return frames["t"].copy(), frames["values"].copy(), reader.names
+    if ext == HDF5_EXTENSION:
+        with Hdf5SessionReader(path) as reader:
+            return reader.timestamps[:], reader.frames[:], reader.names
+
+    if detect_format(path) == "long":
+        from convert_archive import iter_long_frames
+        blocks = list(iter_long_frames(path))
+        if not blocks:
+            # Sesión sin frames: mismas columnas que tendría con datos
+            names = [EXPRESSION_NAMES[i] for i in range(N_EXPRESSIONS)]
+            return np.zeros(0), np.zeros((0, N_EXPRESSIONS), dtype=np.float32), names
+        return (np.concatenate([b[0] for b in blocks]),
+                np.concatenate([b[1] for b in blocks]), blocks[-1][2])
+
+    with open(path, newline="") as f:
+        names = next(csv.reader(f))[len(WIDE_PREFIX):]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")     # sesión sin frames
+            data = np.loadtxt(_complete_lines(f), delimiter=",", dtype=np.float64, ndmin=2)
+    if not len(data):
+        return np.zeros(0), np.zeros((0, len(names)), dtype=np.float32), names
+    return data[:, 0], data[:, len(WIDE_PREFIX):].astype(np.float32), names
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def _to_long(args):
+    for src in args.files:
+        fmt = detect_format(src)
+        if fmt == "long":
+            print(f"- {src}: ya está en formato largo")
+            continue
+        root, ext = os.path.splitext(src)
+        dst = os.path.join(args.out_dir, os.path.basename(root) + "_long" + ext) if args.out_dir \
+            else root + "_long" + ext
+        frames = wide_to_long(src, dst)
+        print(f"✓ {src} -> {dst} ({frames} frames)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades de grabaciones por frame")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("to-long", help="convertir grabaciones anchas al formato largo original")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--out-dir", help="carpeta de salida (por defecto junto al original)")
+    p.set_defaults(func=_to_long)
+
+    args = parser.parse_args()
+    if getattr(args, "out_dir", None):
+        os.makedirs(args.out_dir, exist_ok=True)
+    args.func(args)
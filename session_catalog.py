@@ -0,0 +1,492 @@
+"""
+session_catalog.py
+------------------
+Catálogo SQLite de todo lo que hay en results/.
+
+Cada grabación por frame (results/full: .csv ancho/largo, .fses, .h5) es
+una sesión con su device, inicio, duración, frames, bytes y videos. Los
+resúmenes de Unity (results/summary/session_summary_*.json) y sus datos
+raw (results/raw/session_raw_data_*.csv, mismo timestamp) se enlazan con
+la sesión que estaba grabando cuando llegaron, y sus estadísticas quedan
+en la tabla `stats` para poder filtrar por métrica. Las estadísticas que
+calcula el PC (<grabación>_stats.json, ver streaming_stats.py) se guardan
+en la misma tabla con el prefijo "host:" (ej. host:attention).
+
+El escaneo es incremental: la tabla `files` guarda tamaño y mtime de cada
+archivo y solo se vuelve a leer lo que cambió. Los dashboards además
+registran cada sesión al detener la captura y cada resumen al recibirlo.
+
+Uso:
+    python session_catalog.py scan                       # indexar results/
+    python session_catalog.py list --device pc --since 2025-01-01
+    python session_catalog.py list --video video_01.mp4 --min-duration 60
+    python session_catalog.py show pc_20250101_120000
+
+Variables de entorno (.env):
+    CATALOG_PATH=results/catalog.sqlite
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+from streaming_stats import stats_path
+
+RESULTS_DIR = "results"
+DEFAULT_CATALOG = os.path.join(RESULTS_DIR, "catalog.sqlite")
+
+# Un resumen se asocia a la sesión que terminó hace menos de esto
+SUMMARY_GRACE_SECONDS = 120
+
+_DATA_RE    = re.compile(r"^facial_data_(?:(?P<device>.+)_)?(?P<ts>\d{8}_\d{6})(?P<ext>\.csv|\.fses|\.h5)$")
+_SUMMARY_RE = re.compile(r"^session_summary_(?P<ts>\d{8}_\d{6})\.json$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id           TEXT PRIMARY KEY,
+    device       TEXT,
+    started_at   REAL,
+    duration     REAL,
+    frames       INTEGER,
+    bytes        INTEGER,
+    format       TEXT,
+    data_path    TEXT,
+    videos       TEXT,
+    summary_path TEXT,
+    raw_path     TEXT,
+    total_blinks INTEGER,
+    data_points  INTEGER
+);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions(started_at);
+CREATE INDEX IF NOT EXISTS sessions_device  ON sessions(device);
+
+CREATE TABLE IF NOT EXISTS stats (
+    session_id TEXT,
+    metric     TEXT,
+    min        REAL,
+    max        REAL,
+    avg        REAL,
+    PRIMARY KEY (session_id, metric)
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    path       TEXT PRIMARY KEY,
+    size       INTEGER,
+    mtime      REAL,
+    kind       TEXT,
+    session_id TEXT
+);
+"""
+
+
+def _parse_ts(text):
+    """Epoch de un YYYYmmdd_HHMMSS, o None si no es una fecha válida (ej. mes 00)."""
+    try:
+        return datetime.strptime(text, "%Y%m%d_%H%M%S").timestamp()
+    except ValueError:
+        return None
+
+
+def connect(db_path=None):
+    db_path = db_path or os.getenv("CATALOG_PATH", DEFAULT_CATALOG)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+# ── Lectura de archivos ───────────────────────────────────────────────────────
+
+def _csv_info(path):
+    """(formato, frames, duración) leyendo solo el inicio, el final y contando líneas."""
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8", "replace").strip().split(",")
+        first  = f.readline()
+        lines  = 1 if first else 0
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            lines += chunk.count(b"\n")
+
+        # Últimas líneas: leer el final del archivo
+        f.seek(max(0, f.tell() - 64 * 1024))
+        tail = f.read()
+
+    fmt = "long" if header[:2] == ["Timestamp", "Expression_ID"] else "wide"
+    # Tras un corte la última línea puede quedar a medias: solo cuentan las
+    # terminadas en salto de línea y cuyo timestamp se puede leer
+    t0 = _first_timestamp([first] if first.endswith(b"\n") else [])
+    t1 = _first_timestamp(reversed(tail.split(b"\n")[1:-1]))
+    if t0 is None or t1 is None:
+        return fmt, 0, 0.0
+    if fmt == "long":
+        # Largo: una fila por expresión
+        return "long", lines // max(len(_long_names(path)), 1), t1 - t0
+    return "wide", lines, t1 - t0
+
+
+def _first_timestamp(lines):
+    """Timestamp (primer campo) de la primera línea válida de `lines`, o None."""
+    for line in lines:
+        try:
+            return float(line.split(b",", 1)[0])
+        except ValueError:
+            continue
+    return None
+
+
+def _long_names(path):
+    """Expresiones del primer frame de un CSV largo (para dividir filas por frame)."""
+    names = []
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        first_ts = None
+        for row in reader:
+            if first_ts is None:
+                first_ts = row[0]
+            elif row[0] != first_ts:
+                break
+            names.append(row[2])
+    return names
+
+
+def _data_info(path):
+    """Metadata de una grabación por frame según su extensión."""
+    ext = os.path.splitext(path)[1]
+    if ext == ".fses":
+        from session_file import SessionReader
+        reader = SessionReader(path)
+        n = len(reader)
+        duration = float(reader[n - 1]["t"] - reader[0]["t"]) if n else 0.0
+        return {"format": "bin", "frames": n, "duration": duration, "videos": []}
+    if ext == ".h5":
+        from hdf5_session import Hdf5SessionReader
+        with Hdf5SessionReader(path) as reader:
+            n = len(reader)
+            duration = float(reader.timestamps[-1] - reader.timestamps[0]) if n else 0.0
+            return {"format": "hdf5", "frames": n, "duration": duration,
+                    "videos": [reader.video] if reader.video else [],
+                    "summary": reader.summary}
+    fmt, frames, duration = _csv_info(path)
+    return {"format": fmt, "frames": frames, "duration": duration, "videos": []}
+
+
+# ── Indexado ──────────────────────────────────────────────────────────────────
+
+def _unchanged(conn, path, st):
+    row = conn.execute("SELECT size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+    return row is not None and row["size"] == st.st_size and row["mtime"] == st.st_mtime
+
+
+def _mark(conn, path, st, kind, session_id):
+    conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                 (path, st.st_size, st.st_mtime, kind, session_id))
+
+
+def _save_stats(conn, session_id, summary):
+    metadata = summary.get("metadata", {})
+    conn.execute("UPDATE sessions SET total_blinks = ?, data_points = ? WHERE id = ?",
+                 (metadata.get("totalBlinks"), metadata.get("dataPoints"), session_id))
+    # Un resumen reemplazado no deja métricas viejas
+    _delete_summary_stats(conn, session_id)
+    for metric, values in summary.get("statistics", {}).items():
+        conn.execute("INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?)",
+                     (session_id, metric, values.get("min"), values.get("max"), values.get("avg")))
+
+    video = metadata.get("video") or metadata.get("videoName")
+    if video:
+        row = conn.execute("SELECT videos FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        videos = json.loads(row["videos"] or "[]")
+        if video not in videos:
+            videos.append(video)
+            conn.execute("UPDATE sessions SET videos = ? WHERE id = ?", (json.dumps(videos), session_id))
+
+
+def _delete_summary_stats(conn, session_id):
+    """Borra las estadísticas que vienen del resumen de Unity (no las "host:")."""
+    conn.execute("DELETE FROM stats WHERE session_id = ? AND metric NOT LIKE 'host:%'", (session_id,))
+
+
+def _delete_session(conn, session_id):
+    """Borra una sesión junto con todas sus estadísticas."""
+    conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+    conn.execute("DELETE FROM stats WHERE session_id = ?", (session_id,))
+
+
+def _save_host_stats(conn, session_id, recording_path):
+    path = stats_path(recording_path)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        host = json.load(f)
+    conn.execute("DELETE FROM stats WHERE session_id = ? AND metric LIKE 'host:%'", (session_id,))
+    for metric, values in host.get("statistics", {}).items():
+        conn.execute("INSERT OR REPLACE INTO stats VALUES (?, ?, ?, ?, ?)",
+                     (session_id, f"host:{metric}", values.get("min"), values.get("max"), values.get("avg")))
+
+
+def index_data_file(conn, path, force=False, video=None):
+    """Registra una grabación de results/full. Retorna el id de sesión o None.
+
+    `video` lo pasan los dashboards para los formatos que no lo guardan (CSV, .fses).
+    """
+    match = _DATA_RE.match(os.path.basename(path))
+    started = match and _parse_ts(match.group("ts"))
+    if started is None:
+        return None
+    st = os.stat(path)
+    if not force and _unchanged(conn, path, st):
+        return None
+
+    device = match.group("device") or "usb"
+    session_id = f"{device}_{match.group('ts')}"
+    info = _data_info(path)
+    if video and video not in info["videos"]:
+        info["videos"].append(video)
+    conn.execute(
+        """INSERT INTO sessions (id, device, started_at, duration, frames, bytes, format, data_path, videos)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(id) DO UPDATE SET duration = excluded.duration, frames = excluded.frames,
+               bytes = excluded.bytes, format = excluded.format, data_path = excluded.data_path,
+               videos = excluded.videos""",
+        (session_id, device, started, info["duration"], info["frames"],
+         st.st_size, info["format"], path, json.dumps(info["videos"])))
+    if info.get("summary"):
+        _save_stats(conn, session_id, info["summary"])
+    _save_host_stats(conn, session_id, path)
+    _mark(conn, path, st, "data", session_id)
+    _adopt_summaries(conn, session_id)
+    return session_id
+
+
+def _adopt_summaries(conn, session_id):
+    """Resúmenes indexados antes que su grabación (llegaron mientras se grababa)."""
+    row = conn.execute("SELECT started_at, duration FROM sessions WHERE id = ?", (session_id,)).fetchone()
+    end = row["started_at"] + (row["duration"] or 0) + SUMMARY_GRACE_SECONDS
+    orphans = conn.execute(
+        "SELECT id, summary_path FROM sessions WHERE format = 'summary' AND started_at BETWEEN ? AND ?",
+        (row["started_at"], end)).fetchall()
+    for orphan in orphans:
+        _delete_session(conn, orphan["id"])
+        if orphan["summary_path"] and os.path.exists(orphan["summary_path"]):
+            index_summary_file(conn, orphan["summary_path"], force=True)
+
+
+def _session_for(conn, ts):
+    """Sesión que estaba grabando (o terminó hace poco) en el instante ts."""
+    row = conn.execute(
+        """SELECT id FROM sessions
+           WHERE started_at <= ? AND started_at + COALESCE(duration, 0) + ? >= ?
+           ORDER BY started_at DESC LIMIT 1""",
+        (ts, SUMMARY_GRACE_SECONDS, ts)).fetchone()
+    return row["id"] if row else None
+
+
+def index_summary_file(conn, path, force=False):
+    """Enlaza un resumen de Unity (y su CSV raw) con su sesión."""
+    match = _SUMMARY_RE.match(os.path.basename(path))
+    started = match and _parse_ts(match.group("ts"))
+    if started is None:
+        return None
+    st = os.stat(path)
+    if not force and _unchanged(conn, path, st):
+        return None
+
+    ts = match.group("ts")
+    session_id = _session_for(conn, started)
+    if session_id is None:
+        # Resumen sin grabación local: sesión propia solo con los datos de Unity
+        session_id = f"summary_{ts}"
+        conn.execute("INSERT OR IGNORE INTO sessions (id, device, started_at, format, videos) "
+                     "VALUES (?, 'quest', ?, 'summary', '[]')", (session_id, started))
+
+    with open(path) as f:
+        summary = json.load(f)
+    raw_path = os.path.join(os.path.dirname(os.path.dirname(path)), "raw", f"session_raw_data_{ts}.csv")
+    conn.execute("UPDATE sessions SET summary_path = ?, raw_path = ? WHERE id = ?",
+                 (path, raw_path if os.path.exists(raw_path) else None, session_id))
+    if summary.get("metadata", {}).get("duration") is not None:
+        conn.execute("UPDATE sessions SET duration = COALESCE(duration, ?) WHERE id = ?",
+                     (summary["metadata"]["duration"], session_id))
+    _save_stats(conn, session_id, summary)
+    _mark(conn, path, st, "summary", session_id)
+    return session_id
+
+
+def index_paths(paths, db_path=None, video=None):
+    """Registra archivos puntuales (lo usan los dashboards al guardar)."""
+    conn = connect(db_path)
+    try:
+        for path in paths:
+            if path and os.path.exists(path):
+                # Una transacción por archivo: uno que falla no deshace los demás
+                with conn:
+                    (index_data_file(conn, path, force=True, video=video)
+                     or index_summary_file(conn, path, force=True))
+    finally:
+        conn.close()
+
+
+def scan(results_dir=RESULTS_DIR, db_path=None):
+    """Escaneo incremental de results/. Retorna (nuevos_o_cambiados, total, con_error).
+
+    Cada archivo se indexa en su propia transacción: una grabación dañada
+    se informa y se salta sin deshacer el resto del índice.
+    """
+    conn = connect(db_path)
+    updated = total = failed = 0
+    try:
+        # Primero las grabaciones: los resúmenes se enlazan contra ellas
+        for sub, index in (("full", index_data_file), ("summary", index_summary_file)):
+            folder = os.path.join(results_dir, sub)
+            if not os.path.isdir(folder):
+                continue
+            for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+                if not entry.is_file():
+                    continue
+                total += 1
+                try:
+                    with conn:
+                        if index(conn, entry.path):
+                            updated += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"✗ {entry.path}: {e}")
+
+        # Archivos borrados
+        with conn:
+            for row in conn.execute("SELECT path, session_id, kind FROM files").fetchall():
+                if not os.path.exists(row["path"]):
+                    conn.execute("DELETE FROM files WHERE path = ?", (row["path"],))
+                    if row["kind"] == "data":
+                        _delete_session(conn, row["session_id"])
+                    elif row["session_id"].startswith("summary_"):
+                        # Sesión que solo existía por el resumen
+                        _delete_session(conn, row["session_id"])
+                    else:
+                        conn.execute("UPDATE sessions SET summary_path = NULL, raw_path = NULL, "
+                                     "total_blinks = NULL, data_points = NULL WHERE id = ?",
+                                     (row["session_id"],))
+                        _delete_summary_stats(conn, row["session_id"])
+    finally:
+        conn.close()
+    return updated, total, failed
+
+
+# ── Consultas ─────────────────────────────────────────────────────────────────
+
+def query(conn, device=None, video=None, since=None, until=None, min_duration=None,
+          with_summary=False, limit=None):
+    """Sesiones que cumplen los filtros, más recientes primero."""
+    where, args = [], []
+    if device:
+        where.append("device = ?")
+        args.append(device)
+    if video:
+        where.append("EXISTS (SELECT 1 FROM json_each(sessions.videos) WHERE value = ?)")
+        args.append(video)
+    if since:
+        where.append("started_at >= ?")
+        args.append(since)
+    if until:
+        where.append("started_at < ?")
+        args.append(until)
+    if min_duration:
+        where.append("duration >= ?")
+        args.append(min_duration)
+    if with_summary:
+        where.append("summary_path IS NOT NULL")
+
+    sql = "SELECT * FROM sessions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY started_at DESC"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return conn.execute(sql, args).fetchall()
+
+
+def _date(text):
+    return datetime.strptime(text, "%Y-%m-%d").timestamp()
+
+
+def _scan(args):
+    start = time.perf_counter()
+    updated, total, failed = scan(args.results, args.db)
+    print(f"✓ {total} archivos revisados, {updated} nuevos o modificados, {failed} con error "
+          f"({time.perf_counter() - start:.2f}s)")
+
+
+def _list(args):
+    conn = connect(args.db)
+    start = time.perf_counter()
+    rows = query(conn, args.device, args.video, args.since and _date(args.since),
+                 args.until and _date(args.until), args.min_duration, args.with_summary, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    for r in rows:
+        started = datetime.fromtimestamp(r["started_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        videos  = ", ".join(json.loads(r["videos"] or "[]")) or "-"
+        print(f"{r['id']:<32} {started}  {r['duration'] or 0:7.1f}s  {r['frames'] or 0:>8} frames  "
+              f"{(r['bytes'] or 0) / 1e6:7.1f} MB  {r['format'] or '-':<7} "
+              f"{'resumen' if r['summary_path'] else '-':<8} {videos}")
+    print(f"\n{len(rows)} sesiones ({elapsed:.1f} ms)")
+
+
+def _fmt(value):
+    return "-" if value is None else f"{value:.3f}"
+
+
+def _show(args):
+    conn = connect(args.db)
+    row = conn.execute("SELECT * FROM sessions WHERE id = ?", (args.id,)).fetchone()
+    if row is None:
+        print(f"✗ Sesión no encontrada: {args.id}")
+        return
+    for key in row.keys():
+        print(f"{key + ':':<14} {row[key]}")
+    stats = conn.execute("SELECT * FROM stats WHERE session_id = ? ORDER BY metric", (args.id,)).fetchall()
+    if stats:
+        print("\nESTADÍSTICAS:")
+        for s in stats:
+            print(f"  {s['metric']:<20} min={_fmt(s['min'])} max={_fmt(s['max'])} avg={_fmt(s['avg'])}")
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Catálogo de sesiones en results/")
+    parser.add_argument("--db", help="ruta de la base (por defecto CATALOG_PATH o results/catalog.sqlite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("scan", help="indexar archivos nuevos o modificados")
+    p.add_argument("--results", default=RESULTS_DIR)
+    p.set_defaults(func=_scan)
+
+    p = sub.add_parser("list", help="listar sesiones")
+    p.add_argument("--device")
+    p.add_argument("--video")
+    p.add_argument("--since", help="YYYY-MM-DD")
+    p.add_argument("--until", help="YYYY-MM-DD")
+    p.add_argument("--min-duration", type=float)
+    p.add_argument("--with-summary", action="store_true")
+    p.add_argument("--limit", type=int)
+    p.set_defaults(func=_list)
+
+    p = sub.add_parser("show", help="detalle de una sesión")
+    p.add_argument("id")
+    p.set_defaults(func=_show)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,292 @@
+"""
+session_file.py
+---------------
+Formato binario de sesión (.fses): append-only, a prueba de cortes y con
+lectura por memory-map.
+
+    header: b"FSES" | uint16 versión | uint16 N expresiones
+            uint32 frames por bloque K | uint32 largo del header | float64 creación
+            JSON {"names": [...]} con el mapa de expresiones (relleno a 8 bytes)
+
+    registros de largo fijo (16 + 4N bytes):
+            float64 timestamp | uint32 seq | uint32 check | float32[N] valores
+
+Los frames se escriben en bloques de K registros seguidos de un registro
+footer (seq = 0xFFFFFFFF, timestamp = frames del bloque, check = CRC32 de
+los frames). Cada bloque se escribe de una vez y se hace fsync: si el
+proceso muere se pierde como máximo el bloque en curso, y el lector
+descarta cualquier cola incompleta o con CRC inválido. Solo el último
+bloque puede tener menos de K frames.
+
+Como todos los registros miden lo mismo, el archivo completo se abre como
+un numpy.memmap y el frame i está en el registro i + i // K: abrir una
+sesión de horas es instantáneo y el acceso aleatorio es O(1).
+
+Uso:
+    python session_file.py info   results/full/facial_data_pc_XXXX.fses
+    python session_file.py verify results/full/facial_data_pc_XXXX.fses
+    python session_file.py to-csv results/full/facial_data_pc_XXXX.fses
+"""
+
+import argparse
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+MAGIC   = b"FSES"
+VERSION = 1
+SESSION_EXTENSION = ".fses"
+
+DEFAULT_BLOCK_FRAMES = 90     # ~1 s a 90 Hz entre fsync
+
+FOOTER_SEQ = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<4sHHIId")
+
+
+def record_dtype(n_expressions):
+    """dtype de un registro (frame o footer)."""
+    return np.dtype([
+        ("t",      "<f8"),
+        ("seq",    "<u4"),
+        ("check",  "<u4"),
+        ("values", "<f4", (n_expressions,)),
+    ])
+
+
+class SessionWriter:
+    """Escribe frames en bloques con CRC. Misma interfaz que los writers CSV."""
+
+    def __init__(self, path, names, block_frames=DEFAULT_BLOCK_FRAMES, fsync=True):
+        self.path   = path
+        self.names  = list(names)
+        self.frames = 0
+        self.block_frames = block_frames
+        self.fsync  = fsync
+
+        # Bloque preasignado: K frames + 1 footer
+        self._block = np.zeros(block_frames + 1, dtype=record_dtype(len(self.names)))
+        self._count = 0
+
+        meta = json.dumps({"names": self.names}).encode("utf-8")
+        meta += b" " * (-(_HEADER.size + len(meta)) % 8)
+        header_len = _HEADER.size + len(meta)
+
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(self.names),
+                                      block_frames, header_len, time.time()))
+        self._file.write(meta)
+        self._sync()
+
+    def write(self, timestamp, values, seq=None):
+        """Agrega un frame. `seq` por defecto es el número de frame en el archivo."""
+        block = self._block
+        i = self._count
+        block["t"][i]      = timestamp
+        block["seq"][i]    = self.frames if seq is None else seq
+        block["check"][i]  = 0
+        block["values"][i] = values
+        self._count  += 1
+        self.frames  += 1
+        if self._count == self.block_frames:
+            self.flush()
+
+    def write_many(self, timestamps, seqs, values):
+        """Agrega un lote de frames (values con forma (n, N))."""
+        for timestamp, seq, row in zip(timestamps, seqs, values):
+            self.write(timestamp, row, seq)
+
+    def sync(self, fsync=False):
+        # Los bloques completos ya quedan en disco al escribirse; el bloque en
+        # curso se mantiene en memoria para no romper el mapeo de índices
+        pass
+
+    def flush(self):
+        """Escribe el bloque en curso con su footer.
+
+        Solo debe llamarse con el bloque lleno o al cerrar: un bloque
+        parcial en medio del archivo rompe el mapeo de índices.
+        """
+        n = self._count
+        if not n:
+            return
+        block = self._block
+        block["t"][n]      = n
+        block["seq"][n]    = FOOTER_SEQ
+        block["check"][n]  = zlib.crc32(block[:n].data)
+        block["values"][n] = 0
+
+        self._file.write(self._block[:n + 1].data)
+        self._sync()
+        self._count = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def _sync(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+
+class SessionReader:
+    """Lectura por memmap de un .fses. Se indexa como un arreglo de frames.
+
+    reader[i]       -> registro del frame i (campos t, seq, values)
+    reader[a:b]     -> copia de los frames a..b
+    reader.blocks() -> vista (sin copia) de los bloques completos, forma (B, K)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                raise ValueError(f"{path} no es una sesión válida")
+            magic, version, n_expr, block_frames, header_len, created = _HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} no es una sesión válida")
+            meta = json.loads(f.read(header_len - _HEADER.size).decode("utf-8"))
+
+        self.names        = meta["names"]
+        self.created      = created
+        self.block_frames = block_frames
+        self.dtype        = record_dtype(n_expr)
+
+        size = os.path.getsize(path)
+        n_records = (size - header_len) // self.dtype.itemsize
+        self.records = (np.memmap(path, dtype=self.dtype, mode="r",
+                                  offset=header_len, shape=(n_records,))
+                        if n_records else np.zeros(0, dtype=self.dtype))
+
+        self.n_frames = self._find_end(n_records)
+        # Bytes al final que no forman parte de un bloque válido (corte a mitad de escritura)
+        self.discarded_bytes = size - header_len - self._records_used() * self.dtype.itemsize
+
+    # ── Estructura ────────────────────────────────────────────────────────
+
+    def _block_ok(self, start, count):
+        footer = self.records[start + count]
+        return (footer["seq"] == FOOTER_SEQ and int(footer["t"]) == count
+                and int(footer["check"]) == zlib.crc32(self.records[start:start + count].data))
+
+    def _find_end(self, n_records):
+        """Frames válidos: bloques completos sanos + un bloque final parcial."""
+        k   = self.block_frames
+        per = k + 1
+        full = n_records // per
+        while full and not self._block_ok((full - 1) * per, k):
+            full -= 1
+
+        # Bloque final parcial: su footer es el último registro
+        start = full * per
+        rest  = n_records - start
+        if rest >= 2 and full == n_records // per and self._block_ok(start, rest - 1):
+            return full * k + rest - 1
+        return full * k
+
+    def _records_used(self):
+        full, rest = divmod(self.n_frames, self.block_frames)
+        return full * (self.block_frames + 1) + (rest + 1 if rest else 0)
+
+    def verify(self):
+        """Revisa el CRC de todos los bloques. Retorna los índices de bloques dañados."""
+        k, per = self.block_frames, self.block_frames + 1
+        bad = []
+        for b in range(-(-self.n_frames // k)):
+            count = min(k, self.n_frames - b * k)
+            if not self._block_ok(b * per, count):
+                bad.append(b)
+        return bad
+
+    # ── Acceso a frames ───────────────────────────────────────────────────
+
+    def __len__(self):
+        return self.n_frames
+
+    def record_index(self, i):
+        """Índice de registro del frame i (acepta arreglos)."""
+        return i + i // self.block_frames
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            idx = np.arange(*key.indices(self.n_frames))
+            return self.records[self.record_index(idx)]
+        if key < 0:
+            key += self.n_frames
+        if not 0 <= key < self.n_frames:
+            raise IndexError("frame fuera de rango")
+        return self.records[self.record_index(key)]
+
+    def blocks(self):
+        """Vista (B, K) de los bloques completos, sin copiar."""
+        full = self.n_frames // self.block_frames
+        per  = self.block_frames + 1
+        return self.records[:full * per].reshape(full, per)[:, :self.block_frames]
+
+    @property
+    def timestamps(self):
+        return self[:]["t"]
+
+    @property
+    def values(self):
+        return self[:]["values"]
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def _info(args):
+    reader = SessionReader(args.path)
+    print(f"Creado:      {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reader.created))}")
+    print(f"Expresiones: {len(reader.names)}")
+    print(f"Frames:      {len(reader)} (bloques de {reader.block_frames})")
+    if len(reader):
+        print(f"Duración:    {reader[-1]['t'] - reader[0]['t']:.1f}s")
+    if reader.discarded_bytes:
+        print(f"⚠ {reader.discarded_bytes} bytes finales descartados (sesión cortada)")
+
+
+def _verify(args):
+    reader = SessionReader(args.path)
+    bad = reader.verify()
+    if bad:
+        print(f"✗ {len(bad)} bloques con CRC inválido: {bad[:20]}")
+    else:
+        print(f"✓ {len(reader)} frames, todos los bloques OK")
+
+
+def _to_csv(args):
+    from recording import WideCsvWriter
+
+    reader = SessionReader(args.path)
+    dst = args.output or os.path.splitext(args.path)[0] + ".csv"
+    writer = WideCsvWriter(dst, reader.names)
+    step = reader.block_frames * 100
+    for start in range(0, len(reader), step):
+        for frame in reader[start:start + step]:
+            writer.write(frame["t"], frame["values"], seq=frame["seq"])
+    writer.close()
+    print(f"✓ {args.path} -> {dst} ({writer.frames} frames)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sesiones binarias .fses")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, text in (("info", _info, "resumen de la sesión"),
+                             ("verify", _verify, "revisar el CRC de todos los bloques"),
+                             ("to-csv", _to_csv, "exportar a CSV ancho")):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("path")
+        p.set_defaults(func=func)
+        if name == "to-csv":
+            p.add_argument("-o", "--output")
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,202 @@
+"""
+stream_ingest.py
+----------------
+Ingesta de frames por socket TCP como alternativa a leer logcat.
+
+El headset abre una conexión TCP y envía una línea por frame con el mismo
+formato que usa en logcat:
+
+    [FACIAL_DATA]{"t":12.5,"d":{"0":0.01,...}}\n
+    [FACIAL_DATA_B]<base64>\n
+
+Por cable se usa `adb reverse tcp:PORT tcp:PORT` (el Quest se conecta a
+localhost:PORT y adb lo tuneliza al PC); por WiFi el Quest se conecta
+directo a la IP del PC. En ambos casos no hace falta `logcat -c` ni se
+pierden frames por el ring buffer de logcat.
+
+El servidor corre un loop asyncio en un thread propio y entrega cada frame
+a `on_frame(timestamp, values)`, el mismo pipeline que usa logcat.
+"""
+
+import asyncio
+import subprocess
+import threading
+
+import numpy as np
+
+from frame_decoder import parse_frame, parse_frame_legacy, frame_from_dict, parse_frame_binary
+
+DEFAULT_STREAM_PORT = 8767
+
+_FACIAL_DATA   = b"[FACIAL_DATA]"
+_FACIAL_DATA_B = b"[FACIAL_DATA_B]"
+
+# Límite de línea del StreamReader (un frame JSON ocupa ~1 KB)
+_LINE_LIMIT = 1 << 20
+
+
+def adb_reverse(adb_path, port, serial=None):
+    """Tuneliza localhost:port del Quest al PC. Retorna (ok, mensaje)."""
+    cmd = [adb_path]
+    if serial:
+        cmd += ["-s", serial]
+    cmd += ["reverse", f"tcp:{port}", f"tcp:{port}"]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, str(e)
+    if result.returncode != 0:
+        return False, (result.stderr or result.stdout).strip()
+    return True, f"adb reverse tcp:{port} activo"
+
+
+class StreamReceiver:
+    """Servidor TCP asyncio que recibe frames y llama a `on_frame`.
+
+    on_frame(timestamp, values): values es un vector float32 reutilizado;
+        copiarlo si se guarda más allá de la llamada.
+    on_event(data): líneas [FACIAL_DATA] que no son frames (ej. eventos).
+    on_status(mensaje): conexiones, desconexiones y errores.
+    """
+
+    def __init__(self, on_frame, n_expressions, port=DEFAULT_STREAM_PORT,
+                 host="0.0.0.0", on_event=None, on_status=None):
+        self.on_frame  = on_frame
+        self.on_event  = on_event
+        self.on_status = on_status
+        self.host = host
+        self.port = port
+        self.n_expressions = n_expressions
+
+        self._loop    = None
+        self._server  = None
+        self._thread  = None
+        self._ready   = threading.Event()
+        self._error   = None
+
+        # Contadores para diagnóstico
+        self.frames_received = 0
+        self.frames_lost     = 0
+        self.bad_lines       = 0
+
+    # ── Ciclo de vida ─────────────────────────────────────────────────────
+
+    def start(self, timeout=5):
+        """Inicia el servidor en segundo plano. Lanza OSError si no puede escuchar."""
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self._error is not None:
+            raise self._error
+
+    def stop(self, timeout=5):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._shutdown)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def address(self):
+        """(host, puerto) real en el que se escucha (útil con port=0)."""
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[:2]
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._server = self._loop.run_until_complete(asyncio.start_server(
+                self._handle_client, self.host, self.port, limit=_LINE_LIMIT))
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            self._loop.close()
+            return
+
+        self._ready.set()
+        self._status(f"Escuchando frames en {self.host}:{self.address[1]}")
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    def _shutdown(self):
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+        self._loop.stop()
+
+    def _status(self, message):
+        if self.on_status:
+            self.on_status(message)
+
+    # ── Conexión ──────────────────────────────────────────────────────────
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        self._status(f"Headset conectado por socket: {peer}")
+
+        # Un vector por conexión: cada headset escribe en el suyo
+        values   = np.zeros(self.n_expressions, dtype=np.float32)
+        last_seq = None
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError as e:
+                    # Línea demasiado larga: descartarla completa
+                    await reader.readexactly(e.consumed)
+                    self.bad_lines += 1
+                    continue
+
+                if line.startswith(_FACIAL_DATA_B):
+                    frame = parse_frame_binary(
+                        line[len(_FACIAL_DATA_B):].strip().decode("ascii", "replace"), values)
+                    if frame is None:
+                        self.bad_lines += 1
+                        continue
+                    timestamp, seq = frame
+                    if last_seq is not None and seq > last_seq + 1:
+                        self.frames_lost += seq - last_seq - 1
+                    last_seq = seq
+
+                elif line.startswith(_FACIAL_DATA):
+                    payload   = line[len(_FACIAL_DATA):].strip().decode("utf-8", "replace")
+                    timestamp = parse_frame(payload, values)
+                    if timestamp is None:
+                        timestamp = self._decode_other(payload, values)
+                        if timestamp is None:
+                            continue
+
+                else:
+                    self.bad_lines += 1
+                    continue
+
+                self.frames_received += 1
+                self.on_frame(timestamp, values)
+
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._status(f"Error en conexión {peer}: {e}")
+        finally:
+            writer.close()
+            self._status(f"Headset desconectado: {peer}")
+
+    def _decode_other(self, payload, values):
+        """Camino lento: eventos de sesión o JSON no estándar."""
+        try:
+            data = parse_frame_legacy(payload)
+            if "d" in data:
+                return frame_from_dict(data, values)
+            if self.on_event:
+                self.on_event(data)
+        except (ValueError, TypeError, AttributeError):
+            self.bad_lines += 1
+        return None
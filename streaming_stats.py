@@ -0,0 +1,174 @@
+"""
+streaming_stats.py
+------------------
+Estadísticas en línea del lado del PC para las 63 expresiones y todas las
+métricas derivadas: cantidad, media y varianza (Welford), mínimo, máximo y
+EWMA por canal.
+
+Cada frame es una actualización O(1) vectorizada sobre buffers
+preasignados (unas pocas ufuncs in-place, sin importar cuántos canales
+haya); para sesiones grabadas update_batch() combina un lote completo con
+la fórmula de Chan, con el mismo resultado que frame a frame.
+
+Al detener la captura las estadísticas se guardan junto a la grabación:
+
+    results/full/facial_data_pc_YYYYmmdd_HHMMSS_stats.json
+    (y en el atributo host_stats si la sesión es .h5)
+
+Así el resumen de la sesión no depende de que llegue el de Unity por TCP,
+ni de que Unity mande el rawData completo.
+
+    STATS_EWMA_ALPHA=0.05     (opcional: peso del frame nuevo en el EWMA)
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from hdf5_session import attach_stats, HDF5_EXTENSION
+
+
+def stats_path(recording_path):
+    """Ruta del JSON de estadísticas de una grabación."""
+    return os.path.splitext(recording_path)[0] + "_stats.json"
+
+
+class StreamingStats:
+    """Media/varianza de Welford, min/max y EWMA por canal."""
+
+    def __init__(self, names, ewma_alpha=None):
+        self.names = list(names)
+        self.alpha = ewma_alpha or float(os.getenv("STATS_EWMA_ALPHA", "0.05"))
+        n = len(self.names)
+        self.count = 0
+        self.mean  = np.zeros(n, dtype=np.float64)
+        self.m2    = np.zeros(n, dtype=np.float64)
+        self.min   = np.full(n, np.inf, dtype=np.float64)
+        self.max   = np.full(n, -np.inf, dtype=np.float64)
+        self.ewma  = np.zeros(n, dtype=np.float64)
+        self._delta = np.zeros(n, dtype=np.float64)
+        self._tmp   = np.zeros(n, dtype=np.float64)
+
+    def update(self, x):
+        """Agrega un frame (vector de N canales)."""
+        self.count += 1
+        delta, tmp = self._delta, self._tmp
+        np.subtract(x, self.mean, out=delta)
+        np.divide(delta, self.count, out=tmp)
+        self.mean += tmp
+        np.subtract(x, self.mean, out=tmp)
+        tmp *= delta
+        self.m2 += tmp
+        np.minimum(self.min, x, out=self.min)
+        np.maximum(self.max, x, out=self.max)
+        if self.count == 1:
+            self.ewma[:] = x
+        else:
+            np.subtract(x, self.ewma, out=tmp)
+            tmp *= self.alpha
+            self.ewma += tmp
+
+    def update_batch(self, frames):
+        """Agrega un lote (n, N) de una vez (combinación de Chan)."""
+        frames = np.asarray(frames, dtype=np.float64)
+        n = len(frames)
+        if not n:
+            return
+        batch_mean = frames.mean(axis=0)
+        batch_m2   = ((frames - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * (n / total)
+        self.m2   += batch_m2 + delta ** 2 * (self.count * n / total)
+        np.minimum(self.min, frames.min(axis=0), out=self.min)
+        np.maximum(self.max, frames.max(axis=0), out=self.max)
+
+        # EWMA en forma cerrada: peso alpha*(1-alpha)^k al frame k-ésimo desde el final
+        if self.count == 0:
+            self.ewma[:] = frames[0]
+            frames = frames[1:]
+        decay   = 1.0 - self.alpha
+        weights = self.alpha * decay ** np.arange(len(frames) - 1, -1, -1)
+        self.ewma = decay ** len(frames) * self.ewma + weights @ frames
+        self.count = total
+
+    @property
+    def variance(self):
+        return self.m2 / max(self.count - 1, 1)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def channel(self, i):
+        """Estadísticas de un canal como dict (mismas claves que el resumen de Unity + extras)."""
+        if not self.count:
+            return {"count": 0}
+        std = float(np.sqrt(self.m2[i] / max(self.count - 1, 1)))
+        return {"count": self.count, "min": float(self.min[i]), "max": float(self.max[i]),
+                "avg": float(self.mean[i]), "std": std, "ewma": float(self.ewma[i])}
+
+    def to_dict(self):
+        return {name: self.channel(i) for i, name in enumerate(self.names)}
+
+
+class SessionStats:
+    """Estadísticas de una sesión: expresiones + métricas derivadas en un solo vector."""
+
+    def __init__(self, expression_names, metric_names, ewma_alpha=None):
+        self.expression_names = list(expression_names)
+        self.metric_names     = list(metric_names)
+        self.stats  = StreamingStats(self.expression_names + self.metric_names, ewma_alpha)
+        self._n     = len(self.expression_names)
+        self._frame = np.zeros(len(self.stats.names), dtype=np.float64)
+        self.started = time.time()
+
+    def reset(self):
+        self.__init__(self.expression_names, self.metric_names, self.stats.alpha)
+
+    def update(self, values, metrics):
+        self._frame[:self._n] = values
+        self._frame[self._n:] = metrics
+        self.stats.update(self._frame)
+
+    def update_batch(self, values, metrics):
+        self.stats.update_batch(np.hstack([values, metrics]))
+
+    @property
+    def frames(self):
+        return self.stats.count
+
+    def metric(self, name):
+        return self.stats.channel(self._n + self.metric_names.index(name))
+
+    def format_metrics(self, labels=None):
+        """Texto para la UI: promedio ± desviación y rango de cada métrica, en %."""
+        lines = [f"Sesión ({self.frames} frames):"]
+        for name, label in zip(self.metric_names, labels or self.metric_names):
+            s = self.metric(name)
+            if s["count"]:
+                lines.append(f"{label}: {s['avg']*100:.1f}% ±{s['std']*100:.1f} "
+                             f"[{s['min']*100:.0f}-{s['max']*100:.0f}]")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        channels = self.stats.to_dict()
+        return {
+            "created":     self.started,
+            "frames":      self.stats.count,
+            "ewma_alpha":  self.stats.alpha,
+            "statistics":  {name: channels[name] for name in self.metric_names},
+            "expressions": {name: channels[name] for name in self.expression_names},
+        }
+
+    def save(self, recording_path):
+        """Guarda el JSON junto a la grabación (y en el .h5 si corresponde). Retorna la ruta."""
+        data = self.to_dict()
+        path = stats_path(recording_path)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        if recording_path.endswith(HDF5_EXTENSION):
+            attach_stats(recording_path, data)
+        return path
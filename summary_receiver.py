@@ -0,0 +1,137 @@
+"""
+summary_receiver.py
+-------------------
+Recepción y guardado del resumen de sesión que Unity envía por TCP al
+terminar (metadata + statistics + rawData).
+
+El rawData de una sesión larga son decenas de MB, así que todo el trabajo
+pesado se hace en el thread del servidor y nunca en el de Tk:
+
+- receive_payload(): recv_into sobre un buffer preasignado que crece al
+  doble cuando se llena (sin `data += chunk` cuadrático).
+- save_session_summary(): sanea el texto, recorre rawData punto por punto
+  con JSONDecoder.raw_decode escribiendo el CSV raw a medida que avanza
+  (sin armar la lista completa en memoria) y guarda el resto del resumen
+  como JSON indentado.
+
+A la UI solo le llega el diccionario chico (metadata, statistics, ...),
+sin rawData.
+
+    results/summary/session_summary_YYYYmmdd_HHMMSS.json   resumen sin rawData
+    results/raw/session_raw_data_YYYYmmdd_HHMMSS.csv       Timestamp,Expression_ID,Value
+"""
+
+import csv
+import json
+import os
+import re
+from datetime import datetime
+
+RECV_BUFFER_BYTES = 1024 * 1024
+
+# Unity serializa a veces con coma decimal ("0,5") y comillas simples
+_DECIMAL_COMMA_RE = re.compile(rb"(\d),(\d)")
+_RAW_DATA_RE      = re.compile(r'"rawData"\s*:\s*\[')
+_SEPARATOR_RE     = re.compile(r"[\s,]*")
+
+RAW_HEADER = ["Timestamp", "Expression_ID", "Value"]
+
+
+def receive_payload(sock, initial_size=RECV_BUFFER_BYTES):
+    """Lee del socket hasta que el cliente cierra. Retorna un bytearray."""
+    buf  = bytearray(initial_size)
+    size = 0
+    while True:
+        if size == len(buf):
+            buf.extend(bytes(len(buf)))
+        with memoryview(buf)[size:] as view:
+            n = sock.recv_into(view)
+        if not n:
+            break
+        size += n
+    del buf[size:]
+    return buf
+
+
+def sanitize_payload(payload, replace_quotes=True):
+    """Texto JSON saneado: comillas simples a dobles y comas decimales a puntos."""
+    payload = bytes(payload).strip()
+    if replace_quotes:
+        payload = payload.replace(b"'", b'"')
+    if _DECIMAL_COMMA_RE.search(payload):
+        payload = _DECIMAL_COMMA_RE.sub(rb"\1.\2", payload)
+    return payload.decode("utf-8")
+
+
+def _stream_raw_data(text, start, writer):
+    """Recorre el arreglo rawData desde `start` (justo después de '[').
+
+    Escribe cada punto en el CSV apenas se decodifica. Retorna
+    (índice después de ']', puntos escritos).
+    """
+    decoder = json.JSONDecoder()
+    idx = start
+    points = 0
+    while True:
+        idx = _SEPARATOR_RE.match(text, idx).end()
+        if idx >= len(text):
+            raise ValueError("rawData sin cerrar")
+        if text[idx] == "]":
+            return idx + 1, points
+        point, idx = decoder.raw_decode(text, idx)
+        if writer is not None:
+            timestamp_val = point.get("t", 0)
+            writer.writerows([timestamp_val, exp_id, value]
+                             for exp_id, value in point.get("e", {}).items())
+        points += 1
+
+
+def parse_summary(text, raw_file=None):
+    """Parsea el resumen; rawData va directo a `raw_file` (abierto) si se pasa.
+
+    Retorna (resumen sin rawData, cantidad de puntos raw).
+    """
+    match = _RAW_DATA_RE.search(text)
+    if not match:
+        data = json.loads(text)
+        return data, 0
+
+    writer = None
+    if raw_file is not None:
+        writer = csv.writer(raw_file)
+        writer.writerow(RAW_HEADER)
+    end, points = _stream_raw_data(text, match.end(), writer)
+
+    # El resto del documento es chico: se parsea con rawData vacío
+    data = json.loads(text[:match.start()] + '"rawData": []' + text[end:])
+    data.pop("rawData", None)
+    return data, points
+
+
+def save_session_summary(payload, summary_dir="results/summary", raw_dir="results/raw",
+                         replace_quotes=True):
+    """Guarda resumen y datos raw de un payload recibido.
+
+    Retorna (resumen sin rawData, ruta del JSON, ruta del CSV raw o None, puntos raw).
+    """
+    text = sanitize_payload(payload, replace_quotes)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(summary_dir, exist_ok=True)
+    os.makedirs(raw_dir, exist_ok=True)
+    summary_file = os.path.join(summary_dir, f"session_summary_{timestamp}.json")
+    raw_path     = os.path.join(raw_dir, f"session_raw_data_{timestamp}.csv")
+
+    try:
+        with open(raw_path, "w", newline="") as raw_file:
+            data, points = parse_summary(text, raw_file)
+    except Exception:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+        raise
+    if not points:
+        os.remove(raw_path)
+        raw_path = None
+
+    with open(summary_file, "w") as f:
+        json.dump(data, f, indent=2)
+    return data, summary_file, raw_path, points
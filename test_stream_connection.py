@@ -0,0 +1,96 @@
+import argparse
+import math
+import socket
+import time
+
+import numpy as np
+
+from frame_decoder import encode_frame_binary, ENCODINGS, ENCODING_MODES
+from stream_ingest import StreamReceiver, DEFAULT_STREAM_PORT
+
+N_EXPRESSIONS = 63
+
+
+def make_line(seq, t, encoding):
+    """Genera una línea de frame sintética como la enviaría el Quest"""
+    values = np.array([0.5 + 0.5 * math.sin(t * 2 + i) for i in range(N_EXPRESSIONS)],
+                      dtype=np.float32)
+    if encoding == "json":
+        body = ",".join(f'"{i}":{v:.5f}' for i, v in enumerate(values))
+        return f'[FACIAL_DATA]{{"t":{t:.4f},"d":{{{body}}}}}\n'.encode("utf-8")
+    return f"[FACIAL_DATA_B]{encode_frame_binary(seq, t, values, ENCODINGS[encoding])}\n".encode("ascii")
+
+
+def run_sender(host, port, rate, seconds, encoding):
+    """Emisor de reemplazo: se comporta como el Quest enviando frames por socket"""
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.settimeout(5)
+    client.connect((host, port))
+    rate_text = f"{rate:g} Hz" if rate > 0 else "sin límite"
+    print(f"✓ Conectado a {host}:{port} — enviando {rate_text} ({encoding}) por {seconds:g}s")
+
+    period = 1.0 / rate if rate > 0 else 0
+    start = time.perf_counter()
+    sent = 0
+    while True:
+        t = time.perf_counter() - start
+        if t >= seconds:
+            break
+        client.sendall(make_line(sent, t, encoding))
+        sent += 1
+        if period:
+            delay = start + sent * period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    client.close()
+    return sent
+
+
+def test_stream(host, port, rate, seconds, encoding, loopback):
+    print("=" * 60)
+    print("TEST DE INGESTA POR SOCKET")
+    print("=" * 60)
+
+    receiver = None
+    received = []
+    if loopback:
+        # Receptor local en un puerto libre: prueba completa sin headset
+        receiver = StreamReceiver(lambda ts, values: received.append((ts, values[0])),
+                                  N_EXPRESSIONS, port=0, host="127.0.0.1",
+                                  on_status=lambda m: print(f"  [receptor] {m}"))
+        receiver.start()
+        host, port = receiver.address
+
+    try:
+        sent = run_sender(host, port, rate, seconds, encoding)
+    except OSError as e:
+        print(f"✗ Error: {e}")
+        return
+
+    print(f"\nFrames enviados: {sent}")
+
+    if receiver:
+        time.sleep(0.5)
+        receiver.stop()
+        print(f"Frames recibidos: {receiver.frames_received}")
+        print(f"Líneas inválidas: {receiver.bad_lines}")
+        if receiver.frames_received == sent and receiver.bad_lines == 0:
+            print("✓✓✓ INGESTA POR SOCKET FUNCIONANDO ✓✓✓")
+        else:
+            print("✗✗✗ SE PERDIERON FRAMES ✗✗✗")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Emisor de frames de prueba para la ingesta por socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_STREAM_PORT)
+    parser.add_argument("--rate", type=float, default=90, help="frames por segundo (0 = sin límite)")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--encoding", choices=ENCODING_MODES, default="json")
+    parser.add_argument("--loopback", action="store_true",
+                        help="levantar un receptor local y verificar que llegan todos los frames")
+    args = parser.parse_args()
+    test_stream(args.host, args.port, args.rate, args.seconds, args.encoding, args.loopback)
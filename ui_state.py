@@ -0,0 +1,42 @@
+"""
+ui_state.py
+-----------
+Actualización de widgets de Tk solo cuando cambian.
+
+Los dashboards ya no programan un root.after(0, ...) por frame (a 90 Hz
+eso llenaba la cola de eventos de Tk con cientos de callbacks por segundo,
+cada uno reescribiendo el panel de texto). El thread de ingesta solo
+publica el último frame y la UI lo lee en un tick fijo (UI_TICK_MS). En
+cada tick WidgetCache compara lo que se va a mostrar con lo último que se
+mostró en cada widget (dirty flag) y no toca los que no cambiaron.
+"""
+
+
+class WidgetCache:
+    """config()/texto de widgets con el último valor mostrado por widget."""
+
+    def __init__(self):
+        self._shown = {}
+
+    def config(self, widget, **options):
+        """widget.config(**options) si cambió algo. Retorna True si se actualizó."""
+        key = id(widget)
+        if self._shown.get(key) == options:
+            return False
+        self._shown[key] = options
+        widget.config(**options)
+        return True
+
+    def set_text(self, text_widget, text):
+        """Reemplaza el contenido de un Text/ScrolledText si cambió."""
+        key = id(text_widget)
+        if self._shown.get(key) == text:
+            return False
+        self._shown[key] = text
+        text_widget.delete("1.0", "end")
+        text_widget.insert("end", text)
+        return True
+
+    def invalidate(self):
+        """Olvida lo mostrado (el próximo tick vuelve a escribir todo)."""
+        self._shown.clear()
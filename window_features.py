@@ -0,0 +1,387 @@
+"""
+window_features.py
+------------------
+Features por ventana deslizante (1 s / 5 s / 30 s por defecto) para las 63
+expresiones y las métricas derivadas: media, desviación, mínimo, máximo,
+percentiles y tasa de cambio (unidades por segundo entre el primer y el
+último frame de la ventana).
+
+Todo se mantiene de forma incremental, sin recorrer la ventana en cada
+frame, así que el costo por frame no depende del largo de la ventana:
+
+- media / desviación: sumas corrientes (se suma el frame que entra y se
+  resta el que sale; se recalculan exactas cada vez que se rota la pila).
+- mínimo / máximo: cola de dos pilas vectorizada sobre los canales (la
+  versión por lotes del deque monótono): la pila de atrás guarda el
+  min/max acumulado y la de adelante los min/max de sufijo, que se arman
+  con un solo minimum.accumulate cuando se vacía. O(1) amortizado.
+- percentiles: histograma por canal de HIST_BINS bins sobre [0, 1] (los
+  valores fuera del rango caen en el primer/último bin y los NaN en el
+  primero), resolución 1/bins.
+
+Los features se publican cada WINDOW_PUBLISH_SECONDS (según el timestamp
+de los frames) a los listeners registrados: la UI, un CSV junto a la
+grabación (FeatureCsvLog) y opcionalmente UDP (UdpFeaturePublisher). Estos
+dos solo encolan el snapshot en el thread de ingesta; el formateo, el
+disco y el socket corren en un thread propio (QueuedListener).
+
+    WINDOW_SECONDS=1,5,30           (opcional: largos de ventana en segundos)
+    WINDOW_PUBLISH_SECONDS=0.5      (opcional: cada cuánto se publican)
+    WINDOW_PERCENTILES=10,50,90     (opcional)
+    FEATURES_UDP=192.168.1.50:9000  (opcional: envía las métricas como JSON por UDP)
+
+    results/full/facial_data_pc_YYYYmmdd_HHMMSS_features.csv
+        Timestamp,Window,Feature,<un valor por canal>
+"""
+
+import json
+import os
+import queue
+import socket
+import threading
+
+import numpy as np
+
+HIST_BINS = 100
+
+# Publicaciones pendientes por listener (a 0.5 s, medio minuto de atraso)
+LISTENER_QUEUE = 64
+
+
+def _env_floats(name, default):
+    return [float(v) for v in os.getenv(name, default).split(",") if v.strip()]
+
+
+def features_path(recording_path):
+    """Ruta del CSV de features por ventana de una grabación."""
+    return os.path.splitext(recording_path)[0] + "_features.csv"
+
+
+class SlidingWindow:
+    """Agregados de los últimos `seconds` segundos de vectores de N canales."""
+
+    def __init__(self, seconds, n_channels, bins=HIST_BINS, capacity=256):
+        self.seconds = seconds
+        self.n = n_channels
+        self.bins = bins
+        self._rows = np.arange(n_channels)
+        self._lo   = np.float32(0)
+        self._hi   = np.float32(bins - 1)
+        self._alloc(capacity)
+        self.reset()
+
+    def _alloc(self, capacity):
+        self._cap       = capacity
+        self._t         = np.zeros(capacity, dtype=np.float64)
+        self._x         = np.zeros((capacity, self.n), dtype=np.float32)
+        self._bin       = np.zeros((capacity, self.n), dtype=np.int16)
+        self._front_min = np.zeros((capacity, self.n), dtype=np.float32)
+        self._front_max = np.zeros((capacity, self.n), dtype=np.float32)
+
+    def reset(self):
+        # Contadores absolutos; la posición en el ring es contador % capacidad
+        self._head = self._mid = self._tail = 0
+        self._back_min = np.full(self.n, np.inf, dtype=np.float32)
+        self._back_max = np.full(self.n, -np.inf, dtype=np.float32)
+        self.sum   = np.zeros(self.n, dtype=np.float64)
+        self.sumsq = np.zeros(self.n, dtype=np.float64)
+        self.hist  = np.zeros((self.n, self.bins), dtype=np.int32)
+        self._sq   = np.zeros(self.n, dtype=np.float64)
+        self._scaled = np.zeros(self.n, dtype=np.float32)
+
+    @property
+    def count(self):
+        return self._tail - self._head
+
+    def _grow(self):
+        old = np.arange(self._head, self._tail)
+        src = old % self._cap
+        arrays = (self._t, self._x, self._bin, self._front_min, self._front_max)
+        self._alloc(self._cap * 2)
+        dst = old % self._cap
+        for new, prev in zip((self._t, self._x, self._bin, self._front_min, self._front_max), arrays):
+            new[dst] = prev[src]
+
+    def push(self, t, x):
+        """Agrega un frame y saca los que quedaron fuera de la ventana."""
+        if self.count == self._cap:
+            self._grow()
+        i = self._tail % self._cap
+        self._t[i] = t
+        self._x[i] = x
+
+        b = self._bin[i]
+        np.multiply(x, self.bins, out=self._scaled)
+        # fmax/fmin: un NaN queda en el primer bin (maximum lo dejaría pasar al cast)
+        np.fmax(self._scaled, self._lo, out=self._scaled)
+        np.fmin(self._scaled, self._hi, out=self._scaled)
+        b[:] = self._scaled
+        self.hist[self._rows, b] += 1
+
+        self.sum += x
+        np.square(x, out=self._sq, dtype=np.float64)
+        self.sumsq += self._sq
+        np.minimum(self._back_min, x, out=self._back_min)
+        np.maximum(self._back_max, x, out=self._back_max)
+        self._tail += 1
+
+        while t - self._t[self._head % self._cap] > self.seconds:
+            self._pop()
+
+    def _pop(self):
+        if self._head == self._mid:
+            self._flip()
+        i = self._head % self._cap
+        x = self._x[i]
+        self.sum -= x
+        np.square(x, out=self._sq, dtype=np.float64)
+        self.sumsq -= self._sq
+        self.hist[self._rows, self._bin[i]] -= 1
+        self._head += 1
+
+    def _flip(self):
+        # La pila de atrás pasa adelante con sus min/max de sufijo
+        idx = np.arange(self._head, self._tail) % self._cap
+        block = self._x[idx]
+        self._front_min[idx] = np.minimum.accumulate(block[::-1], axis=0)[::-1]
+        self._front_max[idx] = np.maximum.accumulate(block[::-1], axis=0)[::-1]
+        self._mid = self._tail
+        self._back_min.fill(np.inf)
+        self._back_max.fill(-np.inf)
+        # El bloque es la ventana completa: sumas exactas (sin arrastre de redondeo)
+        self.sum[:]   = block.sum(axis=0, dtype=np.float64)
+        self.sumsq[:] = np.square(block, dtype=np.float64).sum(axis=0)
+
+    def minimum(self):
+        if self._head < self._mid:
+            return np.minimum(self._front_min[self._head % self._cap], self._back_min)
+        return self._back_min.copy()
+
+    def maximum(self):
+        if self._head < self._mid:
+            return np.maximum(self._front_max[self._head % self._cap], self._back_max)
+        return self._back_max.copy()
+
+    def percentiles(self, percentiles):
+        """Percentiles por canal desde el histograma (centro del bin) -> (P, N)."""
+        cum = np.cumsum(self.hist, axis=1)
+        targets = np.ceil(np.asarray(percentiles) / 100.0 * self.count).clip(1)
+        idx = (cum[None, :, :] < targets[:, None, None]).sum(axis=2)
+        return (idx + 0.5) / self.bins
+
+    def features(self, percentiles=()):
+        """Dict {feature: vector (N,)} de la ventana actual."""
+        n = self.count
+        mean = self.sum / n
+        var  = np.maximum(self.sumsq / n - mean * mean, 0.0) * (n / max(n - 1, 1))
+        first = self._head % self._cap
+        last  = (self._tail - 1) % self._cap
+        dt = self._t[last] - self._t[first]
+        rate = (self._x[last] - self._x[first]) / dt if dt > 0 else np.zeros(self.n)
+        features = {"mean": mean, "std": np.sqrt(var), "min": self.minimum(), "max": self.maximum()}
+        for p, values in zip(percentiles, self.percentiles(percentiles)):
+            features[f"p{p:g}"] = values
+        features["rate"] = rate
+        return features
+
+
+class WindowFeatures:
+    """Ventanas deslizantes sobre expresiones + métricas, publicadas a cadencia fija."""
+
+    def __init__(self, expression_names, metric_names, windows=None, publish_every=None,
+                 percentiles=None, bins=HIST_BINS):
+        self.expression_names = list(expression_names)
+        self.metric_names     = list(metric_names)
+        self.names = self.expression_names + self.metric_names
+        self.window_seconds = windows or _env_floats("WINDOW_SECONDS", "1,5,30")
+        self.publish_every  = publish_every or float(os.getenv("WINDOW_PUBLISH_SECONDS", "0.5"))
+        self.percentiles    = percentiles or _env_floats("WINDOW_PERCENTILES", "10,50,90")
+        self.windows = [SlidingWindow(s, len(self.names), bins) for s in self.window_seconds]
+        self._n      = len(self.expression_names)
+        self._frame  = np.zeros(len(self.names), dtype=np.float32)
+        # Tupla: se reemplaza entera, el thread de ingesta la recorre sin lock
+        self.listeners = ()
+        self.reset()
+
+    def reset(self):
+        for window in self.windows:
+            window.reset()
+        self.latest = None
+        self._last_t = None
+        self._next_publish = None
+
+    def add_listener(self, listener):
+        """listener(snapshot) se llama en el thread de ingesta en cada publicación."""
+        self.listeners += (listener,)
+
+    def remove_listener(self, listener):
+        self.listeners = tuple(l for l in self.listeners if l is not listener)
+
+    def update(self, t, values, metrics):
+        """Agrega un frame. Retorna el snapshot si tocaba publicar, si no None."""
+        if self._last_t is not None and t < self._last_t:
+            # El reloj volvió atrás (sesión nueva en el headset): empezar de cero
+            self.reset()
+        self._last_t = t
+        self._frame[:self._n] = values
+        self._frame[self._n:] = metrics
+        for window in self.windows:
+            window.push(t, self._frame)
+
+        if self._next_publish is None:
+            self._next_publish = t + self.publish_every
+        elif t >= self._next_publish:
+            # Si hubo un hueco en los frames se salta a la próxima marca, sin ráfagas
+            self._next_publish += self.publish_every * (int((t - self._next_publish) // self.publish_every) + 1)
+            return self.publish(t)
+        return None
+
+    def snapshot(self, t):
+        return {"time": t, "windows": {s: w.features(self.percentiles)
+                                       for s, w in zip(self.window_seconds, self.windows)}}
+
+    def publish(self, t):
+        snapshot = self.snapshot(t)
+        self.latest = snapshot
+        for listener in self.listeners:
+            listener(snapshot)
+        return snapshot
+
+    def metric(self, snapshot, window, name):
+        """{feature: valor} de una métrica en una ventana de un snapshot."""
+        i = self._n + self.metric_names.index(name)
+        return {k: float(v[i]) for k, v in snapshot["windows"][window].items()}
+
+    def format_metrics(self, labels=None):
+        """Texto para la UI: media ± desviación, rango y tendencia por ventana, en %."""
+        snapshot = self.latest
+        if snapshot is None:
+            return ""
+        lines = []
+        for seconds in self.window_seconds:
+            lines.append(f"Ventana {seconds:g}s:")
+            for name, label in zip(self.metric_names, labels or self.metric_names):
+                f = self.metric(snapshot, seconds, name)
+                lines.append(f"  {label}: {f['mean']*100:.1f}% ±{f['std']*100:.1f} "
+                             f"[{f['min']*100:.0f}-{f['max']*100:.0f}] {f['rate']*100:+.1f}%/s")
+        return "\n".join(lines) + "\n"
+
+
+class QueuedListener:
+    """Listener que procesa las publicaciones en un thread propio.
+
+    El thread de ingesta solo encola el snapshot (sus arrays son nuevos en
+    cada publicación, no hace falta copiarlos); handle() corre en el thread
+    del listener. Si la cola se llena se descarta y se cuenta en `dropped`.
+    close() deja de aceptar publicaciones, procesa las encoladas y recién
+    ahí llama a _close(). Un error en handle() queda en `error` y no
+    detiene el thread.
+    """
+
+    def __init__(self, queue_size=LISTENER_QUEUE):
+        self._queue   = queue.Queue(maxsize=queue_size)
+        self._lock    = threading.Lock()
+        self._closing = False
+        self.dropped  = 0
+        self.error    = None
+        self._thread  = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __call__(self, snapshot):
+        with self._lock:
+            # Puede llegar una publicación justo mientras se cierra
+            if self._closing:
+                return
+            try:
+                self._queue.put_nowait(snapshot)
+            except queue.Full:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            snapshot = self._queue.get()
+            if snapshot is None:
+                return
+            try:
+                self.handle(snapshot)
+            except Exception as e:
+                # El thread sigue vaciando la cola: si muriera, close() no volvería nunca
+                self.error = e
+
+    def handle(self, snapshot):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+        # Espera solo mientras el thread siga vivo (no debería morir, pero close()
+        # corre en el thread de Tk y no puede colgarse)
+        while self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+        self._close()
+
+
+class FeatureCsvLog(QueuedListener):
+    """Listener que escribe cada publicación en <grabación>_features.csv."""
+
+    def __init__(self, recording_path, names, queue_size=LISTENER_QUEUE):
+        self.path = features_path(recording_path)
+        self._file = open(self.path, "w", newline="")
+        self._file.write(",".join(["Timestamp", "Window", "Feature"] + list(names)) + "\n")
+        super().__init__(queue_size)
+
+    def handle(self, snapshot):
+        lines = []
+        for seconds, features in snapshot["windows"].items():
+            for feature, values in features.items():
+                prefix = f"{snapshot['time']},{seconds:g},{feature},"
+                lines.append(prefix + ",".join(f"{v:.6g}" for v in values.tolist()))
+        self._file.write("\n".join(lines) + "\n")
+
+    def _close(self):
+        self._file.close()
+
+
+class UdpFeaturePublisher(QueuedListener):
+    """Listener que envía las métricas de cada publicación como JSON por UDP."""
+
+    def __init__(self, host, port, features, queue_size=LISTENER_QUEUE):
+        self.address = (host, int(port))
+        self.names = features.metric_names
+        self._offset = len(features.expression_names)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        super().__init__(queue_size)
+
+    @classmethod
+    def from_env(cls, features):
+        """Publicador según FEATURES_UDP=host:port, o None si no está configurado."""
+        target = os.getenv("FEATURES_UDP")
+        if not target:
+            return None
+        host, port = target.rsplit(":", 1)
+        return cls(host, port, features)
+
+    def handle(self, snapshot):
+        windows = {}
+        for seconds, features in snapshot["windows"].items():
+            windows[f"{seconds:g}"] = {
+                name: {k: round(float(v[self._offset + i]), 5) for k, v in features.items()}
+                for i, name in enumerate(self.names)}
+        message = json.dumps({"t": snapshot["time"], "windows": windows}).encode("utf-8")
+        try:
+            self._sock.sendto(message, self.address)
+        except OSError:
+            pass    # UDP: si el consumidor no está, se pierde el paquete
+
+    def _close(self):
+        self._sock.close()